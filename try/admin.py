@@ -1,12 +1,35 @@
 import sys
-import pandas as pd
 from datetime import datetime
-from storage import BookingStorage
+from club import VENUES
 
 
 class AdminPortal:
     def __init__(self):
-        self.storage = BookingStorage()
+        # pandas and the storage backend load on the first menu choice, not before the menu appears
+        self._storage = None
+        self.occupancy = None
+        self.stats = None
+        self.notifier = None
+
+    @property
+    def storage(self):
+        """The storage backend, created the first time it is needed"""
+        return self._open_storage()
+
+    def _open_storage(self):
+        """Create the storage backend and the views kept beside it, once"""
+        if self._storage is None:
+            from storage import create_storage
+            from occupancy import open_occupancy
+            from analytics import open_stats
+            from notifications import open_dispatcher
+            self._storage = create_storage()
+            # Kept current by every decision made here, so the club portal maps an up-to-date file
+            self.occupancy = open_occupancy(self._storage, VENUES)
+            self.stats = open_stats(self._storage)
+            # E-mails each decision to the club in the background (only if VENUE_BOOKING_SMTP is set)
+            self.notifier = open_dispatcher(self._storage)
+        return self._storage
 
     def display_pending_requests(self):
         """Display all pending booking requests"""
@@ -34,6 +57,7 @@ class AdminPortal:
 
     def process_request(self, request_index, pending_requests):
         """Process a single booking request"""
+        import pandas as pd
         if pending_requests is None or pending_requests.empty or request_index < 0 or request_index >= len(pending_requests):
             print("Invalid request index.")
             return
@@ -53,7 +77,10 @@ class AdminPortal:
             print("\n⚠️ WARNING: This request conflicts with the following approved/pending bookings:")
             for i, (_, conflict) in enumerate(conflicts.iterrows(), 1):
                 status_marker = "✅" if conflict['status'] == "Approved" else "⏳"
-                print(f"{i}. {status_marker} {conflict['club']} - {conflict['event_name']} - {conflict['time_slot']}")
+                event = conflict['event_name']
+                if 'series_id' in conflict and pd.notna(conflict['series_id']):
+                    event = f"{event} (recurring series {conflict['series_id']})"
+                print(f"{i}. {status_marker} {conflict['club']} - {event} - {conflict['time_slot']}")
         
         # Get admin decision
         while True:
@@ -77,44 +104,278 @@ class AdminPortal:
         else:
             print(f"\n❌ Failed to update request status. Please try again.")
 
-    def view_booking_log(self):
-        """View the booking log"""
-        logs_df = self.storage.load_logs()
+    def batch_process_requests(self):
+        """Classify all pending requests at once and apply the decisions in one commit"""
+        import pandas as pd
+        classified = self.storage.classify_pending_requests()
         
-        if logs_df.empty:
-            print("No booking logs available.")
+        if classified.empty:
+            print("\nNo pending booking requests.")
+            return
+        
+        groups = {category: group for category, group in classified.groupby('category')}
+        conflict_free = groups.get('conflict_free', pd.DataFrame())
+        with_approved = groups.get('conflicts_approved', pd.DataFrame())
+        with_pending = groups.get('conflicts_pending', pd.DataFrame())
+        
+        print("\n===== Batch Processing =====")
+        print(f"Conflict-free requests: {len(conflict_free)}")
+        print(f"Conflicting with approved bookings: {len(with_approved)}")
+        print(f"Conflicting only with other pending requests: {len(with_pending)}")
+        
+        decisions = []
+        if not conflict_free.empty:
+            choice = input(f"\nAuto-approve all {len(conflict_free)} conflict-free requests? (y/n): ").lower()
+            if choice == 'y':
+                decisions += [(request_id, "Approved", "") for request_id in conflict_free['id']]
+        
+        if not with_approved.empty:
+            choice = input(f"Reject all {len(with_approved)} requests that clash with approved bookings? (y/n): ").lower()
+            if choice == 'y':
+                comment = input("Enter a rejection comment (optional): ") or "Clashes with an approved booking"
+                decisions += [(request_id, "Rejected", comment) for request_id in with_approved['id']]
+        
+        if not with_pending.empty:
+            choice = input(f"Review the {len(with_pending)} requests that clash with other pending ones now? (y/n): ").lower()
+            if choice == 'y':
+                decided = set()
+                for _, req in with_pending.sort_values(['venue', 'date', 'start_min']).iterrows():
+                    if req['id'] in decided:
+                        continue
+                    print(f"\n[{req['id']}] {req['club']} - {req['event_name']} - {req['venue']} "
+                          f"on {req['date']} at {req['time_slot']} ({req['pending_conflicts']} clashes)")
+                    decision = input("a=approve, r=reject, s=skip: ").lower()
+                    if decision == 'a':
+                        decisions.append((req['id'], "Approved", ""))
+                        decided.add(req['id'])
+                        # Approving one request settles the pending requests it clashes with
+                        rivals = with_pending[
+                            (with_pending['venue'] == req['venue']) & (with_pending['date'] == req['date']) &
+                            (with_pending['start_min'] < req['end_min']) & (with_pending['end_min'] > req['start_min']) &
+                            (with_pending['id'] != req['id']) & ~with_pending['id'].isin(decided)
+                        ]
+                        for rival_id in rivals['id']:
+                            decisions.append((rival_id, "Rejected", f"Slot given to request {req['id']}"))
+                            decided.add(rival_id)
+                    elif decision == 'r':
+                        decisions.append((req['id'], "Rejected", ""))
+                        decided.add(req['id'])
+        
+        if not decisions:
+            print("No decisions to apply.")
+            return
+        
+        updated = self.storage.apply_decisions(decisions)
+        approved = sum(1 for _, status, _ in decisions if status == "Approved")
+        print(f"\n✅ Applied {updated} decisions ({approved} approved, {len(decisions) - approved} rejected).")
+
+    def optimize_allocation(self):
+        """Propose the best-fitting venue for every pending request in a date range"""
+        from allocation import allocate_pending, summarise, KEEP, MOVE, UNSERVED
+        print("\nAllocate the pending requests of a date range")
+        date_from = input("From date (YYYY-MM-DD): ").strip()
+        date_to = input("To date (YYYY-MM-DD): ").strip()
+        try:
+            datetime.strptime(date_from, '%Y-%m-%d')
+            datetime.strptime(date_to, '%Y-%m-%d')
+        except ValueError:
+            print("Invalid date format. Please use YYYY-MM-DD.")
+            return
+
+        proposal = allocate_pending(self.storage, VENUES, date_from, date_to)
+        if proposal.empty:
+            print("\nNo pending booking requests in that range.")
             return
+
+        counts = summarise(proposal)
+        moves = proposal[proposal['action'] == MOVE]
+        print("\n===== Proposed Allocation =====")
+        print(f"Pending requests: {len(proposal)}")
+        print(f"Keep their venue: {counts[KEEP]}")
+        print(f"Move to a better-fitting venue: {counts[MOVE]}")
+        print(f"Cannot be served: {counts[UNSERVED]}")
+        for _, req in moves.head(20).iterrows():
+            print(f"[{req['id']}] {req['club']} - {req['event_name']} on {req['date']} at {req['time_slot']} "
+                  f"({req['expected_attendance']} people): {req['requested_venue']} -> {req['proposed_venue']}")
+        if len(moves) > 20:
+            print(f"... and {len(moves) - 20} more moves")
+
+        if not moves.empty:
+            choice = input(f"\nApply all {len(moves)} reassignments? (y/n): ").lower()
+            if choice != 'y':
+                return
+            moved = self.storage.reassign_venues(moves[['id', 'proposed_venue']])
+            print(f"\n✅ Moved {moved} requests.")
+            if moved < len(moves):
+                print("Some requests changed since the proposal was made; run the allocation again.")
+                return
+
+        served = proposal[proposal['action'] != UNSERVED]
+        if not served.empty:
+            choice = input(f"Approve all {len(served)} requests that the allocation serves? (y/n): ").lower()
+            if choice == 'y':
+                updated = self.storage.apply_decisions(
+                    [(request_id, "Approved", "") for request_id in served['id']])
+                print(f"\n✅ Approved {updated} requests.")
+
+    def process_series(self):
+        """Approve or reject pending recurring series, each as a whole"""
+        import pandas as pd
+        pending_series = self.storage.get_series(status="Pending")
+        if pending_series.empty:
+            print("\nNo pending recurring series.")
+            return
+        
+        print("\n===== Pending Recurring Series =====")
+        for _, series in pending_series.iterrows():
+            every = "weekly" if int(series['interval_weeks']) == 1 else "every two weeks"
+            print(f"\nSeries ID: {series['series_id']}")
+            print(f"Club: {series['club']}")
+            print(f"Event: {series['event_name']}")
+            print(f"Venue: {series['venue']} at {series['time_slot']}")
+            print(f"Dates: {every} from {series['first_date']} until {series['until']}")
+            if pd.notna(series['exceptions']) and series['exceptions']:
+                print(f"Skipped: {series['exceptions'].replace(';', ', ')}")
+            print(f"Expected Attendance: {series['expected_attendance']}")
+            print(f"Purpose: {series['purpose']}")
+            print(f"Contact: {series['contact_email']}")
+
+            # Bookings approved since the series was submitted may have taken some of its dates
+            conflicts = self.storage.check_series(series.to_dict())
+            if conflicts is not None and not conflicts.empty:
+                dates = list(pd.unique(conflicts['date']))
+                print(f"\n⚠️ WARNING: This series clashes on {len(dates)} dates:")
+                for _, conflict in conflicts.head(10).iterrows():
+                    kind = "booking" if conflict['kind'] == 'booking' else "series"
+                    print(f"  {conflict['date']} - {kind} {conflict['conflict_id']} at {conflict['time_slot']}")
+                if len(conflicts) > 10:
+                    print(f"  ... and {len(conflicts) - 10} more")
+            print("-" * 40)
             
-        print("\n===== Booking Log =====")
+            decision = input("a=approve all dates, r=reject all dates, s=skip, q=stop: ").lower()
+            if decision == 'q':
+                return
+            if decision not in ('a', 'r'):
+                continue
+            status = "Approved" if decision == 'a' else "Rejected"
+            comment = input("Enter a comment (optional): ")
+            if self.storage.update_series_status(series['series_id'], status, comment):
+                print(f"\n{'✅' if status == 'Approved' else '❌'} Series {series['series_id']} has been {status.lower()}.")
+            else:
+                print("\n❌ Failed to update the series. Please try again.")
+
+    def utilization_report(self):
+        """Show venue utilization, peak hours and a weekday x hour heatmap for a date range"""
+        print("\nReport period (press Enter for the whole occupancy map)")
+        date_from = input("From date (YYYY-MM-DD): ").strip() or None
+        date_to = input("To date (YYYY-MM-DD): ").strip() or None
+        try:
+            for date in (date_from, date_to):
+                if date is not None:
+                    datetime.strptime(date, '%Y-%m-%d')
+        except ValueError:
+            print("Invalid date format. Please use YYYY-MM-DD.")
+            return
+
+        from occupancy import OccupancyMap, print_report
+        storage = self.storage
+        occupancy = self.occupancy.refresh() if self.occupancy is not None else None
+        if occupancy is None or not all(occupancy.covers(d) for d in (date_from, date_to) if d is not None):
+            if date_from is None or date_to is None:
+                print("Please give both dates for a period outside the occupancy map.")
+                return
+            # Outside the saved window: count this period in memory
+            days = (datetime.strptime(date_to, '%Y-%m-%d') - datetime.strptime(date_from, '%Y-%m-%d')).days + 1
+            if days <= 0:
+                print("The end date is before the start date.")
+                return
+            occupancy = OccupancyMap.build(storage, VENUES, date_from, days)
+        print_report(occupancy, date_from, date_to)
+
+    def view_statistics(self):
+        """Show turnaround, approval rates and the backlog from the running statistics"""
+        from analytics import print_stats
+        self._open_storage()
+        if self.stats is None:
+            print("Booking statistics are not available.")
+            return
+        print_stats(self.stats.refresh())
+
+    def view_booking_log(self, page_size=20):
+        """View the booking log one page at a time"""
+        import pandas as pd
+        print("\nFilter the log (press Enter to skip a filter)")
+        since = input("From date (YYYY-MM-DD): ").strip() or None
+        until = input("Until date, exclusive (YYYY-MM-DD): ").strip() or None
+        club = input("Club: ").strip() or None
+        venue = input("Venue: ").strip() or None
+
+        pages = self.storage.iter_log_pages(page_size, since=since, until=until, club=club, venue=venue)
+        
         # Format the dataframe for display
         pd.set_option('display.max_columns', None)
         pd.set_option('display.width', 120)
-        print(logs_df)
+        shown = 0
+        for page_number, logs_df in enumerate(pages, 1):
+            print(f"\n===== Booking Log (page {page_number}) =====")
+            logs_df.index = range(shown, shown + len(logs_df))
+            print(logs_df)
+            shown += len(logs_df)
+            if len(logs_df) < page_size or input("\nPress Enter for the next page or 'q' to stop: ").lower() == 'q':
+                break
         pd.reset_option('display.max_columns')
         pd.reset_option('display.width')
+        
+        if shown == 0:
+            print("No booking logs available.")
+
+    def _page_through(self, title, page_size, **filters):
+        """Show bookings matching the filters page by page; returns the number of matches"""
+        import pandas as pd
+        page = 1
+        while True:
+            page_df, total = self.storage.query_bookings(page=page, page_size=page_size, **filters)
+            if total == 0:
+                return 0
+            pages = (total + page_size - 1) // page_size
+            print(f"\n===== {title} (page {page}/{pages}, {total} total) =====")
+            for _, booking in page_df.iterrows():
+                status = booking['status']
+                status_icon = "✅" if status == "Approved" else "❌" if status == "Rejected" else "⏳"
+                print(f"{status_icon} [{booking['id']}] {booking['club']} - {booking['event_name']}")
+                print(f"    Venue: {booking['venue']} on {booking['date']} ({booking['day']}) at {booking['time_slot']}")
+                if pd.notna(booking['admin_comment']) and booking['admin_comment']:
+                    print(f"    Comment: {booking['admin_comment']}")
+                print()
+            if pages == 1:
+                return total
+            choice = input("Enter=next page, p=previous page, q=done: ").lower()
+            if choice == 'q':
+                return total
+            if choice == 'p':
+                page = max(page - 1, 1)
+            elif page < pages:
+                page += 1
+            else:
+                return total
 
-    def view_all_bookings(self):
-        """View all bookings (approved, rejected, and pending)"""
-        bookings_df = self.storage.get_all_bookings()
+    def view_all_bookings(self, page_size=20):
+        """View bookings (approved, rejected, and pending) page by page"""
+        print("\nFilter bookings (press Enter to skip a filter)")
+        status = input("Status (Approved/Pending/Rejected): ").strip().capitalize() or None
+        venue = input("Venue: ").strip() or None
+        date_from = input("From date (YYYY-MM-DD): ").strip() or None
+        date_to = input("To date (YYYY-MM-DD): ").strip() or None
         
-        if bookings_df.empty:
+        # One paginated section per status, as before
+        statuses = [status] if status else ["Approved", "Pending", "Rejected"]
+        found = 0
+        for current in statuses:
+            found += self._page_through(f"{current} Bookings", page_size, status=current, venue=venue,
+                                        date_from=date_from, date_to=date_to)
+        
+        if found == 0:
             print("No booking requests found.")
-            return
-            
-        # Group by status
-        status_groups = {status: group for status, group in bookings_df.groupby('status')}
-            
-        # Display by status
-        for status, group_df in status_groups.items():
-            if not group_df.empty:
-                print(f"\n===== {status} Bookings =====")
-                for _, booking in group_df.iterrows():
-                    status_icon = "✅" if status == "Approved" else "❌" if status == "Rejected" else "⏳"
-                    print(f"{status_icon} [{booking['id']}] {booking['club']} - {booking['event_name']}")
-                    print(f"    Venue: {booking['venue']} on {booking['date']} ({booking['day']}) at {booking['time_slot']}")
-                    if pd.notna(booking['admin_comment']) and booking['admin_comment']:
-                        print(f"    Comment: {booking['admin_comment']}")
-                    print()
 
     def run(self):
         """Main menu for the Admin Portal"""
@@ -123,11 +384,16 @@ class AdminPortal:
         while True:
             print("\n===== Admin Portal Menu =====")
             print("1. Process Pending Booking Requests")
-            print("2. View All Bookings")
-            print("3. View Booking Log")
-            print("4. Exit")
+            print("2. Batch Process Pending Requests")
+            print("3. View All Bookings")
+            print("4. View Booking Log")
+            print("5. Optimize Venue Allocation")
+            print("6. Process Recurring Series")
+            print("7. Utilization Report")
+            print("8. Booking Statistics")
+            print("9. Exit")
             
-            choice = input("\nEnter your choice (1-4): ")
+            choice = input("\nEnter your choice (1-9): ")
             
             if choice == "1":
                 pending_requests = self.display_pending_requests()
@@ -153,12 +419,30 @@ class AdminPortal:
                             print("Please enter a valid number.")
             
             elif choice == "2":
-                self.view_all_bookings()
+                self.batch_process_requests()
             
             elif choice == "3":
-                self.view_booking_log()
+                self.view_all_bookings()
             
             elif choice == "4":
+                self.view_booking_log()
+            
+            elif choice == "5":
+                self.optimize_allocation()
+            
+            elif choice == "6":
+                self.process_series()
+            
+            elif choice == "7":
+                self.utilization_report()
+            
+            elif choice == "8":
+                self.view_statistics()
+            
+            elif choice == "9":
+                if self.notifier is not None:
+                    # Whatever does not go out in time stays in the outbox for the next start
+                    self.notifier.close(timeout=10)
                 print("Thank you for using the Admin Portal. Goodbye!")
                 sys.exit(0)
             
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Allocation Module - Venue allocation for the pending requests of a date range
+Part of the Venue Booking System
+
+Clubs pick a venue themselves, often a bigger one than their expected
+attendance needs, so requests clash while rooms that would fit them sit
+empty. propose_allocation() reassigns the pending requests of a date range
+to maximise the number that can be served: every request needs a venue
+whose capacity covers its expected attendance, no two requests may overlap
+in the same venue, and approved bookings stay where they are.
+
+Requests are placed greedily in order of end time (interval scheduling),
+each in the smallest venue that fits and is free. With refine=True every
+date is also solved exactly as an integer program when the optional pulp
+package is installed, and the better of the two plans is kept.
+"""
+
+import argparse
+import sys
+from bisect import bisect_left
+import pandas as pd
+from interval_index import VenueIntervalIndex, ACTIVE_STATUSES, parse_time_slots
+
+try:
+    import pulp
+except ImportError:  # optional dependency
+    pulp = None
+
+PROPOSAL_COLUMNS = [
+    'id', 'club', 'event_name', 'date', 'day', 'time_slot', 'expected_attendance',
+    'requested_venue', 'proposed_venue', 'proposed_capacity', 'action'
+]
+
+# proposal actions
+KEEP = 'keep'
+MOVE = 'move'
+UNSERVED = 'unserved'
+
+
+def _require_pulp():
+    if pulp is None:
+        raise ImportError("ILP refinement needs pulp: pip install pulp")
+
+
+def _with_slots(df):
+    """Copy of df with start_min/end_min and a numeric attendance column"""
+    df = df.copy()
+    df['start_min'], df['end_min'] = parse_time_slots(df['time_slot'])
+    df['need'] = pd.to_numeric(df['expected_attendance'], errors='coerce').fillna(0).to_numpy()
+    return df
+
+
+def greedy_allocation(requests, approved, venues):
+    """Map request id -> venue by greedy interval scheduling.
+
+    Requests are taken in order of end time and each goes to the smallest
+    venue that holds its attendance and is still free for its slot.
+    """
+    names = sorted(venues, key=lambda name: (venues[name]['capacity'], name))
+    capacities = [venues[name]['capacity'] for name in names]
+    index = VenueIntervalIndex.from_bookings(approved[approved['venue'].isin(names)])
+
+    order = requests[requests['start_min'] >= 0].sort_values(['date', 'end_min', 'start_min', 'id'], kind='stable')
+    assignment = {}
+    columns = zip(order['id'].tolist(), order['date'].tolist(), order['start_min'].astype(int).tolist(),
+                  order['end_min'].astype(int).tolist(), order['need'].tolist())
+    for request_id, date, start, end, need in columns:
+        for name in names[bisect_left(capacities, need):]:
+            if index.is_free(name, date, start, end):
+                index.add(name, date, start, end, request_id, None)
+                assignment[request_id] = name
+                break
+    return assignment
+
+
+def ilp_allocation(requests, approved, venues, time_limit=10):
+    """Map request id -> venue for the requests of ONE date, solved exactly with pulp.
+
+    Serving one more request always outweighs any saving in capacity, so
+    the solver maximises the number served first and wasted seats second.
+    """
+    _require_pulp()
+    names = list(venues)
+    largest = max(venues[name]['capacity'] for name in names)
+    blocked = VenueIntervalIndex.from_bookings(approved[approved['venue'].isin(names)])
+    requests = requests[requests['start_min'] >= 0]
+    penalty = 1.0 / (largest * (len(requests) + 1))
+
+    problem = pulp.LpProblem("venue_allocation", pulp.LpMaximize)
+    choices = {}
+    by_venue = {name: [] for name in names}
+    for request_id, date, start, end, need in zip(requests['id'], requests['date'], requests['start_min'],
+                                                  requests['end_min'], requests['need']):
+        for name in names:
+            capacity = venues[name]['capacity']
+            if capacity >= need and blocked.is_free(name, date, int(start), int(end)):
+                choices[request_id, name] = pulp.LpVariable(f"x{len(choices)}", cat='Binary')
+                by_venue[name].append((int(start), int(end), request_id))
+    if not choices:
+        return {}
+    problem += pulp.lpSum(var * (1 - penalty * venues[name]['capacity']) for (_, name), var in choices.items())
+
+    for request_id in requests['id']:
+        options = [choices[request_id, name] for name in names if (request_id, name) in choices]
+        if len(options) > 1:
+            problem += pulp.lpSum(options) <= 1
+    # At most one request in a venue at each moment; checking every start time is enough
+    for name, intervals in by_venue.items():
+        for moment in sorted({start for start, _, _ in intervals}):
+            active = [choices[request_id, name] for start, end, request_id in intervals if start <= moment < end]
+            if len(active) > 1:
+                problem += pulp.lpSum(active) <= 1
+
+    problem.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit))
+    return {request_id: name for (request_id, name), var in choices.items() if (var.value() or 0) > 0.5}
+
+
+def _plan_score(assignment, venues):
+    """Served requests first, then fewer seats used"""
+    return len(assignment), -sum(venues[name]['capacity'] for name in assignment.values())
+
+
+def propose_allocation(pending, approved, venues, refine=False, time_limit=10):
+    """Proposed venue for every pending request (see PROPOSAL_COLUMNS).
+
+    pending and approved are booking DataFrames for the same date range;
+    venues maps venue names to {"category", "capacity"}, as in ClubPortal.venues.
+    action is "keep" when the request stays in its venue, "move" when it
+    should be reassigned and "unserved" when no venue can take it.
+    """
+    if pending.empty:
+        return pd.DataFrame(columns=PROPOSAL_COLUMNS)
+    pending = _with_slots(pending)
+    approved = _with_slots(approved) if not approved.empty else pending.iloc[:0]
+
+    assignment = greedy_allocation(pending, approved, venues)
+    if refine:
+        _require_pulp()
+        approved_by_date = dict(tuple(approved.groupby('date')))
+        for date, day_requests in pending.groupby('date'):
+            greedy_day = {i: assignment[i] for i in day_requests['id'] if i in assignment}
+            exact_day = ilp_allocation(day_requests, approved_by_date.get(date, approved.iloc[:0]),
+                                       venues, time_limit)
+            if _plan_score(exact_day, venues) > _plan_score(greedy_day, venues):
+                for request_id in greedy_day:
+                    del assignment[request_id]
+                assignment.update(exact_day)
+
+    proposal = pd.DataFrame({
+        'id': pending['id'].to_numpy(),
+        'club': pending['club'].to_numpy(),
+        'event_name': pending['event_name'].to_numpy(),
+        'date': pending['date'].to_numpy(),
+        'day': pending['day'].to_numpy(),
+        'time_slot': pending['time_slot'].to_numpy(),
+        'expected_attendance': pending['expected_attendance'].to_numpy(),
+        'requested_venue': pending['venue'].to_numpy(),
+    })
+    proposal['proposed_venue'] = proposal['id'].map(assignment)
+    proposal['proposed_capacity'] = proposal['proposed_venue'].map(
+        {name: details['capacity'] for name, details in venues.items()})
+    proposal['action'] = MOVE
+    proposal.loc[proposal['proposed_venue'] == proposal['requested_venue'], 'action'] = KEEP
+    proposal.loc[proposal['proposed_venue'].isna(), 'action'] = UNSERVED
+    return proposal.sort_values(['date', 'time_slot', 'id'], kind='stable').reset_index(drop=True)
+
+
+def allocate_pending(storage, venues, date_from, date_to, refine=False, time_limit=10):
+    """Read the pending and approved bookings and series of a date range and propose an allocation"""
+    everything = 10 ** 9
+    pending, _ = storage.query_bookings(status='Pending', date_from=date_from, date_to=date_to,
+                                        page_size=everything)
+    approved, _ = storage.query_bookings(status='Approved', date_from=date_from, date_to=date_to,
+                                         page_size=everything)
+    # Recurring series keep their venue too; their dates block it like approved bookings
+    occurrences = storage.expand_series(date_from, date_to)
+    occurrences = occurrences[occurrences['status'].isin(ACTIVE_STATUSES)]
+    if not occurrences.empty:
+        occurrences = occurrences.assign(id=-occurrences['series_id'], status='Approved')
+        approved = pd.concat([approved, occurrences[['id', 'venue', 'date', 'time_slot', 'status']]],
+                             ignore_index=True)
+    return propose_allocation(pending, approved, venues, refine, time_limit)
+
+
+def summarise(proposal):
+    """Counts of kept, moved and unserved requests"""
+    counts = proposal['action'].value_counts()
+    return {action: int(counts.get(action, 0)) for action in (KEEP, MOVE, UNSERVED)}
+
+
+def main():
+    from club import VENUES
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Propose venues for the pending requests of a date range")
+    parser.add_argument("--from", dest="date_from", required=True, help="first date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="date_to", required=True, help="last date, YYYY-MM-DD")
+    parser.add_argument("--refine", action="store_true", help="refine every date with an ILP (needs pulp)")
+    parser.add_argument("--time-limit", type=float, default=10, help="ILP seconds per date")
+    parser.add_argument("--output", default="allocation.csv", help="where to write the proposal")
+    parser.add_argument("--apply", action="store_true", help="apply the reassignments to the store")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    try:
+        proposal = allocate_pending(storage, VENUES, args.date_from, args.date_to, args.refine, args.time_limit)
+    except ImportError as e:
+        print(e)
+        return 1
+    proposal.to_csv(args.output, index=False)
+    counts = summarise(proposal)
+    print(f"{len(proposal)} pending requests: {counts[KEEP]} keep their venue, {counts[MOVE]} move, "
+          f"{counts[UNSERVED]} cannot be served")
+    print(f"Proposal written to {args.output}")
+    if args.apply:
+        moves = proposal[proposal['action'] == MOVE]
+        print(f"Reassigned {storage.reassign_venues(moves[['id', 'proposed_venue']])} requests")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
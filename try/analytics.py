@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Analytics Module - Running booking statistics kept up to date as requests are decided
+Part of the Venue Booking System
+
+BookingStats holds request counts per club and venue and status, the
+number of requests submitted and decided per day (the backlog over time)
+and a quantile sketch of the turnaround from submitted_at to processed_at.
+It is built once from the bookings and series tables, then every change
+made through the storage object moves the counts of the changed rows, so
+reading the statistics costs the same for ten bookings or ten million.
+
+The summary is saved to a small JSON file with the store version it
+reflects. Portals that make changes keep the file current, so the admin
+portal reloads it instead of re-reading the bookings whenever another
+process wrote in between.
+
+    python analytics.py
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+from metrics import record_error
+
+STATUSES = ('Pending', 'Approved', 'Rejected')
+DECIDED = ('Approved', 'Rejected')
+DEFAULT_PATH = "booking_stats.json"
+
+
+class QuantileSketch:
+    """Streaming quantiles with bounded relative error (a log-bucketed histogram).
+
+    Values are counted in buckets whose bounds grow by a factor gamma, so any
+    quantile is known to within relative_accuracy, values can be removed
+    again, and the memory and query cost depend only on the value range.
+    Values below min_value are counted in one zero bucket.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1.0, buckets=None, zero_count=0):
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = dict(buckets or {})
+        self.zero_count = zero_count
+
+    def add(self, values, sign=1):
+        """Add (sign=1) or remove (sign=-1) an array of values"""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        small = values < self.min_value
+        self.zero_count += sign * int(small.sum())
+        keys = np.ceil(np.log(values[~small]) / self._log_gamma).astype(np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            total = self.buckets.get(key, 0) + sign * count
+            if total > 0:
+                self.buckets[key] = total
+            else:
+                self.buckets.pop(key, None)
+
+    @property
+    def count(self):
+        return self.zero_count + sum(self.buckets.values())
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1), or None if the sketch is empty"""
+        total = self.count
+        if total <= 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(key-1), gamma^key] in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {'relative_accuracy': self.relative_accuracy, 'min_value': self.min_value,
+                'zero_count': self.zero_count, 'buckets': {str(k): v for k, v in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['relative_accuracy'], data['min_value'],
+                   {int(k): v for k, v in data['buckets'].items()}, data['zero_count'])
+
+
+class BookingStats:
+    """Counts and turnaround of booking requests and series, maintained incrementally"""
+
+    def __init__(self):
+        self.by_club = {}
+        self.by_venue = {}
+        self.submitted_by_day = {}
+        self.decided_by_day = {}
+        self.turnaround = QuantileSketch()
+        self.version = None
+        self.path = None
+        self.storage = None
+
+    # ----- building, loading and saving -----
+
+    @classmethod
+    def build(cls, storage, path=None):
+        """Summarise every booking and series in one vectorized pass"""
+        stats = cls()
+        # Read the version first: a change committed while we read makes the summary stale, never wrong
+        stats.version = storage.get_version()
+        stats._add_rows(storage.get_all_bookings(), 1)
+        stats._add_rows(storage.get_series(), 1)
+        if path is not None:
+            stats.save(path)
+        return stats
+
+    @classmethod
+    def open(cls, storage, path=DEFAULT_PATH):
+        """Load the saved summary if it matches the store, otherwise rebuild it.
+
+        The returned summary follows every later change made through storage.
+        """
+        stats = cls._load(path)
+        if stats is None or stats.version != storage.get_version():
+            stats = cls.build(storage, path)
+        stats.attach(storage)
+        return stats
+
+    @classmethod
+    def _load(cls, path):
+        """The summary saved at path, or None if there is none"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            stats = cls()
+            stats.by_club = data['by_club']
+            stats.by_venue = data['by_venue']
+            stats.submitted_by_day = data['submitted_by_day']
+            stats.decided_by_day = data['decided_by_day']
+            stats.turnaround = QuantileSketch.from_dict(data['turnaround'])
+            stats.version = data['version']
+        except (OSError, ValueError, KeyError):
+            return None
+        stats.path = path
+        return stats
+
+    def save(self, path=None):
+        """Write the summary atomically, so readers never see half a file"""
+        self.path = path or self.path
+        data = {
+            'version': self.version, 'by_club': self.by_club, 'by_venue': self.by_venue,
+            'submitted_by_day': self.submitted_by_day, 'decided_by_day': self.decided_by_day,
+            'turnaround': self.turnaround.to_dict(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=".stats-")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    # ----- keeping up with the store -----
+
+    def attach(self, storage):
+        """Apply every change committed through storage from now on"""
+        self.storage = storage
+        storage.subscribe(self.on_change)
+
+    def detach(self):
+        if self.storage is not None:
+            self.storage.unsubscribe(self.on_change)
+            self.storage = None
+
+    def on_change(self, event, old_rows, new_rows):
+        """Storage listener: move the counts of the changed rows from their old to their new state"""
+        version = self.storage.get_version()
+        if self.version is None or version != self.version + 1:
+            # Someone else committed in between; the next refresh() catches up
+            self.version = None
+            return
+        if old_rows is not None:
+            self._add_rows(old_rows, -1)
+        self._add_rows(new_rows, 1)
+        self.version = version
+        if self.path is not None:
+            self.save()
+
+    def refresh(self):
+        """Catch up with changes made elsewhere: reload the saved summary if it is current, else rebuild"""
+        if self.storage is None:
+            return self
+        version = self.storage.get_version()
+        if self.version == version:
+            return self
+        fresh = BookingStats._load(self.path) if self.path is not None else None
+        if fresh is None or fresh.version != version:
+            fresh = BookingStats.build(self.storage, self.path)
+        for name in ('by_club', 'by_venue', 'submitted_by_day', 'decided_by_day', 'turnaround', 'version'):
+            setattr(self, name, getattr(fresh, name))
+        return self
+
+    def _add_rows(self, rows, sign):
+        """Add (sign=1) or remove (sign=-1) the counts of a frame of booking or series rows"""
+        if rows is None or rows.empty:
+            return
+        rows = rows[rows['status'].isin(STATUSES)]
+        if rows.empty:
+            return
+        for column, table in (('club', self.by_club), ('venue', self.by_venue)):
+            for (key, status), n in rows.groupby([column, 'status']).size().items():
+                counts = table.setdefault(str(key), dict.fromkeys(STATUSES, 0))
+                counts[status] += sign * int(n)
+                if not any(counts.values()):
+                    del table[str(key)]
+
+        submitted = pd.to_datetime(rows['submitted_at'], format='%Y-%m-%d %H:%M:%S', errors='coerce')
+        _add_days(self.submitted_by_day, submitted, sign)
+        decided = rows['status'].isin(DECIDED).to_numpy()
+        processed = pd.to_datetime(rows['processed_at'], format='%Y-%m-%d %H:%M:%S', errors='coerce')[decided]
+        _add_days(self.decided_by_day, processed, sign)
+        self.turnaround.add((processed - submitted[decided]).dt.total_seconds().to_numpy(), sign)
+
+    # ----- queries -----
+
+    def totals(self):
+        """Requests per status over all clubs"""
+        totals = dict.fromkeys(STATUSES, 0)
+        for counts in self.by_club.values():
+            for status in STATUSES:
+                totals[status] += counts[status]
+        return totals
+
+    def backlog(self):
+        """Requests waiting for a decision right now"""
+        return self.totals()['Pending']
+
+    def turnaround_hours(self, q):
+        """q-quantile of the hours from submission to decision, or None before any decision"""
+        seconds = self.turnaround.quantile(q)
+        return None if seconds is None else seconds / 3600
+
+    def approval_rates(self, by='club'):
+        """Decided, approved and approval rate per club (by='club') or venue, most requests first"""
+        table = self.by_club if by == 'club' else self.by_venue
+        rates = pd.DataFrame([
+            {by: key, 'requests': sum(counts.values()), 'pending': counts['Pending'],
+             'decided': counts['Approved'] + counts['Rejected'], 'approved': counts['Approved']}
+            for key, counts in table.items()
+        ], columns=[by, 'requests', 'pending', 'decided', 'approved'])
+        rates['approval_rate'] = rates['approved'] / rates['decided'].where(rates['decided'] > 0)
+        return rates.sort_values(['requests', by], ascending=[False, True]).reset_index(drop=True)
+
+    def backlog_over_time(self, date_from=None, date_to=None):
+        """Requests submitted and decided per day and the backlog at the end of each day"""
+        days = sorted(set(self.submitted_by_day) | set(self.decided_by_day))
+        history = pd.DataFrame({
+            'date': days,
+            'submitted': [self.submitted_by_day.get(d, 0) for d in days],
+            'decided': [self.decided_by_day.get(d, 0) for d in days],
+        })
+        history['backlog'] = (history['submitted'] - history['decided']).cumsum()
+        if date_from is not None:
+            history = history[history['date'] >= date_from]
+        if date_to is not None:
+            history = history[history['date'] <= date_to]
+        return history.reset_index(drop=True)
+
+
+def _add_days(table, timestamps, sign):
+    """Add sign to table[date] for every timestamp, dropping days that fall to zero"""
+    for day, n in timestamps.dropna().dt.strftime('%Y-%m-%d').value_counts().items():
+        total = table.get(day, 0) + sign * int(n)
+        if total:
+            table[day] = total
+        else:
+            table.pop(day, None)
+
+
+def open_stats(storage, path=DEFAULT_PATH):
+    """The booking statistics of the store, or None if they cannot be opened"""
+    try:
+        return BookingStats.open(storage, path)
+    except Exception as e:
+        print(f"Error opening the booking statistics: {e}")
+        record_error(e)
+        return None
+
+
+def _format_hours(hours):
+    if hours is None:
+        return "n/a"
+    return f"{hours:.1f} h" if hours < 48 else f"{hours / 24:.1f} days"
+
+
+def print_stats(stats, top=10, days=14):
+    """Turnaround, approval rates of the busiest clubs and venues and the recent backlog"""
+    totals = stats.totals()
+    decided = totals['Approved'] + totals['Rejected']
+    print("\n===== Booking Statistics =====")
+    print(f"Requests: {sum(totals.values())} ({totals['Pending']} pending, {totals['Approved']} approved, "
+          f"{totals['Rejected']} rejected)")
+    if decided:
+        print(f"Approval rate: {totals['Approved'] / decided:.1%}")
+    print(f"Turnaround: median {_format_hours(stats.turnaround_hours(0.5))}, "
+          f"p95 {_format_hours(stats.turnaround_hours(0.95))}")
+    for by in ('club', 'venue'):
+        print(f"\nBy {by} (top {top}):")
+        for _, row in stats.approval_rates(by).head(top).iterrows():
+            rate = "n/a" if pd.isna(row['approval_rate']) else f"{row['approval_rate']:.1%}"
+            print(f"{str(row[by]):<24} {row['requests']:>7} requests  {row['pending']:>6} pending  {rate:>6} approved")
+    history = stats.backlog_over_time().tail(days)
+    if not history.empty:
+        print(f"\nBacklog, last {len(history)} days with activity:")
+        for _, row in history.iterrows():
+            print(f"{row['date']}  +{row['submitted']:<5} -{row['decided']:<5} backlog {row['backlog']}")
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Booking turnaround, approval rates and backlog")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--rebuild", action="store_true", help="recount from the bookings and series")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    if args.rebuild:
+        stats = BookingStats.build(storage, args.path)
+    else:
+        stats = BookingStats.open(storage, args.path)
+    print_stats(stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
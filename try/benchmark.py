@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Storage Benchmark - Latency percentiles and peak memory of the storage hot paths
+Part of the Venue Booking System
+
+For every backend and table size a fresh store is filled with synthetic
+data and each operation is timed call by call. Peak memory is measured in
+a separate, shorter pass under tracemalloc so it does not distort the
+timings. The results go to a JSON report; --baseline compares them with an
+earlier report and fails if a median got slower than --threshold allows.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from storage import create_storage
+from synthetic_data import synthetic_bookings, synthetic_logs, synthetic_requests, load_dataset
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def make_operations(storage, bookings_df, rng):
+    """(name, callable, is_write) for every benchmarked storage method"""
+    venues = bookings_df['venue'].unique().tolist()
+    dates = bookings_df['date'].unique().tolist()
+    slots = bookings_df['time_slot'].unique().tolist()
+    requests = itertools.cycle(synthetic_requests(1000, seed=rng.randrange(1 << 30)))
+    pending_ids = bookings_df.loc[bookings_df['status'] == 'Pending', 'id'].tolist()
+    rng.shuffle(pending_ids)
+    pending_ids = iter(pending_ids)
+
+    def random_slot():
+        return rng.choice(venues), rng.choice(dates), rng.choice(slots)
+
+    def cold_load():
+        storage.invalidate_cache()
+        storage.get_pending_requests()
+
+    def update_status():
+        storage.update_request_status(int(next(pending_ids)), rng.choice(['Approved', 'Rejected']), 'benchmark')
+
+    def add_log():
+        venue, date, slot = random_slot()
+        storage.add_log({
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'club': 'Club-1', 'venue': venue,
+            'status': 'Submitted', 'day': 'Monday', 'date': date, 'time_slot': slot,
+            'event': 'benchmark', 'admin_comment': ''
+        })
+
+    return [
+        ('cold_load', cold_load, False),
+        ('check_venue_availability', lambda: storage.check_venue_availability(*random_slot()), False),
+        ('get_conflicting_bookings', lambda: storage.get_conflicting_bookings(*random_slot()), False),
+        ('get_pending_requests', storage.get_pending_requests, False),
+        ('save_request', lambda: storage.save_request(next(requests)), True),
+        ('update_request_status', update_status, True),
+        ('add_log', add_log, True),
+    ]
+
+
+def time_calls(operation, calls):
+    """Per-call latencies in milliseconds"""
+    latencies = np.empty(calls)
+    for i in range(calls):
+        started = time.perf_counter()
+        operation()
+        latencies[i] = time.perf_counter() - started
+    return latencies * 1000
+
+
+def peak_memory(operation, calls):
+    """Peak traced allocation (MiB) over a few calls"""
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            operation()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark_store(backend, n_rows, calls, write_calls, memory_calls, seed, log_fsync):
+    """Benchmark one backend at one table size in a scratch directory"""
+    workdir = tempfile.mkdtemp(prefix=f"booking-bench-{backend}-{n_rows}-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        storage = create_storage(backend, log_fsync=log_fsync)
+        bookings_df = synthetic_bookings(n_rows, seed=seed)
+        load_dataset(storage, bookings_df, synthetic_logs(bookings_df))
+        storage = create_storage(backend, log_fsync=log_fsync)
+
+        rng = random.Random(seed)
+        results = []
+        for name, operation, is_write in make_operations(storage, bookings_df, rng):
+            n_calls = write_calls if is_write or name == 'cold_load' else calls
+            latencies = time_calls(operation, n_calls)
+            peak = peak_memory(operation, memory_calls)
+            result = {
+                'backend': backend, 'rows': n_rows, 'operation': name, 'calls': n_calls,
+                'mean_ms': float(latencies.mean()), 'max_ms': float(latencies.max()),
+                'peak_mib': peak,
+            }
+            for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+                result[f'p{p}_ms'] = float(value)
+            results.append(result)
+            print(f"{backend:<7} {n_rows:>9} {name:<26} p50 {result['p50_ms']:9.3f} ms  "
+                  f"p99 {result['p99_ms']:9.3f} ms  peak {peak:8.2f} MiB")
+        if hasattr(storage, 'close'):
+            storage.close()
+        return results
+    finally:
+        os.chdir(previous_dir)
+
+
+def compare(results, baseline_path, threshold):
+    """Return the (backend, rows, operation) whose median regressed past threshold"""
+    with open(baseline_path) as f:
+        baseline = {(r['backend'], r['rows'], r['operation']): r for r in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get((result['backend'], result['rows'], result['operation']))
+        if before and result['p50_ms'] > before['p50_ms'] * threshold:
+            regressions.append((result['backend'], result['rows'], result['operation'],
+                                before['p50_ms'], result['p50_ms']))
+    return regressions
+
+
+def _sizes(text):
+    sizes = []
+    for value in text.split(','):
+        value = value.strip().lower()
+        multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+        sizes.append(int(float(value.rstrip('km')) * multiplier))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the booking storage backends")
+    parser.add_argument("--rows", type=_sizes, default=[1_000, 100_000],
+                        help="comma-separated table sizes, e.g. 1k,100k,1m")
+    parser.add_argument("--backend", default="csv,sqlite", help="comma-separated backends")
+    parser.add_argument("--calls", type=int, default=200, help="timed calls per read operation")
+    parser.add_argument("--write-calls", type=int, default=20, help="timed calls per write operation")
+    parser.add_argument("--memory-calls", type=int, default=3, help="calls traced for peak memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fsync", action="store_true", help="fsync log writes as the portals do")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="earlier report to compare medians against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="fail if a median is this many times slower than the baseline")
+    args = parser.parse_args()
+
+    results = []
+    for backend in args.backend.split(','):
+        for n_rows in args.rows:
+            results.extend(benchmark_store(backend.strip(), n_rows, args.calls, args.write_calls,
+                                           args.memory_calls, args.seed, args.fsync))
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'settings': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.threshold)
+        for backend, n_rows, operation, before, after in regressions:
+            print(f"REGRESSION: {backend} {n_rows} {operation}: p50 {before:.3f} -> {after:.3f} ms")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
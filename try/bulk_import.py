@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Bulk Import - Load booking requests from a JSON Lines file
+Part of the Venue Booking System
+
+Each line is one request object with the fields a club fills in on the
+portal: club, event_name, contact_email, day, date, time_slot, venue,
+expected_attendance and purpose.
+"""
+
+import argparse
+import sys
+import time
+import pandas as pd
+from storage import create_storage
+
+
+def read_requests(path, chunk_size):
+    """Stream a JSONL file as DataFrame chunks"""
+    with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import booking requests from a JSONL file")
+    parser.add_argument("path", help="JSON Lines file with one request per line")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="lines read per chunk")
+    parser.add_argument("--allow-conflicts", action="store_true",
+                        help="import requests even if their slot is already taken")
+    parser.add_argument("--rejects", help="write rows that were not imported to this CSV file")
+    parser.add_argument("--backend", help="storage backend (csv or sqlite)")
+    args = parser.parse_args()
+
+    storage = create_storage(args.backend)
+    started = time.perf_counter()
+    result = storage.save_requests(
+        read_requests(args.path, args.chunk_size),
+        allow_conflicts=args.allow_conflicts,
+        chunk_size=args.chunk_size
+    )
+    elapsed = time.perf_counter() - started
+
+    counts = result['outcome'].value_counts()
+    print(f"Processed {len(result)} requests in {elapsed:.2f}s")
+    for outcome in ('imported', 'conflict', 'invalid', 'failed'):
+        if counts.get(outcome, 0):
+            print(f"  {outcome}: {counts[outcome]}")
+
+    rejected = result[result['outcome'] != 'imported']
+    if args.rejects and not rejected.empty:
+        rejected.to_csv(args.rejects, index=False)
+        print(f"Rejected rows written to {args.rejects}")
+    elif not rejected.empty:
+        for reason, count in rejected['reason'].value_counts().head(10).items():
+            print(f"  - {reason}: {count}")
+
+    return 1 if counts.get('failed', 0) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
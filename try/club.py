@@ -7,22 +7,27 @@ Part of the Venue Booking System
 from datetime import datetime
 import re
 import sys
-import pandas as pd
-from storage import BookingStorage
+from records import BookingRecord, SeriesRecord, open_reader
+
+# Venue catalogue: name -> category and seating capacity
+VENUES = {
+    "Auditorium": {"category": "Auditorium", "capacity": 1000},
+    "LT-1": {"category": "Lecture Theatre", "capacity": 300},
+    "LT-2": {"category": "Lecture Theatre", "capacity": 250},
+    "CR-1": {"category": "Conference Room", "capacity": 100},
+    "CR-2": {"category": "Conference Room", "capacity": 50},
+    "Sports Hall": {"category": "Sports", "capacity": 500}
+}
 
 class ClubPortal:
     def __init__(self):
-        self.storage = BookingStorage()
-        
-        # Define venue data
-        self.venues = {
-            "Auditorium": {"category": "Auditorium", "capacity": 1000},
-            "LT-1": {"category": "Lecture Theatre", "capacity": 300},
-            "LT-2": {"category": "Lecture Theatre", "capacity": 250},
-            "CR-1": {"category": "Conference Room", "capacity": 100},
-            "CR-2": {"category": "Conference Room", "capacity": 50},
-            "Sports Hall": {"category": "Sports", "capacity": 500}
-        }
+        # Lookups read the files directly; the full storage (and pandas) loads on first use
+        self.reader = open_reader()
+        self._storage = None
+        self.occupancy = None
+        self.stats = None
+        
+        self.venues = VENUES
         
         # Group venues by category
         self.categories = {}
@@ -32,15 +37,65 @@ class ClubPortal:
                 self.categories[category] = []
             self.categories[category].append(venue_name)
 
+    @property
+    def storage(self):
+        """The storage backend, created the first time a submission or search needs it"""
+        if self._storage is None:
+            from storage import create_storage
+            from occupancy import open_occupancy
+            from analytics import open_stats
+            self._storage = create_storage()
+            # Occupancy of the coming months, mapped from disk; None if it could not be opened
+            self.occupancy = open_occupancy(self._storage, self.venues)
+            # Submissions from here keep the admin's statistics file current
+            self.stats = open_stats(self._storage)
+        return self._storage
+
+    def get_booking(self, booking_id):
+        """One booking as a BookingRecord, or None"""
+        if self.reader is not None:
+            return self.reader.get_booking_by_id(booking_id)
+        booking = self.storage.get_booking_by_id(booking_id)
+        return None if booking is None else BookingRecord.from_mapping(booking.to_dict())
+
+    def get_club_bookings(self, club_name):
+        """A club's bookings as BookingRecords"""
+        if self.reader is not None:
+            return self.reader.get_club_bookings(club_name)
+        bookings = self.storage.get_club_bookings(club_name)
+        return [BookingRecord.from_mapping(row) for row in bookings.to_dict('records')]
+
+    def get_club_series(self, club_name):
+        """A club's recurring series as SeriesRecords"""
+        if self.reader is not None:
+            return self.reader.get_club_series(club_name)
+        club_series = self.storage.get_series(club=club_name)
+        return [SeriesRecord.from_mapping(row) for row in club_series.to_dict('records')]
+
     def suggest_available_venues(self, date, time_slot):
         """Suggest venues available for a given date and time slot across all categories."""
-        available_venues = {}
-        for category, venue_list in self.categories.items():
-            available_venues[category] = []
-            for venue in venue_list:
-                if self.storage.check_venue_availability(venue, date, time_slot):
-                    available_venues[category].append(venue)
-        return available_venues
+        return self.suggest_available_venues_for_slots([(date, time_slot)])[(date, time_slot)]
+
+    def suggest_available_venues_for_slots(self, slots):
+        """Suggest available venues by category for each (date, time slot) pair."""
+        storage = self.storage
+        free_by_slot = {}
+        if self.occupancy is not None and self.occupancy.refresh().exact:
+            for slot in slots:
+                free_venues = self.occupancy.free_venues(*slot)
+                if free_venues is not None:
+                    free_by_slot[slot] = free_venues
+        remaining = [slot for slot in slots if slot not in free_by_slot]
+        if remaining:
+            free_by_slot.update(storage.get_available_venues_for_slots(list(self.venues), remaining))
+        suggestions = {}
+        for slot, free_venues in free_by_slot.items():
+            free_venues = set(free_venues)
+            suggestions[slot] = {
+                category: [venue for venue in venue_list if venue in free_venues]
+                for category, venue_list in self.categories.items()
+            }
+        return suggestions
 
     def submit_booking_request(self):
         """Interactive CLI for submitting a booking request"""
@@ -126,7 +181,7 @@ class ClubPortal:
         }
         
         # Save request
-        request_id = self.storage.save_request(request)
+        request_id = self.storage.save_request(request, check_available=True)
         
         if request_id:
             print(f"\n✅ Booking request submitted successfully! Request ID: {request_id}")
@@ -134,40 +189,234 @@ class ClubPortal:
         else:
             print("\n❌ Failed to submit booking request. Please try again.")
 
-    def view_club_bookings(self):
-        """View all bookings for a club"""
-        club_name = input("Enter club name to view bookings: ")
-        club_bookings = self.storage.get_club_bookings(club_name)
+    def submit_recurring_request(self):
+        """Interactive CLI for booking the same venue and time every week or two"""
+        print("\n===== Recurring Booking Request =====\n")
         
-        if club_bookings.empty:
-            print(f"No booking requests found for {club_name}.")
+        club_name = input("Enter club name: ")
+        event_name = input("Enter event name: ")
+        contact_email = input("Enter contact email: ")
+        
+        while True:
+            first_date = input("Enter the first date (YYYY-MM-DD): ")
+            until = input("Repeat until (YYYY-MM-DD): ")
+            try:
+                datetime.strptime(first_date, "%Y-%m-%d")
+                datetime.strptime(until, "%Y-%m-%d")
+                break
+            except ValueError:
+                print("Invalid date format. Please enter in YYYY-MM-DD format.")
+        
+        while True:
+            frequency = input("Repeat (w)eekly or every (t)wo weeks? [w]: ").strip().lower() or 'w'
+            if frequency in ('w', 't'):
+                interval_weeks = 1 if frequency == 'w' else 2
+                break
+            print("Please enter w or t.")
+        
+        while True:
+            time_slot = input("Enter time slot (e.g. 09:00-11:00): ")
+            if re.match(r'^\d{2}:\d{2}-\d{2}:\d{2}$', time_slot):
+                try:
+                    start, end = time_slot.split('-')
+                    datetime.strptime(start, "%H:%M")
+                    datetime.strptime(end, "%H:%M")
+                    break
+                except ValueError:
+                    print("Invalid time format.")
+            else:
+                print("Format should be HH:MM-HH:MM.")
+        
+        print(f"Venues: {', '.join(self.venues)}")
+        while True:
+            venue_name = input("Select a venue: ")
+            if venue_name in self.venues:
+                break
+            print("Invalid venue. Please select from the list.")
+        
+        while True:
+            try:
+                expected_attendance = int(input("Enter expected attendance: "))
+                if expected_attendance <= 0:
+                    print("Expected attendance must be a positive number.")
+                    continue
+                break
+            except ValueError:
+                print("Please enter a valid number.")
+        
+        purpose = input("Enter purpose of the event: ")
+        exceptions = [d.strip() for d in input("Dates to skip, comma-separated (optional): ").split(',') if d.strip()]
+        
+        series = {
+            "club": club_name,
+            "event_name": event_name,
+            "contact_email": contact_email,
+            "venue": venue_name,
+            "time_slot": time_slot,
+            "expected_attendance": expected_attendance,
+            "purpose": purpose,
+            "first_date": first_date,
+            "until": until,
+            "interval_weeks": interval_weeks,
+            "exceptions": exceptions
+        }
+        
+        # Check every date at once and offer to skip the ones that are taken
+        conflicts = self.storage.check_series(series)
+        if conflicts is None:
+            print("\n❌ The series is not valid. Please try again.")
             return
+        if not conflicts.empty:
+            taken = sorted(set(conflicts['date']))
+            print(f"\n{venue_name} is already taken on {len(taken)} of these dates: {', '.join(taken)}")
+            if input("Skip those dates and book the rest? (y/n): ").lower() != 'y':
+                return
+            series["exceptions"] = exceptions + taken
+        
+        series_id = self.storage.save_series(series)
+        if series_id:
+            print(f"\n✅ Recurring booking submitted successfully! Series ID: {series_id}")
+            print("The whole series is pending admin approval.")
+        else:
+            print("\n❌ Failed to submit the recurring booking. Please try again.")
+
+    def view_club_bookings(self, page_size=10):
+        """View all bookings for a club, one page at a time"""
+        club_name = input("Enter club name to view bookings: ")
+        club_bookings = self.get_club_bookings(club_name)
+        total = len(club_bookings)
+        page = 1
         
-        print(f"\n===== Booking Requests for {club_name} =====")
-        for _, booking in club_bookings.iterrows():
-            status_icon = "✅" if booking["status"] == "Approved" else "❌" if booking["status"] == "Rejected" else "⏳"
-            print(f"ID: {booking['id']} | {status_icon} {booking['status']}")
-            print(f"Event: {booking['event_name']}")
-            print(f"Venue: {booking['venue']} on {booking['date']} ({booking['day']}) at {booking['time_slot']}")
-            if pd.notna(booking["admin_comment"]) and booking["admin_comment"]:
-                print(f"Admin Comment: {booking['admin_comment']}")
+        while True:
+            if total == 0:
+                if not self.view_club_series(club_name):
+                    print(f"No booking requests found for {club_name}.")
+                return
+            
+            pages = (total + page_size - 1) // page_size
+            print(f"\n===== Booking Requests for {club_name} (page {page}/{pages}) =====")
+            for booking in club_bookings[(page - 1) * page_size:page * page_size]:
+                self.print_booking(booking)
+            
+            if pages == 1:
+                self.view_club_series(club_name)
+                return
+            choice = input("Enter=next page, p=previous page, q=done: ").lower()
+            if choice == 'q' or (choice != 'p' and page == pages):
+                self.view_club_series(club_name)
+                return
+            page = max(page - 1, 1) if choice == 'p' else page + 1
+
+    def view_club_series(self, club_name):
+        """List a club's recurring bookings; returns False if it has none"""
+        club_series = self.get_club_series(club_name)
+        if not club_series:
+            return False
+        print(f"\n===== Recurring Bookings for {club_name} =====")
+        for series in club_series:
+            status_icon = "✅" if series.status == "Approved" else "❌" if series.status == "Rejected" else "⏳"
+            every = "weekly" if series.interval_weeks == 1 else "every two weeks"
+            print(f"Series ID: {series.series_id} | {status_icon} {series.status}")
+            print(f"Event: {series.event_name}")
+            print(f"Venue: {series.venue} at {series.time_slot}, {every} from {series.first_date} "
+                  f"until {series.until}")
+            if series.exceptions:
+                print(f"Skipped dates: {series.exceptions.replace(';', ', ')}")
+            if series.admin_comment:
+                print(f"Admin Comment: {series.admin_comment}")
             print("-" * 40)
+        return True
+
+    def print_booking(self, booking):
+        """Print one BookingRecord"""
+        status_icon = "✅" if booking.status == "Approved" else "❌" if booking.status == "Rejected" else "⏳"
+        print(f"ID: {booking.id} | {status_icon} {booking.status}")
+        print(f"Event: {booking.event_name}")
+        print(f"Venue: {booking.venue} on {booking.date} ({booking.day}) at {booking.time_slot}")
+        if booking.admin_comment:
+            print(f"Admin Comment: {booking.admin_comment}")
+        print("-" * 40)
+
+    def check_booking(self):
+        """Look up one booking request by its ID"""
+        try:
+            booking_id = int(input("Enter booking request ID: "))
+        except ValueError:
+            print("Please enter a valid number.")
+            return
+        booking = self.get_booking(booking_id)
+        if booking is None:
+            print(f"No booking request with ID {booking_id}.")
+            return
+        print()
+        self.print_booking(booking)
+
+    def find_free_slots(self):
+        """Interactive search for free venue time across a date range"""
+        print("\n===== Find Free Slots =====\n")
+        try:
+            duration = int(input("Event length in minutes (e.g. 90): "))
+            if duration <= 0:
+                print("The length must be a positive number.")
+                return
+        except ValueError:
+            print("Please enter a valid number.")
+            return
+        
+        date_from = input("From date (YYYY-MM-DD): ").strip()
+        date_to = input("To date (YYYY-MM-DD): ").strip() or date_from
+        try:
+            datetime.strptime(date_from, "%Y-%m-%d")
+            datetime.strptime(date_to, "%Y-%m-%d")
+        except ValueError:
+            print("Invalid date format. Please enter in YYYY-MM-DD format.")
+            return
+        
+        try:
+            min_capacity = int(input("Expected attendance (Enter for any): ") or 0)
+        except ValueError:
+            print("Please enter a valid number.")
+            return
+        print(f"Categories: {', '.join(self.categories)}")
+        categories = [c.strip() for c in input("Categories, comma-separated (Enter for all): ").split(',') if c.strip()]
+        show_all = input("Show (e)arliest 10 options or (a)ll free gaps? [e]: ").strip().lower() == 'a'
+        
+        slots = self.storage.find_free_slots(self.venues, duration, date_from, date_to, min_capacity=min_capacity,
+                                             categories=categories or None, limit=None if show_all else 10)
+        if slots.empty:
+            print("No free slots match your search.")
+            return
+        
+        title = "Free gaps" if show_all else "Earliest options"
+        print(f"\n===== {title} ({len(slots)}) =====")
+        for _, slot in slots.iterrows():
+            print(f"{slot['date']} ({slot['day']}) {slot['time_slot']} - {slot['venue']} "
+                  f"({slot['category']}, capacity {slot['capacity']})")
 
     def run(self):
         """Main menu for the Club Portal"""
         while True:
             print("\n===== Club Portal Menu =====")
             print("1. Submit New Booking Request")
-            print("2. View My Club's Bookings")
-            print("3. Exit")
+            print("2. Submit Recurring Booking Request")
+            print("3. View My Club's Bookings")
+            print("4. Check a Booking Request")
+            print("5. Find Free Slots")
+            print("6. Exit")
             
-            choice = input("\nEnter your choice (1-3): ")
+            choice = input("\nEnter your choice (1-6): ")
             
             if choice == "1":
                 self.submit_booking_request()
             elif choice == "2":
-                self.view_club_bookings()
+                self.submit_recurring_request()
             elif choice == "3":
+                self.view_club_bookings()
+            elif choice == "4":
+                self.check_booking()
+            elif choice == "5":
+                self.find_free_slots()
+            elif choice == "6":
                 print("Thank you for using the Club Portal. Goodbye!")
                 sys.exit(0)
             else:
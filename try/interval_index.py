@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Interval Index Module - For fast venue conflict lookups
+Part of the Venue Booking System
+"""
+
+from bisect import bisect_left, bisect_right
+import numpy as np
+import pandas as pd
+
+# Bookings in these states hold their venue slot
+ACTIVE_STATUSES = ('Pending', 'Approved')
+
+SLOT_PATTERN = r'^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$'
+
+
+def parse_time_slot(time_slot):
+    """Parse an "HH:MM-HH:MM" slot into (start, end) minutes since midnight"""
+    start, end = time_slot.split('-')
+    start_h, start_m = start.split(':')
+    end_h, end_m = end.split(':')
+    for hour, minute in ((start_h, start_m), (end_h, end_m)):
+        if not (0 <= int(hour) < 24 and 0 <= int(minute) < 60):
+            raise ValueError(f"time slot out of range: {time_slot}")
+    start_min = int(start_h) * 60 + int(start_m)
+    end_min = int(end_h) * 60 + int(end_m)
+    return start_min, end_min
+
+
+def format_time_slot(start_min, end_min):
+    """Inverse of parse_time_slot: (start, end) minutes since midnight to an "HH:MM-HH:MM" slot"""
+    return f"{start_min // 60:02d}:{start_min % 60:02d}-{end_min // 60:02d}:{end_min % 60:02d}"
+
+
+def parse_time_slots(time_slots):
+    """Vectorized parse_time_slot, returns (starts, ends) int arrays with -1 for invalid slots"""
+    parts = pd.Series(time_slots, dtype=object).astype(str).str.extract(SLOT_PATTERN).astype(float)
+    hours = parts[[0, 2]].to_numpy()
+    minutes = parts[[1, 3]].to_numpy()
+    valid = ((hours < 24) & (minutes < 60)).all(axis=1)
+    minutes_of_day = np.where(valid[:, None], hours * 60 + minutes, -1).astype(np.int32)
+    return minutes_of_day[:, 0], minutes_of_day[:, 1]
+
+
+def free_gaps(intervals, day_start, day_end):
+    """Free [start, end) gaps between day_start and day_end.
+
+    intervals are (start, end, ...) tuples sorted by start; overlapping and
+    touching intervals are merged in the same single pass.
+    """
+    gaps = []
+    cursor = day_start
+    for interval in intervals:
+        start, end = interval[0], interval[1]
+        if start > cursor:
+            gaps.append((cursor, min(start, day_end)))
+        cursor = max(cursor, end)
+        if cursor >= day_end:
+            break
+    if cursor < day_end:
+        gaps.append((cursor, day_end))
+    return [(start, end) for start, end in gaps if start < end]
+
+
+class _DayIntervals:
+    """Sorted booked intervals of one venue on one date"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+        self.rows = []
+        # max_end[i] is the latest end among the first i+1 intervals
+        self.max_end = []
+
+    def _rebuild_max_end(self, start_at):
+        running = self.max_end[start_at - 1] if start_at > 0 else -1
+        del self.max_end[start_at:]
+        for end in self.ends[start_at:]:
+            running = max(running, end)
+            self.max_end.append(running)
+
+    def add(self, start, end, booking_id, row):
+        pos = bisect_right(self.starts, start)
+        self.starts.insert(pos, start)
+        self.ends.insert(pos, end)
+        self.ids.insert(pos, booking_id)
+        self.rows.insert(pos, row)
+        self.max_end.insert(pos, 0)
+        self._rebuild_max_end(pos)
+
+    def remove(self, booking_id):
+        try:
+            pos = self.ids.index(booking_id)
+        except ValueError:
+            return False
+        for column in (self.starts, self.ends, self.ids, self.rows, self.max_end):
+            del column[pos]
+        self._rebuild_max_end(pos)
+        return True
+
+    def candidate_range(self, start, end):
+        """Positions [lo, hi) that can overlap (start, end)"""
+        # Only intervals starting before our end can overlap ...
+        hi = bisect_left(self.starts, end)
+        # ... and the prefix whose latest end is <= our start cannot
+        lo = bisect_right(self.max_end, start, 0, hi)
+        return lo, hi
+
+
+class VenueIntervalIndex:
+    """Index of Pending/Approved booking intervals keyed by (venue, date)"""
+
+    def __init__(self):
+        self._days = {}
+        # date -> venues that have at least one interval on that date
+        self._venues_by_date = {}
+
+    @classmethod
+    def from_bookings(cls, bookings_df):
+        """Build the index from a bookings DataFrame (row positions are iloc positions)"""
+        index = cls()
+        if bookings_df.empty:
+            return index
+        if 'start_min' in bookings_df.columns:
+            starts, ends = bookings_df['start_min'], bookings_df['end_min']
+        else:
+            starts, ends = parse_time_slots(bookings_df['time_slot'])
+        columns = zip(
+            range(len(bookings_df)),
+            bookings_df['id'], bookings_df['venue'], bookings_df['date'],
+            starts, ends, bookings_df['status']
+        )
+        for row, booking_id, venue, date, start, end, status in columns:
+            if status not in ACTIVE_STATUSES or start < 0:
+                continue
+            index.add(venue, date, int(start), int(end), booking_id, row)
+        return index
+
+    def add(self, venue, date, start, end, booking_id, row):
+        """Add a booked interval"""
+        day = self._days.get((venue, date))
+        if day is None:
+            day = self._days[(venue, date)] = _DayIntervals()
+            self._venues_by_date.setdefault(date, set()).add(venue)
+        day.add(start, end, booking_id, row)
+
+    def remove(self, venue, date, booking_id):
+        """Remove a booking's interval, returns False if it was not indexed"""
+        day = self._days.get((venue, date))
+        if day is None or not day.remove(booking_id):
+            return False
+        if not day.ids:
+            del self._days[(venue, date)]
+            self._venues_by_date[date].discard(venue)
+            if not self._venues_by_date[date]:
+                del self._venues_by_date[date]
+        return True
+
+    def is_free(self, venue, date, start, end):
+        """True if nothing indexed on (venue, date) overlaps [start, end)"""
+        day = self._days.get((venue, date))
+        if day is None:
+            return True
+        lo, hi = day.candidate_range(start, end)
+        return lo >= hi
+
+    def busy_venues(self, date, start, end):
+        """Venues with an interval overlapping [start, end) on date"""
+        busy = set()
+        for venue in self._venues_by_date.get(date, ()):
+            lo, hi = self._days[(venue, date)].candidate_range(start, end)
+            if lo < hi:
+                busy.add(venue)
+        return busy
+
+    def candidate_rows(self, venue, date, start=None, end=None):
+        """Row positions that can overlap [start, end), in file order.
+
+        Without start/end every indexed row of (venue, date) is returned. The
+        result is a superset: callers still apply the exact overlap test.
+        """
+        day = self._days.get((venue, date))
+        if day is None:
+            return []
+        if start is None:
+            return sorted(day.rows)
+        lo, hi = day.candidate_range(start, end)
+        return sorted(day.rows[lo:hi])
+
+    def free_gaps(self, venue, date, day_start, day_end):
+        """Free (start, end) gaps of a venue on a date within [day_start, day_end)"""
+        day = self._days.get((venue, date))
+        if day is None:
+            return [(day_start, day_end)] if day_start < day_end else []
+        return free_gaps(zip(day.starts, day.ends), day_start, day_end)
+
+    def intervals(self, venue, date):
+        """Sorted (start, end, booking_id) tuples booked on (venue, date)"""
+        day = self._days.get((venue, date))
+        if day is None:
+            return []
+        return list(zip(day.starts, day.ends, day.ids))
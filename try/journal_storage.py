@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Journal Storage Module - Bookings as a snapshot plus an append-only journal of changes
+Part of the Venue Booking System
+
+The CSV backend rewrites all of bookings.csv on every commit. This backend
+appends one line per commit to bookings.journal instead: the rows the
+commit created and the new venue/status/processed_at/admin_comment of the
+rows it changed, numbered by a sequence number and protected by a CRC-32.
+bookings.csv becomes a snapshot of the table at the sequence number in
+bookings.csv.version, and the current table is that snapshot with the
+journal events after it replayed on top.
+
+Recovery is deterministic: a line that was cut short or fails its
+checksum ends the journal, and the next writer truncates it away. Replay
+is idempotent (created rows that already exist are updated, changes set
+absolute values), so a crash between writing a snapshot and trimming the
+journal leaves a state that replays to the same table.
+
+Every compact_every commits a background thread writes the resident table
+as a new snapshot, then trims the journal to the events after it. Other
+processes follow the journal by reading only the bytes appended since
+they last looked.
+
+    python journal_storage.py status|compact|recover
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from storage import BookingStorage, BOOKING_COLUMNS, SLOT_COLUMNS, file_lock
+from metrics import instrumented, record_error, record_rows_read, record_rows_written, record_bytes_written
+
+# Columns a commit can change on an existing booking
+MUTABLE_COLUMNS = ['venue', 'status', 'processed_at', 'admin_comment']
+
+
+def encode_event(seq, created_json='[]', changed_json='[]', rows_json=None):
+    """One journal line: CRC-32 of the payload in hex, a space, the JSON payload.
+
+    rows_json, if given, replaces the whole table before created/changed apply.
+    """
+    payload = f'{{"seq": {seq}, "created": {created_json}, "changed": {changed_json}'
+    if rows_json is not None:
+        payload += f', "rows": {rows_json}'
+    payload = (payload + '}').encode('utf-8')
+    return b'%08x ' % zlib.crc32(payload) + payload + b'\n'
+
+
+def decode_events(data):
+    """(end offset, event) of the intact lines at the start of data.
+
+    Stops at the first line that is incomplete, fails its checksum or does
+    not continue the sequence, so everything after damage is ignored.
+    """
+    events = []
+    position = 0
+    previous = None
+    while True:
+        end = data.find(b'\n', position)
+        if end < 0:
+            break
+        try:
+            checksum, payload = data[position:end].split(b' ', 1)
+            if int(checksum, 16) != zlib.crc32(payload):
+                break
+            event = json.loads(payload)
+        except ValueError:
+            break
+        if previous is not None and event['seq'] != previous + 1:
+            break
+        previous = event['seq']
+        position = end + 1
+        events.append((position, event))
+    return events
+
+
+@instrumented
+class JournalBookingStorage(BookingStorage):
+    """BookingStorage that journals each commit instead of rewriting the bookings file"""
+
+    def __init__(self, compact_every=1000, **kwargs):
+        super().__init__(**kwargs)
+        self.journal_file = os.path.splitext(self.bookings_file)[0] + ".journal"
+        # Compactions of all processes take turns on this lock; writers never wait for it
+        self.compact_lock_file = self.bookings_file + ".compact.lock"
+        self.compact_every = compact_every
+        # Sequence number of the last event in the resident table
+        self._seq = None
+        # Where this process has read the journal up to. The journal is told
+        # apart by inode and the snapshot it follows, as inodes get reused
+        self._journal_id = None
+        self._journal_offset = 0
+        self._journal_events = 0
+        # Guards the fields above against the compaction thread
+        self._state_lock = threading.RLock()
+        self._compaction = None
+
+    # ----- reading: snapshot plus journal tail -----
+
+    def _snapshot_seq(self):
+        """Sequence number the snapshot file reflects"""
+        return BookingStorage._read_version(self)
+
+    def _cached_bookings(self):
+        """Return the resident table, applying any journal events appended since the last call"""
+        with self._state_lock:
+            if self._bookings_cache is not None and self._catch_up():
+                self.cache_stats['bookings']['hits'] += 1
+            # Nothing resident yet, or it fell behind a newer snapshot
+            if self._bookings_cache is None:
+                self.cache_stats['bookings']['misses'] += 1
+                self._load_snapshot()
+            return self._bookings_cache
+
+    def _load_snapshot(self):
+        """Read the snapshot and replay the journal after it"""
+        for _ in range(3):
+            seq = self._snapshot_seq()
+            try:
+                df = pd.read_csv(self.bookings_file)
+                record_rows_read(len(df))
+            except Exception as e:
+                # Never replace an unreadable table with an empty one: writers must fail, not erase it
+                print(f"Error reading bookings snapshot: {e}")
+                record_error(e)
+                raise
+            self._add_slot_columns(df)
+            self._bookings_cache = df
+            self._interval_index = None
+            self._seq = self._bookings_version = seq
+            self._journal_id = None
+            self._journal_offset = self._journal_events = 0
+            if self._catch_up() is not None:
+                return
+        # A compaction replaced the snapshot three times while we read it; only a damaged store gets here
+        self._bookings_cache = None
+        raise RuntimeError("the bookings journal does not continue the snapshot")
+
+    def _catch_up(self):
+        """Apply the journal events appended since we last looked.
+
+        Returns True if there were none, False if some were applied and None
+        if the resident table fell behind a newer snapshot (it is dropped).
+        """
+        try:
+            f = open(self.journal_file, 'rb')
+        except FileNotFoundError:
+            self._journal_id = None
+            self._journal_offset = self._journal_events = 0
+            return True
+        with f:
+            st = os.fstat(f.fileno())
+            journal_id = (st.st_ino, self._snapshot_seq())
+            if journal_id != self._journal_id:
+                # A new journal after a compaction: fine unless its snapshot is ahead of us
+                if journal_id[1] > self._seq:
+                    self._bookings_cache = None
+                    return None
+                self._journal_id = journal_id
+                self._journal_offset = self._journal_events = 0
+            elif st.st_size == self._journal_offset:
+                return True
+            f.seek(self._journal_offset)
+            data = f.read()
+
+        events = decode_events(data)
+        if not events:
+            return True
+        self._journal_offset += events[-1][0]
+        self._journal_events += len(events)
+        fresh = [event for _, event in events if event['seq'] > self._seq]
+        if not fresh:
+            return True
+        if fresh[0]['seq'] != self._seq + 1:
+            # Events we never saw were compacted into a snapshot we have not read
+            self._bookings_cache = None
+            return None
+        self._apply_events(fresh)
+        self._seq = self._bookings_version = fresh[-1]['seq']
+        return False
+
+    def _apply_events(self, events):
+        """Replay events on the resident table (never in place: readers may hold the old one)"""
+        df = self._bookings_cache
+        resets = [i for i, event in enumerate(events) if 'rows' in event]
+        if resets:
+            # Only what follows the last full table matters
+            events = events[resets[-1]:]
+            df = pd.DataFrame(events[0]['rows'], columns=BOOKING_COLUMNS)
+            self._add_slot_columns(df)
+            record_rows_read(len(df))
+        created = [row for event in events for row in event['created']]
+        changed = [row for event in events for row in event['changed']]
+        if not created and not changed:
+            self._bookings_cache = df
+            self._interval_index = None
+            return
+        updates = pd.DataFrame(changed, columns=['id'] + MUTABLE_COLUMNS)
+        if created:
+            created = pd.DataFrame(created, columns=BOOKING_COLUMNS)
+            # Replaying over a snapshot that already has them: only the mutable columns can differ
+            known = created['id'].isin(df['id'])
+            updates = pd.concat([created.loc[known, ['id'] + MUTABLE_COLUMNS], updates], ignore_index=True)
+            created = created[~known]
+            self._add_slot_columns(created)
+            df = pd.concat([df, created], ignore_index=True)
+            record_rows_read(len(created))
+        else:
+            df = df.copy()
+        if not updates.empty:
+            # Later events win; every event sets absolute values
+            updates = updates.drop_duplicates('id', keep='last')
+            positions = pd.Index(df['id']).get_indexer(updates['id'])
+            found = positions >= 0
+            rows = df.index[positions[found]]
+            for column in MUTABLE_COLUMNS:
+                df[column] = df[column].astype(object)
+                df.loc[rows, column] = updates[column].to_numpy()[found]
+            record_rows_read(int(found.sum()))
+        self._bookings_cache = df
+        self._interval_index = None
+
+    def _read_version(self):
+        """The store's commit counter: the sequence number of the last journal event"""
+        with self._state_lock:
+            self._cached_bookings()
+            return self._seq
+
+    # ----- writing: one journal line per commit -----
+
+    def _append_event(self, created_json='[]', changed_json='[]', rows_json=None):
+        """Append the next event; the caller holds the bookings lock and has caught up"""
+        seq = self._seq + 1
+        line = encode_event(seq, created_json, changed_json, rows_json)
+        with open(self.journal_file, 'ab') as f:
+            st = os.fstat(f.fileno())
+            if self._journal_id is None or st.st_ino != self._journal_id[0]:
+                # We just created the journal
+                self._journal_id = (st.st_ino, self._snapshot_seq())
+                self._journal_offset = self._journal_events = 0
+            if st.st_size > self._journal_offset:
+                # A writer died halfway through its line: drop the torn bytes before appending
+                f.truncate(self._journal_offset)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        record_bytes_written(len(line))
+        self._journal_offset += len(line)
+        self._journal_events += 1
+        self._seq = self._bookings_version = seq
+        return seq
+
+    def _journal_change(self, old_df, new_df):
+        """Append the difference between the resident table and new_df as one event"""
+        old_ids = old_df['id'].to_numpy()
+        if len(new_df) < len(old_df) or not np.array_equal(new_df['id'].to_numpy()[:len(old_df)], old_ids):
+            # Not rows added or updated (the write methods never do this): journal the whole table
+            self._append_event(rows_json=new_df[BOOKING_COLUMNS].to_json(orient='records'))
+            record_rows_written(len(new_df))
+            self._bookings_cache = new_df
+            self._interval_index = None
+            return
+        head = new_df.iloc[:len(old_df)]
+        changed = np.zeros(len(old_df), dtype=bool)
+        for column in MUTABLE_COLUMNS:
+            before, after = old_df[column].to_numpy(), head[column].to_numpy()
+            differs = np.flatnonzero(before != after)
+            # NaN never equals itself; only the few differing cells need the slower check
+            both_missing = pd.isna(before[differs]) & pd.isna(after[differs])
+            changed[differs[~both_missing]] = True
+        created = new_df.iloc[len(old_df):]
+        self._append_event(created[BOOKING_COLUMNS].to_json(orient='records'),
+                           head.loc[changed, ['id'] + MUTABLE_COLUMNS].to_json(orient='records'))
+        record_rows_written(len(created) + int(changed.sum()))
+        # The change's on_commit keeps the interval index in step, as for the CSV backend
+        self._bookings_cache = new_df
+        if self.compact_every and self._journal_events >= self.compact_every:
+            self._start_compaction()
+
+    def _commit_bookings(self, change):
+        """Apply a change and journal it without losing concurrent updates (see BookingStorage).
+
+        Losing a race costs only reading the winner's journal lines, not the table.
+        """
+        attempts = self.max_commit_retries if self.write_mode == 'optimistic' else 0
+        for attempt in range(attempts):
+            with self._state_lock:
+                bookings_df = self._cached_bookings()
+                base_seq = self._seq
+            outcome = change(bookings_df)
+            if outcome is None:
+                return None
+            new_df, result, on_commit = outcome
+            with file_lock(self.lock_file), self._state_lock:
+                committed = self._read_version() == base_seq
+                if committed:
+                    self._journal_change(bookings_df, new_df)
+            if committed:
+                if on_commit is not None:
+                    on_commit()
+                return result
+            time.sleep(random.uniform(0, min(0.002 * 2 ** attempt, 0.05)))
+
+        with file_lock(self.lock_file), self._state_lock:
+            bookings_df = self._cached_bookings()
+            outcome = change(bookings_df)
+            if outcome is None:
+                return None
+            new_df, result, on_commit = outcome
+            self._journal_change(bookings_df, new_df)
+        if on_commit is not None:
+            on_commit()
+        return result
+
+    def _bump_version(self):
+        """Record a series commit as an empty event, keeping one sequence number per commit"""
+        with self._state_lock:
+            self._cached_bookings()
+            return self._append_event()
+
+    def save_bookings(self, bookings_df):
+        """Replace the whole table with a new snapshot (overwrites concurrent changes)"""
+        try:
+            if not set(SLOT_COLUMNS).issubset(bookings_df.columns):
+                self._add_slot_columns(bookings_df)
+            with file_lock(self.compact_lock_file), file_lock(self.lock_file), self._state_lock:
+                try:
+                    self._cached_bookings()
+                except Exception:
+                    # Replacing a damaged store is how it gets repaired
+                    self._write_snapshot(bookings_df, self._snapshot_seq() + 1)
+                else:
+                    # The journal line is the commit; the snapshot after it only spares replaying it
+                    seq = self._append_event(rows_json=bookings_df[BOOKING_COLUMNS].to_json(orient='records'))
+                    record_rows_written(len(bookings_df))
+                    self._write_snapshot(bookings_df, seq)
+            self._interval_index = None
+            return True
+        except Exception as e:
+            print(f"Error saving bookings: {e}")
+            record_error(e)
+            return False
+
+    def _write_snapshot(self, bookings_df, seq):
+        """Make bookings_df the snapshot at seq with an empty journal.
+
+        The caller holds the compaction and bookings locks and has journaled
+        the table as event seq. The snapshot is written before its sequence
+        number and the journal is emptied last, so a crash in between
+        replays the old journal onto one of the two snapshots, ending with
+        the same table.
+        """
+        self._replace_file(self.bookings_file,
+                           lambda f: bookings_df.to_csv(f, index=False, columns=BOOKING_COLUMNS))
+        record_rows_written(len(bookings_df))
+        record_bytes_written(os.path.getsize(self.bookings_file))
+        self._replace_file(self.version_file, lambda f: f.write(str(seq)))
+        self._replace_file(self.journal_file, lambda f: None)
+        self._journal_id = (os.stat(self.journal_file).st_ino, seq)
+        self._journal_offset = self._journal_events = 0
+        self._bookings_cache = bookings_df
+        self._seq = self._bookings_version = seq
+
+    # ----- compaction -----
+
+    def _start_compaction(self):
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._compaction = threading.Thread(target=self._compact_quietly, name="journal-compaction", daemon=True)
+        self._compaction.start()
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Error compacting the bookings journal: {e}")
+            record_error(e)
+
+    def compact(self):
+        """Write the table as a new snapshot and trim the journal to the events after it.
+
+        The snapshot is written without holding the bookings lock, so
+        writers keep committing meanwhile; only trimming the journal waits
+        for it. Returns the sequence number of the new snapshot, or None if
+        there was nothing to compact.
+        """
+        with file_lock(self.compact_lock_file):
+            with self._state_lock:
+                bookings_df = self._cached_bookings()
+                seq, journal_id, offset = self._seq, self._journal_id, self._journal_offset
+            if seq <= self._snapshot_seq():
+                return None
+            self._replace_file(self.bookings_file,
+                               lambda f: bookings_df.to_csv(f, index=False, columns=BOOKING_COLUMNS))
+            record_rows_written(len(bookings_df))
+            with file_lock(self.lock_file), self._state_lock:
+                # Only snapshots replace the journal, and they all hold the compaction lock
+                with open(self.journal_file, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+                events = decode_events(tail)
+                tail = tail[:events[-1][0]] if events else b''
+                self._replace_file(self.version_file, lambda f: f.write(str(seq)))
+                self._replace_file(self.journal_file, lambda f: f.write(tail.decode('utf-8')))
+                # Our own reading position moves with the tail we keep
+                ahead = self._journal_offset - offset if self._journal_id == journal_id else 0
+                self._journal_id = (os.stat(self.journal_file).st_ino, seq)
+                self._journal_offset = ahead
+                self._journal_events = len(decode_events(tail[:ahead]))
+            return seq
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished"""
+        if self._compaction is not None:
+            self._compaction.join()
+
+    # ----- inspection -----
+
+    def journal_status(self):
+        """Snapshot sequence number, intact journal events and damaged bytes at the end"""
+        try:
+            with open(self.journal_file, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        events = decode_events(data)
+        intact = events[-1][0] if events else 0
+        return {
+            'snapshot_seq': self._snapshot_seq(),
+            'journal_events': len(events),
+            'last_seq': events[-1][1]['seq'] if events else self._snapshot_seq(),
+            'journal_bytes': len(data),
+            'torn_bytes': len(data) - intact,
+        }
+
+    def recover(self):
+        """Drop a torn journal tail and return the recovered table's sequence number and digest"""
+        with file_lock(self.lock_file), self._state_lock:
+            self.invalidate_cache()
+            bookings_df = self._cached_bookings()
+            if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) > self._journal_offset:
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(self._journal_offset)
+                    os.fsync(f.fileno())
+            return self._seq, table_digest(bookings_df)
+
+
+def table_digest(bookings_df):
+    """SHA-256 of the table sorted by id, to compare states across runs and machines"""
+    table = bookings_df[BOOKING_COLUMNS].sort_values('id', kind='stable')
+    return hashlib.sha256(table.to_csv(index=False).encode('utf-8')).hexdigest()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, compact or recover the bookings journal")
+    parser.add_argument("command", choices=["status", "compact", "recover"])
+    args = parser.parse_args()
+
+    storage = JournalBookingStorage(compact_every=None)
+    if args.command == "status":
+        status = storage.journal_status()
+        print(f"Snapshot at #{status['snapshot_seq']}, {status['journal_events']} journal events up to "
+              f"#{status['last_seq']} ({status['journal_bytes']} bytes, {status['torn_bytes']} damaged)")
+    elif args.command == "compact":
+        seq = storage.compact()
+        print("Nothing to compact." if seq is None else f"Snapshot written at #{seq}.")
+    else:
+        seq, digest = storage.recover()
+        print(f"Recovered {len(storage.load_bookings())} bookings at #{seq}, digest {digest}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
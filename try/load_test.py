@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Load Test - Many concurrent clients against the booking service
+Part of the Venue Booking System
+
+Each client keeps one HTTP connection open and sends requests back to back
+for --duration seconds: mostly availability checks and booking queries,
+with --write-ratio of them submitting a booking. With --spawn a service is
+started on a scratch store first, so nothing real is touched.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+VENUES = ["Auditorium", "LT-1", "LT-2", "CR-1", "CR-2", "Sports Hall"]
+
+
+def random_call(rng, client_id, n, write_ratio):
+    """(method, body) of one API call"""
+    date = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    start = rng.randint(8, 20)
+    slot = f"{start:02d}:00-{start + 1:02d}:00"
+    if rng.random() < write_ratio:
+        return 'save_request', {'args': [{
+            'club': f"Club-{client_id}", 'event_name': f"Load test {client_id}-{n}",
+            'contact_email': f"club{client_id}@example.com", 'day': 'Monday', 'date': date,
+            'time_slot': slot, 'venue': rng.choice(VENUES), 'expected_attendance': 50,
+            'purpose': 'load test'
+        }], 'kwargs': {'check_available': True}}
+    if rng.random() < 0.7:
+        return 'get_available_venues', {'args': [VENUES, date, slot]}
+    return 'query_bookings', {'kwargs': {'club': f"Club-{client_id}", 'page_size': 10}}
+
+
+async def client(host, port, client_id, deadline, write_ratio, latencies, counts):
+    rng = random.Random(client_id)
+    reader, writer = await asyncio.open_connection(host, port)
+    n = 0
+    try:
+        while time.perf_counter() < deadline:
+            method, body = random_call(rng, client_id, n, write_ratio)
+            data = json.dumps(body).encode()
+            started = time.perf_counter()
+            writer.write(f"POST /api/{method} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+            await writer.drain()
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            counts['writes' if method == 'save_request' else 'reads'] += 1
+            if b' 200 ' not in status_line:
+                counts['errors'] += 1
+            n += 1
+    finally:
+        writer.close()
+
+
+async def fetch_stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET /stats HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+async def run(host, port, clients, duration, write_ratio):
+    latencies = []
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, c, deadline, write_ratio, latencies, counts)
+                           for c in range(clients)))
+    elapsed = time.perf_counter() - started
+    return latencies, counts, elapsed, await fetch_stats(host, port)
+
+
+def wait_for_service(host, port, timeout=30):
+    import http.client
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the booking service")
+    parser.add_argument("--url", default=os.environ.get("VENUE_BOOKING_URL", "http://127.0.0.1:8765"))
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--write-ratio", type=float, default=0.05, help="share of calls that submit a booking")
+    parser.add_argument("--spawn", action="store_true", help="start a service on a scratch store first")
+    parser.add_argument("--backend", help="backend of the spawned service (csv or sqlite)")
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    host, port = parts.hostname, parts.port or 80
+    service = None
+    if args.spawn:
+        workdir = tempfile.mkdtemp(prefix="booking-load-")
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "service.py"),
+                   "--host", host, "--port", str(port)]
+        if args.backend:
+            command += ["--backend", args.backend]
+        service = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL)
+        if not wait_for_service(host, port):
+            service.terminate()
+            print("The service did not start.")
+            return 1
+
+    try:
+        latencies, counts, elapsed, stats = asyncio.run(
+            run(host, port, args.clients, args.duration, args.write_ratio))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    total = counts['reads'] + counts['writes']
+    latencies = np.array(latencies) * 1000
+    print(f"{args.clients} clients for {elapsed:.1f}s: {total} requests "
+          f"({counts['reads']} reads, {counts['writes']} writes, {counts['errors']} errors)")
+    print(f"  throughput {total / elapsed:.0f} requests/s")
+    if total:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"  latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+    print(f"  service: {stats['commits']} write commits, largest batch {stats['largest_batch']}, "
+          f"queue depth {stats['queue_depth']}")
+    return 1 if counts['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Metrics Module - Call counts, latency histograms and I/O counters for the storage layer
+Part of the Venue Booking System
+
+Storage classes are wrapped with @instrumented: every public method counts
+calls, exceptions and latency, and the storage code reports rows read,
+rows written, bytes written and handled errors against the method that is
+running. Everything is off until enable() is called (or the
+VENUE_BOOKING_METRICS environment variable is set), and a disabled wrapper
+costs one global lookup per call.
+
+VENUE_BOOKING_METRICS is a comma-separated list of sinks, exported at exit:
+"json:metrics.json", "prometheus:metrics.prom" or "snapshot" (in-process
+only, read it with snapshot()).
+
+Run one command under cProfile with metrics on:
+    python metrics.py --profile admin.prof admin.py
+"""
+
+import argparse
+import atexit
+import cProfile
+import functools
+import inspect
+import json
+import os
+import pstats
+import runpy
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'))
+COUNTERS = ('calls', 'exceptions', 'errors', 'rows_read', 'rows_written', 'bytes_written')
+
+ENABLED = False
+_sinks = []
+_operations = {}
+_registry_lock = threading.Lock()
+_local = threading.local()
+
+
+class _Operation:
+    """Counters and latency histogram of one storage method"""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.latency_sum += seconds
+
+
+def _operation(name):
+    operation = _operations.get(name)
+    if operation is None:
+        with _registry_lock:
+            operation = _operations.setdefault(name, _Operation())
+    return operation
+
+
+def _current():
+    """Name of the instrumented method running on this thread"""
+    return getattr(_local, 'operation', None) or 'other'
+
+
+def _count(counter, amount):
+    if ENABLED:
+        _operation(_current()).counts[counter] += amount
+
+
+def record_rows_read(rows):
+    _count('rows_read', rows)
+
+
+def record_rows_written(rows):
+    _count('rows_written', rows)
+
+
+def record_bytes_written(n_bytes):
+    _count('bytes_written', n_bytes)
+
+
+def record_error(error=None):
+    """Count an error that the storage code handled instead of raising"""
+    _count('errors', 1)
+
+
+def instrumented(target):
+    """Instrument a function, or every public method of a class"""
+    if inspect.isclass(target):
+        for name, member in list(vars(target).items()):
+            if not name.startswith('_') and inspect.isfunction(member):
+                setattr(target, name, _wrap(member))
+        return target
+    return _wrap(target)
+
+
+def _wrap(func):
+    name = func.__name__
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            if not ENABLED:
+                yield from func(*args, **kwargs)
+                return
+            # Time spent between pages belongs to the caller, so only resumptions are timed
+            generator = func(*args, **kwargs)
+            while True:
+                with _Timer(name):
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED:
+            return func(*args, **kwargs)
+        with _Timer(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class _Timer:
+    """Times one call of an instrumented method and makes it the current operation"""
+
+    __slots__ = ('name', 'previous', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.previous = getattr(_local, 'operation', None)
+        _local.operation = self.name
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        _local.operation = self.previous
+        operation = _operation(self.name)
+        operation.counts['calls'] += 1
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            operation.counts['exceptions'] += 1
+        operation.observe(elapsed)
+        return False
+
+
+def enable(sinks=()):
+    """Start collecting; sinks are exported by export() and at interpreter exit"""
+    global ENABLED
+    ENABLED = True
+    for sink in sinks:
+        _sinks.append(sink)
+    if _sinks:
+        atexit.unregister(export)
+        atexit.register(export)
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    """Forget everything collected so far"""
+    with _registry_lock:
+        _operations.clear()
+
+
+def snapshot():
+    """Current metrics as a plain dict: {method: {counter: value, ..., latency: {...}}}"""
+    result = {}
+    for name, operation in sorted(_operations.items()):
+        counts = dict(operation.counts)
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, operation.buckets):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else repr(bound)] = cumulative
+        counts['latency'] = {'sum_seconds': operation.latency_sum, 'buckets': buckets}
+        result[name] = counts
+    return result
+
+
+def export():
+    """Write the current metrics to every configured sink"""
+    data = snapshot()
+    for sink in _sinks:
+        try:
+            sink.write(data)
+        except Exception as e:
+            print(f"Error exporting metrics: {e}")
+
+
+def _write_atomically(path, text):
+    """Replace path with text so scrapers never see a half-written file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class SnapshotSink:
+    """Keeps the last exported snapshot in memory"""
+
+    def __init__(self):
+        self.last = {}
+
+    def write(self, data):
+        self.last = data
+
+
+class JSONSink:
+    """Dumps the snapshot as JSON"""
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def write(self, data):
+        _write_atomically(self.path, json.dumps(data, indent=2))
+
+
+class PrometheusSink:
+    """Writes the Prometheus text exposition format (for the node exporter textfile collector)"""
+
+    def __init__(self, path, prefix="venue_booking_storage"):
+        self.path = os.path.abspath(path)
+        self.prefix = prefix
+
+    def write(self, data):
+        p = self.prefix
+        lines = []
+        for counter in COUNTERS:
+            lines.append(f"# TYPE {p}_{counter}_total counter")
+            for method, values in data.items():
+                lines.append(f'{p}_{counter}_total{{method="{method}"}} {values[counter]}')
+        lines.append(f"# TYPE {p}_latency_seconds histogram")
+        for method, values in data.items():
+            for bound, count in values['latency']['buckets'].items():
+                lines.append(f'{p}_latency_seconds_bucket{{method="{method}",le="{bound}"}} {count}')
+            lines.append(f'{p}_latency_seconds_sum{{method="{method}"}} {values["latency"]["sum_seconds"]}')
+            lines.append(f'{p}_latency_seconds_count{{method="{method}"}} {values["calls"]}')
+        _write_atomically(self.path, '\n'.join(lines) + '\n')
+
+
+def sinks_from_spec(spec):
+    """Parse "json:path,prometheus:path,snapshot" into sink objects"""
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, path = item.partition(':')
+        if kind == 'snapshot':
+            sinks.append(SnapshotSink())
+        elif kind == 'json':
+            sinks.append(JSONSink(path or 'metrics.json'))
+        elif kind in ('prometheus', 'prom'):
+            sinks.append(PrometheusSink(path or 'metrics.prom'))
+        else:
+            raise ValueError(f"Unknown metrics sink: {kind}")
+    return sinks
+
+
+def profile(script, args=(), output="storage.prof", top=25):
+    """Run one script under cProfile with metrics on, then print the hottest calls"""
+    if not ENABLED:
+        enable()
+    profiler = cProfile.Profile()
+    sys.argv = [script] + list(args)
+    try:
+        profiler.runcall(runpy.run_path, script, run_name='__main__')
+    except SystemExit:
+        pass
+    finally:
+        profiler.dump_stats(output)
+        print(f"\n===== Profile ({output}) =====")
+        pstats.Stats(output).sort_stats('cumulative').print_stats(top)
+        print("===== Storage metrics =====")
+        for method, values in snapshot().items():
+            print(f"{method:<32} calls {values['calls']:>6}  time {values['latency']['sum_seconds']:8.3f}s  "
+                  f"rows read {values['rows_read']:>8}  rows written {values['rows_written']:>8}  "
+                  f"errors {values['errors'] + values['exceptions']}")
+
+
+if os.environ.get('VENUE_BOOKING_METRICS'):
+    enable(sinks_from_spec(os.environ['VENUE_BOOKING_METRICS']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one portal command under cProfile with storage metrics")
+    parser.add_argument("--profile", default="storage.prof", help="where to write the cProfile stats")
+    parser.add_argument("--top", type=int, default=25, help="number of functions to print")
+    parser.add_argument("script", help="script to run, e.g. admin.py")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments for the script")
+    args = parser.parse_args()
+    profile(args.script, args.args, args.profile, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    # Run through the imported module so the storage code sees the same ENABLED flag
+    import metrics
+    sys.exit(metrics.main())
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+CSV to SQLite Migration - One-shot copy of bookings.csv, series.csv and the booking log
+Part of the Venue Booking System
+"""
+
+import argparse
+import os
+import sys
+from storage import BookingStorage
+from sqlite_storage import SQLiteBookingStorage
+
+
+def migrate(db_file="bookings.db", force=False):
+    """Copy the CSV bookings, recurring series and every log partition into db_file"""
+    csv_storage = BookingStorage()
+    bookings_df = csv_storage.load_bookings()
+    logs_df = csv_storage.load_logs()
+    series_df = csv_storage.get_series()
+
+    if os.path.exists(db_file) and not force:
+        sqlite_storage = SQLiteBookingStorage(db_file)
+        existing = sqlite_storage.conn.execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+        if existing:
+            print(f"{db_file} already holds {existing} bookings; use --force to replace them.")
+            return False
+    elif force and os.path.exists(db_file):
+        os.remove(db_file)
+    sqlite_storage = SQLiteBookingStorage(db_file)
+
+    sqlite_storage.import_tables(bookings_df, logs_df, series_df)
+    print(f"Migrated {len(bookings_df)} bookings, {len(series_df)} series and {len(logs_df)} log entries into {db_file}.")
+    sqlite_storage.close()
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the CSV booking store to SQLite")
+    parser.add_argument("--db", default=os.environ.get("VENUE_BOOKING_DB", "bookings.db"),
+                        help="SQLite database to create (default: bookings.db)")
+    parser.add_argument("--force", action="store_true", help="replace an existing database")
+    args = parser.parse_args()
+    sys.exit(0 if migrate(args.db, args.force) else 1)
@@ -0,0 +1,759 @@
+#!/usr/bin/env python3
+"""
+Notifications Module - E-mail clubs about decisions without waiting for the mail server
+Part of the Venue Booking System
+
+NotificationDispatcher listens to the storage: every approval or rejection
+becomes a message to the booking's contact_email. The message is written
+to a persistent outbox (outbox.jsonl) before the decision returns, and a
+pool of worker threads sends it in the background:
+
+- each worker keeps its SMTP connection open between messages,
+- messages to the same address that arrive within batch_delay seconds of
+  each other (a batch approval) go out as one e-mail,
+- a temporary failure is retried with exponential backoff, up to
+  max_attempts; a permanent one (5xx) is given up at once.
+
+The outbox records every queued message and what became of it, so
+messages queued by a process that crashed are sent by the next dispatcher
+to start. Delivery is at least once: a crash between the server accepting
+an e-mail and the outbox recording it sends it again. Only one process
+sends from an outbox at a time (it holds outbox.jsonl.owner); dispatchers
+in other processes only queue, and the sender picks their messages up.
+
+Sending is off unless VENUE_BOOKING_SMTP=host:port is set
+(VENUE_BOOKING_SMTP_FROM sets the sender address). LocalSMTPServer is a
+small stand-in server for trying it out:
+
+    python notifications.py server --port 8025
+    python notifications.py status|drain
+    python notifications.py benchmark --messages 2000 --workers 1,4,8
+"""
+
+import argparse
+import json
+import os
+import random
+import smtplib
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from email.message import EmailMessage
+from metrics import record_error
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_OUTBOX = "outbox.jsonl"
+DEFAULT_SENDER = "venue-booking@localhost"
+# Decisions that are worth an e-mail
+NOTIFY_STATUSES = ('Approved', 'Rejected')
+# A worker hangs up after this many idle seconds
+IDLE_SECONDS = 30
+
+
+def try_lock(path):
+    """Take an exclusive lock on path without waiting; returns the open file holding it, or None"""
+    f = open(path, 'a+')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return f
+    except OSError:
+        f.close()
+        return None
+
+
+def _lock(path):
+    """Blocking exclusive lock on path, as used by the storage writers"""
+    from storage import file_lock
+    return file_lock(path)
+
+
+# ----- messages -----
+
+def booking_message(row):
+    """(recipient, subject, body) telling a club the decision on a booking or series, or None"""
+    recipient = _text(row.get('contact_email'))
+    status = _text(row.get('status'))
+    if not recipient or status not in NOTIFY_STATUSES:
+        return None
+    club = _text(row.get('club')) or "club"
+    event_name = _text(row.get('event_name'))
+    if 'series_id' in row:
+        interval = int(float(row.get('interval_weeks') or 1))
+        when = (f"every {'week' if interval == 1 else f'{interval} weeks'} from {_text(row.get('first_date'))} "
+                f"until {_text(row.get('until'))}")
+        reference = f"Series ID: {row['series_id']}"
+    else:
+        when = f"on {_text(row.get('date'))} ({_text(row.get('day'))})"
+        reference = f"Request ID: {row.get('id')}"
+    lines = [
+        f"Dear {club},",
+        "",
+        f"Your request to book {_text(row.get('venue'))} for \"{event_name}\" {when} at "
+        f"{_text(row.get('time_slot'))} has been {status.lower()}.",
+    ]
+    comment = _text(row.get('admin_comment'))
+    if comment:
+        lines.append(f"Admin comment: {comment}")
+    lines += ["", reference]
+    return recipient, f"Venue booking {status.lower()}: {event_name}", "\n".join(lines)
+
+
+def _text(value):
+    # NaN never equals itself
+    if value is None or value != value:
+        return ''
+    return str(value)
+
+
+def compose(sender, recipient, messages):
+    """One e-mail carrying the queued messages of a recipient"""
+    email = EmailMessage()
+    email['From'] = sender
+    email['To'] = recipient
+    if len(messages) == 1:
+        email['Subject'] = messages[0]['subject']
+        email.set_content(messages[0]['body'])
+    else:
+        email['Subject'] = f"{len(messages)} venue booking updates"
+        email.set_content(("\n\n" + "-" * 40 + "\n\n").join(m['subject'] + "\n\n" + m['body'] for m in messages))
+    return email
+
+
+def is_permanent(error):
+    """Whether an SMTP failure will not go away on retry (a 5xx reply, for every recipient if refused)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        # {recipient: (code, message)}; 4xx refusals such as 450/451 are temporary
+        codes = [reply[0] for reply in error.recipients.values()]
+        return bool(codes) and all(code >= 500 for code in codes)
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+# ----- outbox -----
+
+class Outbox:
+    """Append-only JSON Lines file of queued messages and their outcome.
+
+    A queued line holds the message ({"id", "to", "subject", "body",
+    "queued_at"}); a done line ({"id", "done": "sent" or "failed",
+    "attempts"}) closes it. Appends from all processes take the same lock.
+    """
+
+    def __init__(self, path=DEFAULT_OUTBOX, fsync=True):
+        self.path = path
+        self.lock_file = path + ".lock"
+        self.fsync = fsync
+
+    def append(self, records):
+        """Durably append records (dicts), all in one write"""
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        with _lock(self.lock_file):
+            self._write(data)
+
+    def _write(self, data):
+        with open(self.path, 'a+b') as f:
+            # End a line cut short by a crash, so it does not swallow the first new one
+            if f.seek(0, os.SEEK_END) > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    data = '\n' + data
+            f.write(data.encode('utf-8'))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def read(self, offset=0):
+        """(records, end offset) of the complete lines from offset on"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], 0
+        # A line without its newline is still being written, or was cut short by a crash
+        end = data.rfind(b'\n') + 1
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+        return records, offset + end
+
+    def pending(self, records=None):
+        """Queued messages without a done line, oldest first"""
+        if records is None:
+            records = self.read()[0]
+        queued = OrderedDict()
+        for record in records:
+            if 'done' in record:
+                queued.pop(record['id'], None)
+            else:
+                queued[record['id']] = record
+        return list(queued.values())
+
+    def counts(self):
+        """Messages pending, sent and failed according to the file"""
+        records = self.read()[0]
+        done = [record['done'] for record in records if 'done' in record]
+        return {'pending': len(self.pending(records)), 'sent': done.count('sent'), 'failed': done.count('failed')}
+
+    def rewrite(self, records):
+        """Replace the file with records; the caller holds the lock. Returns the new size"""
+        data = "".join(json.dumps(record) + "\n" for record in records)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=".outbox-")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(data.encode('utf-8'))
+
+
+# ----- dispatcher -----
+
+class NotificationDispatcher:
+    """Background queue that e-mails booking decisions through a pool of SMTP workers"""
+
+    def __init__(self, host='localhost', port=25, sender=DEFAULT_SENDER, outbox_file=DEFAULT_OUTBOX,
+                 workers=4, batch_size=20, batch_delay=0.5, max_attempts=5, backoff=2.0,
+                 poll_interval=1.0, compact_every=1000, fsync=True, connect=None):
+        self.sender = sender
+        self.outbox = Outbox(outbox_file, fsync=fsync)
+        self.owner_file = outbox_file + ".owner"
+        self.n_workers = workers
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.compact_every = compact_every
+        # connect() returns a new SMTP client; replaced in tests and benchmarks
+        self.connect = connect or (lambda: smtplib.SMTP(host, port, timeout=30))
+        self.storage = None
+
+        self._cond = threading.Condition()
+        # recipient -> messages waiting for it, in arrival order
+        self._waiting = OrderedDict()
+        # Recipients a worker is sending to; their other messages wait so order is kept
+        self._busy = set()
+        self._in_flight = 0
+        # Ids queued in this process or picked up from the outbox, so none is sent twice
+        self._seen = set()
+        self._owner = None
+        self._offset = 0
+        self._done_since_compaction = 0
+        self._stopping = False
+        self._draining = False
+        self._threads = []
+        self.counters = dict.fromkeys(('queued', 'sent', 'emails', 'retries', 'failed', 'connections'), 0)
+        self.max_depth = 0
+        self.started_at = None
+
+    # ----- feeding the queue -----
+
+    def attach(self, storage):
+        """Queue a message for every decision committed through storage from now on"""
+        self.storage = storage
+        storage.subscribe(self.on_change)
+
+    def detach(self):
+        if self.storage is not None:
+            self.storage.unsubscribe(self.on_change)
+            self.storage = None
+
+    def on_change(self, event, old_rows, new_rows):
+        """Storage listener: e-mail the contact of every booking or series that was decided"""
+        if event not in ('status_changed', 'series_status_changed'):
+            return
+        messages = [booking_message(row) for row in new_rows.to_dict('records')]
+        messages = [m for m in messages if m is not None]
+        if messages:
+            self.enqueue(messages)
+
+    def enqueue(self, messages):
+        """Queue (recipient, subject, body) messages; returns once they are safe in the outbox"""
+        queued_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        records = [{'id': uuid.uuid4().hex, 'to': to, 'subject': subject, 'body': body, 'queued_at': queued_at}
+                   for to, subject, body in messages]
+        with _lock(self.outbox.lock_file):
+            self.outbox._write("".join(json.dumps(record) + "\n" for record in records))
+            with self._cond:
+                self.counters['queued'] += len(records)
+                # Otherwise the sending process picks them up from the outbox
+                if self._owner is not None:
+                    self._add(records)
+        return [record['id'] for record in records]
+
+    def _add(self, records):
+        """Put outbox records on the queue unless already there; the caller holds _cond"""
+        now = time.monotonic()
+        for record in records:
+            if record['id'] in self._seen:
+                continue
+            self._seen.add(record['id'])
+            message = dict(record, attempts=record.get('attempts', 0), arrived=now, not_before=now)
+            self._waiting.setdefault(message['to'], []).append(message)
+        self.max_depth = max(self.max_depth, self.depth())
+        self._cond.notify_all()
+
+    def depth(self):
+        """Messages waiting or being sent"""
+        return sum(len(messages) for messages in self._waiting.values()) + self._in_flight
+
+    def _feed(self):
+        """Become the sending process when possible, then follow the outbox for other processes' messages"""
+        while True:
+            with self._cond:
+                if self._stopping:
+                    return
+            try:
+                if self._owner is None:
+                    self._claim()
+                else:
+                    records, self._offset = self.outbox.read(self._offset)
+                    queued = [record for record in records if 'done' not in record]
+                    if queued:
+                        with self._cond:
+                            self._add(queued)
+                    if self.compact_every and self._done_since_compaction >= self.compact_every:
+                        self._compact()
+            except Exception as e:
+                print(f"Error reading the notification outbox: {e}")
+                record_error(e)
+            with self._cond:
+                if not self._stopping:
+                    self._cond.wait(self.poll_interval)
+
+    def _claim(self):
+        """Take over sending if no other process does, queueing whatever the outbox still holds"""
+        owner = try_lock(self.owner_file)
+        if owner is None:
+            return
+        with _lock(self.outbox.lock_file):
+            records, self._offset = self.outbox.read()
+            with self._cond:
+                self._owner = owner
+                self._add(self.outbox.pending(records))
+
+    def _compact(self):
+        """Drop the lines of finished messages from the outbox"""
+        with _lock(self.outbox.lock_file):
+            records, _ = self.outbox.read()
+            pending = self.outbox.pending(records)
+            with self._cond:
+                # Lines we had not read yet are still queued here, as _claim does
+                self._add(pending)
+                self._seen = set(record['id'] for record in pending)
+                self._offset = self.outbox.rewrite(pending)
+                self._done_since_compaction = 0
+
+    # ----- sending -----
+
+    def start(self):
+        """Start the workers and the outbox follower"""
+        self.started_at = time.monotonic()
+        self._threads = [threading.Thread(target=self._feed, name="notify-feed", daemon=True)]
+        self._threads += [threading.Thread(target=self._work, name=f"notify-{i}", daemon=True)
+                          for i in range(self.n_workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def _take_batch(self, now):
+        """(recipient, messages, None) ready to send, or (None, None, seconds until one may be).
+
+        The caller holds _cond.
+        """
+        wait = self.poll_interval
+        for recipient, messages in self._waiting.items():
+            if recipient in self._busy:
+                continue
+            # Give a burst for the same address time to gather, unless we are shutting down
+            ready_at = messages[0]['not_before']
+            if not self._draining:
+                ready_at = max(ready_at, messages[0]['arrived'] + self.batch_delay)
+            if ready_at > now:
+                wait = min(wait, ready_at - now)
+                continue
+            batch = [m for m in messages[:self.batch_size] if m['not_before'] <= now]
+            taken = set(m['id'] for m in batch)
+            rest = [m for m in messages if m['id'] not in taken]
+            if rest:
+                self._waiting[recipient] = rest
+            else:
+                del self._waiting[recipient]
+            self._busy.add(recipient)
+            self._in_flight += len(batch)
+            return recipient, batch, None
+        return None, None, wait
+
+    def _work(self):
+        smtp = None
+        last_used = time.monotonic()
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    recipient, batch, wait = self._take_batch(now)
+                    if recipient is not None:
+                        break
+                    if self._stopping and (not self._draining or not self._waiting):
+                        self._hang_up(smtp)
+                        return
+                    if smtp is not None and now - last_used > IDLE_SECONDS:
+                        self._hang_up(smtp)
+                        smtp = None
+                    self._cond.wait(wait)
+            smtp, error = self._send(smtp, recipient, batch)
+            last_used = time.monotonic()
+            self._finish(recipient, batch, error)
+
+    def _send(self, smtp, recipient, batch):
+        """Send one e-mail, reconnecting once if the kept connection went stale; returns (smtp, error)"""
+        email = compose(self.sender, recipient, batch)
+        for reused in (smtp is not None, False):
+            try:
+                if smtp is None:
+                    smtp = self.connect()
+                    with self._cond:
+                        self.counters['connections'] += 1
+                smtp.send_message(email)
+                return smtp, None
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                # The server answered: the connection is still good
+                return smtp, e
+            except (smtplib.SMTPException, OSError) as e:
+                self._hang_up(smtp)
+                smtp = None
+                if not reused:
+                    return None, e
+
+    def _hang_up(self, smtp):
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _finish(self, recipient, batch, error):
+        """Record the outcome of a batch and requeue it with backoff if it may still go through"""
+        done = []
+        retry = []
+        permanent = is_permanent(error)
+        for message in batch:
+            message['attempts'] += 1
+            if error is None or permanent or message['attempts'] >= self.max_attempts:
+                done.append({'id': message['id'], 'done': 'sent' if error is None else 'failed',
+                             'attempts': message['attempts']})
+            else:
+                delay = self.backoff * 2 ** (message['attempts'] - 1) * random.uniform(0.5, 1.0)
+                message['not_before'] = time.monotonic() + delay
+                retry.append(message)
+        if error is not None and done:
+            print(f"Giving up on {len(done)} notifications to {recipient}: {error}")
+            record_error(error)
+        try:
+            if done:
+                self.outbox.append(done)
+        except Exception as e:
+            # They stay pending in the outbox and are sent again after a restart
+            print(f"Error updating the notification outbox: {e}")
+            record_error(e)
+        with self._cond:
+            self._busy.discard(recipient)
+            self._in_flight -= len(batch)
+            if retry:
+                self._waiting[recipient] = retry + self._waiting.get(recipient, [])
+                self.counters['retries'] += len(retry)
+            if error is None:
+                self.counters['sent'] += len(batch)
+                self.counters['emails'] += 1
+            else:
+                self.counters['failed'] += len(done)
+            self._done_since_compaction += len(done)
+            self._cond.notify_all()
+
+    def close(self, timeout=10.0):
+        """Send what is queued (for at most timeout seconds) and stop; the rest stays in the outbox"""
+        self.detach()
+        with self._cond:
+            self._stopping = True
+            self._draining = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            # Messages in backoff keep the workers busy past the deadline; leave them to the outbox
+            self._draining = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(1.0)
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def stats(self):
+        """Counters, current and peak queue depth and messages sent per second"""
+        with self._cond:
+            stats = dict(self.counters, depth=self.depth(), max_depth=self.max_depth)
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        stats['messages_per_second'] = stats['sent'] / elapsed if elapsed > 0 else 0.0
+        stats['sending'] = self._owner is not None
+        return stats
+
+
+def open_dispatcher(storage, outbox_file=DEFAULT_OUTBOX):
+    """A started dispatcher attached to storage if VENUE_BOOKING_SMTP is set, otherwise None"""
+    address = os.environ.get('VENUE_BOOKING_SMTP')
+    if not address:
+        return None
+    try:
+        host, _, port = address.rpartition(':')
+        dispatcher = NotificationDispatcher(host or 'localhost', int(port or 25),
+                                            os.environ.get('VENUE_BOOKING_SMTP_FROM', DEFAULT_SENDER),
+                                            outbox_file)
+        dispatcher.attach(storage)
+        return dispatcher.start()
+    except Exception as e:
+        print(f"Error starting notifications: {e}")
+        record_error(e)
+        return None
+
+
+# ----- local SMTP stand-in -----
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, text):
+        self.wfile.write(text.encode('ascii') + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.count('connections')
+        time.sleep(server.latency)
+        self.reply("220 localhost SMTP stand-in")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply("250 localhost")
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip())
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                time.sleep(server.latency)
+                if server.rng.random() < server.fail_rate:
+                    server.count('refused')
+                    self.reply("451 Try again later")
+                else:
+                    server.receive(sender, recipients, b"".join(lines))
+                    self.reply("250 OK queued")
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """SMTP stand-in that keeps what it receives, with optional latency and temporary failures.
+
+    latency is added to the greeting and to every DATA; fail_rate is the
+    share of e-mails answered with "451 Try again later".
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0, seed=None, keep=True, echo=False):
+        super().__init__((host, port), _SMTPHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.keep = keep
+        self.echo = echo
+        self.received = []
+        self.counts = dict.fromkeys(('connections', 'emails', 'refused'), 0)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def receive(self, sender, recipients, data):
+        with self._lock:
+            self.counts['emails'] += 1
+            if self.keep:
+                self.received.append((sender, recipients, data))
+        if self.echo:
+            subject = next((line[9:].strip() for line in data.decode('utf-8', 'replace').splitlines()
+                            if line.startswith("Subject: ")), "")
+            print(f"{datetime.now():%H:%M:%S} {', '.join(recipients)}: {subject}")
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+# ----- command line -----
+
+def benchmark(n_messages, n_recipients, worker_counts, latency, fail_rate, batch_delay, seed=0):
+    """Messages per second and peak queue depth, sending synchronously and through the dispatcher"""
+    rng = random.Random(seed)
+    messages = [(f"club{rng.randrange(n_recipients)}@example.com", f"Venue booking approved: Event {i}",
+                 f"Your request {i} has been approved.") for i in range(n_messages)]
+    results = []
+    workdir = tempfile.mkdtemp(prefix="booking-notify-")
+
+    # What sending inside process_request would cost: one connection per message, one at a time
+    server = LocalSMTPServer(latency=latency, fail_rate=0.0, seed=seed, keep=False).start()
+    sample = messages[:max(1, min(n_messages, 200))]
+    started = time.perf_counter()
+    for to, subject, body in sample:
+        with smtplib.SMTP('127.0.0.1', server.port, local_hostname='localhost') as smtp:
+            smtp.send_message(compose(DEFAULT_SENDER, to, [{'subject': subject, 'body': body}]))
+    elapsed = time.perf_counter() - started
+    results.append(('synchronous', len(sample) / elapsed, len(sample), 0, len(sample), 0))
+    server.stop()
+
+    for workers in worker_counts:
+        server = LocalSMTPServer(latency=latency, fail_rate=fail_rate, seed=seed, keep=False).start()
+        dispatcher = NotificationDispatcher(
+            outbox_file=os.path.join(workdir, f"outbox-{workers}.jsonl"), workers=workers,
+            batch_delay=batch_delay, backoff=0.05, poll_interval=0.05, max_attempts=10,
+            connect=lambda port=server.port: smtplib.SMTP('127.0.0.1', port, local_hostname='localhost', timeout=30))
+        dispatcher.start()
+        while not dispatcher.stats()['sending']:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        # Decisions arrive in bursts, as from batch approvals
+        for i in range(0, n_messages, 100):
+            dispatcher.enqueue(messages[i:i + 100])
+        while True:
+            stats = dispatcher.stats()
+            if stats['sent'] + stats['failed'] >= n_messages:
+                break
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        dispatcher.close()
+        server.stop()
+        results.append((f"{workers} workers", n_messages / elapsed, stats['emails'], stats['retries'],
+                        stats['connections'], stats['max_depth']))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Booking notifications: outbox status, sending and a local SMTP stand-in")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    server_parser = subparsers.add_parser("server", help="run the local SMTP stand-in")
+    server_parser.add_argument("--port", type=int, default=8025)
+    server_parser.add_argument("--latency", type=float, default=0.0, help="seconds added per round trip")
+    server_parser.add_argument("--fail-rate", type=float, default=0.0, help="share of e-mails refused with 451")
+    subparsers.add_parser("status", help="messages pending, sent and failed in the outbox")
+    drain_parser = subparsers.add_parser("drain", help="send what the outbox still holds, then exit")
+    drain_parser.add_argument("--timeout", type=float, default=60)
+    bench_parser = subparsers.add_parser("benchmark", help="throughput against the stand-in")
+    bench_parser.add_argument("--messages", type=int, default=2000)
+    bench_parser.add_argument("--recipients", type=int, default=200)
+    bench_parser.add_argument("--workers", default="1,4,8", help="comma-separated pool sizes")
+    bench_parser.add_argument("--latency", type=float, default=0.005)
+    bench_parser.add_argument("--fail-rate", type=float, default=0.05)
+    bench_parser.add_argument("--batch-delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command == "server":
+        server = LocalSMTPServer(port=args.port, latency=args.latency, fail_rate=args.fail_rate, keep=False, echo=True)
+        print(f"SMTP stand-in on 127.0.0.1:{server.port} (set VENUE_BOOKING_SMTP=127.0.0.1:{server.port})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    if args.command == "status":
+        counts = Outbox().counts()
+        print(f"Outbox: {counts['pending']} pending, {counts['sent']} sent, {counts['failed']} failed")
+        return 0
+
+    if args.command == "drain":
+        address = os.environ.get('VENUE_BOOKING_SMTP')
+        if not address:
+            print("Set VENUE_BOOKING_SMTP=host:port first.")
+            return 1
+        host, _, port = address.rpartition(':')
+        dispatcher = NotificationDispatcher(host or 'localhost', int(port or 25),
+                                            os.environ.get('VENUE_BOOKING_SMTP_FROM', DEFAULT_SENDER)).start()
+        deadline = time.monotonic() + 5
+        while not dispatcher.stats()['sending'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if not dispatcher.stats()['sending']:
+            print("Another process is sending from this outbox.")
+            dispatcher.close(0)
+            return 1
+        dispatcher.close(args.timeout)
+        stats = dispatcher.stats()
+        print(f"Sent {stats['sent']} messages in {stats['emails']} e-mails, {stats['failed']} failed, "
+              f"{Outbox().counts()['pending']} still pending")
+        return 0
+
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    results = benchmark(args.messages, args.recipients, worker_counts, args.latency, args.fail_rate, args.batch_delay)
+    print(f"{args.messages} messages to {args.recipients} addresses, {args.latency * 1000:.0f} ms per round trip, "
+          f"{args.fail_rate:.0%} temporary failures\n")
+    print(f"{'mode':<14} {'msg/s':>9} {'e-mails':>8} {'retries':>8} {'conns':>6} {'peak depth':>11}")
+    for mode, rate, emails, retries, connections, max_depth in results:
+        print(f"{mode:<14} {rate:9.1f} {emails:8d} {retries:8d} {connections:6d} {max_depth:11d}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
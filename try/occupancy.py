@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+"""
+Occupancy Module - Venue occupancy as a (venue x date x 15-minute bin) array
+Part of the Venue Booking System
+
+OccupancyMap counts, for every venue of the catalogue and every date of a
+window, how many Pending/Approved bookings and series dates cover each
+15-minute bin. Availability is then a slice-any test and utilization, peak
+hour and weekday x hour reports for a whole semester are array reductions.
+
+The counts live in a memory-mapped .npy file next to a small JSON header
+that records the store version (see get_version()) they reflect, so a
+portal maps the file at startup instead of rebuilding it. Changes made
+through the storage object are applied incrementally; if anything else
+changed the store in between, the map is rebuilt on next use. Portals
+share the file: every write holds occupancy.npy.lock and first follows the
+file and header another portal may have replaced or advanced.
+
+A booking that starts or ends inside a bin marks the whole bin. While all
+counted bookings start and end on the quarter hour (the usual case) the map
+answers availability exactly; otherwise `exact` is False and a busy answer
+only means "possibly taken", to be confirmed by the store. A slot whose
+bins are all empty is free either way.
+
+    python occupancy.py --from 2025-01-06 --days 140 report
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import date as Date, timedelta
+import numpy as np
+import pandas as pd
+from interval_index import ACTIVE_STATUSES, parse_time_slot, parse_time_slots
+from metrics import record_error
+
+BIN_MINUTES = 15
+BINS_PER_DAY = 24 * 60 // BIN_MINUTES
+# Utilization is measured against opening hours
+OPENING_MINUTE = 8 * 60
+CLOSING_MINUTE = 22 * 60
+DEFAULT_DAYS = 183
+DEFAULT_PATH = "occupancy.npy"
+
+
+def _bin_range(start, end):
+    """Bins [first, last) touched by the minutes [start, end)"""
+    return start // BIN_MINUTES, -(-end // BIN_MINUTES)
+
+
+def _slot_bins(time_slot):
+    """Bins of an "HH:MM-HH:MM" slot, or None if it is not a valid slot"""
+    try:
+        start, end = parse_time_slot(time_slot)
+    except (AttributeError, ValueError):
+        return None
+    return _bin_range(start, end) if end > start else None
+
+
+class OccupancyMap:
+    """Booking counts per venue, date and 15-minute bin for one date window"""
+
+    def __init__(self, venues, first_date, n_days, counts, version=None, path=None, exact=True, file_id=None):
+        self.venues = venues
+        self.names = list(venues)
+        self._venue_pos = {name: i for i, name in enumerate(self.names)}
+        self.first_date = Date.fromisoformat(str(first_date))
+        self.n_days = n_days
+        self.counts = counts
+        self.version = version
+        self.path = path
+        self.exact = exact
+        # (device, inode) of the file counts is mapped from
+        self._file_id = file_id
+        self.storage = None
+
+    # ----- building, loading and saving -----
+
+    @classmethod
+    def empty(cls, venues, first_date, n_days=DEFAULT_DAYS):
+        counts = np.zeros((len(venues), n_days, BINS_PER_DAY), dtype=np.uint16)
+        return cls(venues, first_date, n_days, counts)
+
+    @classmethod
+    def build(cls, storage, venues, first_date, n_days=DEFAULT_DAYS, path=None):
+        """Count every active booking and series date of the window in one vectorized pass"""
+        occupancy = cls.empty(venues, first_date, n_days)
+        # Read the version first: a change committed while we read makes the map stale, never wrong
+        occupancy.version = storage.get_version()
+        date_from, date_to = occupancy.date_range()
+        bookings, _ = storage.query_bookings(date_from=date_from, date_to=date_to, page_size=10 ** 9)
+        occurrences = storage.expand_series(date_from, date_to)
+        occupancy._add_rows(bookings, 1)
+        occupancy._add_rows(occurrences, 1)
+        if path is not None:
+            occupancy.save(path)
+        return occupancy
+
+    @classmethod
+    def open(cls, storage, venues, first_date, n_days=DEFAULT_DAYS, path=DEFAULT_PATH):
+        """Map the saved counts if they match this window and the store, otherwise rebuild them.
+
+        The returned map follows every later change made through storage.
+        """
+        occupancy = cls._load(path, venues, first_date, n_days)
+        if occupancy is None:
+            occupancy = cls.build(storage, venues, first_date, n_days, path)
+        occupancy.attach(storage)
+        return occupancy.refresh()
+
+    @classmethod
+    def _load(cls, path, venues, first_date, n_days):
+        """The saved map at path, or None if it is missing or laid out differently"""
+        occupancy = cls(venues, first_date, n_days, None, path=path)
+        with _lock(path):
+            occupancy.version = occupancy._remap()
+        return occupancy if occupancy.counts is not None and occupancy.version is not None else None
+
+    def _remap(self):
+        """Follow the file at self.path, which another portal may have replaced or advanced.
+
+        Returns the version the file and its header hold, or None if they are
+        missing or laid out differently. The caller holds the file's lock.
+        """
+        try:
+            with open(_header_path(self.path)) as f:
+                header = json.load(f)
+            if (header['venues'] != self.names or header['first_date'] != self.first_date.isoformat()
+                    or header['n_days'] != self.n_days or header['bin_minutes'] != BIN_MINUTES):
+                return None
+            file_id = _file_id(self.path)
+            if file_id != self._file_id:
+                counts = np.load(self.path, mmap_mode='r+')
+                if counts.shape != (len(self.names), self.n_days, BINS_PER_DAY):
+                    return None
+                self.counts, self._file_id = counts, file_id
+        except (OSError, ValueError, KeyError):
+            return None
+        self.exact = header.get('exact', False)
+        return header['version']
+
+    def save(self, path=None):
+        """Write the counts and header, then keep working on the memory-mapped file"""
+        path = path or self.path
+        with _lock(path):
+            self._replace(path)
+
+    def _replace(self, path):
+        """save() with the file's lock already held"""
+        directory = os.path.dirname(os.path.abspath(path))
+        # Build the new file beside the old one and rename it, so readers never map a half-written file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".occupancy-", suffix=".npy")
+        os.close(fd)
+        try:
+            np.save(tmp_path, np.asarray(self.counts))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.path = path
+        self.counts = np.load(path, mmap_mode='r+')
+        self._file_id = _file_id(path)
+        self._write_header()
+
+    def _write_header(self):
+        """Record the layout and version; only once the counts of that version are flushed to the file"""
+        header = {
+            'venues': self.names, 'first_date': self.first_date.isoformat(), 'n_days': self.n_days,
+            'bin_minutes': BIN_MINUTES, 'version': self.version, 'exact': self.exact,
+        }
+        header_path = _header_path(self.path)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(header_path)), prefix=".occupancy-")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(header, f)
+        os.replace(tmp_path, header_path)
+
+    # ----- keeping up with the store -----
+
+    def attach(self, storage):
+        """Apply every change committed through storage from now on"""
+        self.storage = storage
+        storage.subscribe(self.on_change)
+
+    def detach(self):
+        if self.storage is not None:
+            self.storage.unsubscribe(self.on_change)
+            self.storage = None
+
+    def on_change(self, event, old_rows, new_rows):
+        """Storage listener: move the counts of the changed rows from their old to their new state"""
+        version = self.storage.get_version()
+        if event.startswith('series_'):
+            date_from, date_to = self.date_range()
+            old_rows = None if old_rows is None else _expand(old_rows, date_from, date_to)
+            new_rows = _expand(new_rows, date_from, date_to)
+        if self.path is None:
+            self._apply_change(version, self.version, old_rows, new_rows)
+            return
+        with _lock(self.path):
+            # The shared file, not self.version, tells which commit the counts reflect
+            on_disk = self._remap()
+            if self._apply_change(version, on_disk, old_rows, new_rows):
+                self.counts.flush()
+                self._write_header()
+
+    def _apply_change(self, version, counted, old_rows, new_rows):
+        """Apply the commit that made the store version if the counts reflect counted; True if applied"""
+        if counted is not None and counted == version:
+            # Rebuilt by another portal after this commit
+            self.version = version
+            return False
+        if counted is None or version != counted + 1:
+            # Someone else committed in between; the next refresh() rebuilds
+            self.version = None
+            return False
+        if old_rows is not None:
+            self._add_rows(old_rows, -1)
+        self._add_rows(new_rows, 1)
+        self.version = version
+        return True
+
+    def refresh(self):
+        """Rebuild the counts if the store changed behind this map's back"""
+        if self.storage is None:
+            return self
+        version = self.storage.get_version()
+        if self.version == version:
+            return self
+        if self.path is None:
+            self._rebuild()
+            return self
+        with _lock(self.path):
+            # Another portal may already have brought the shared file up to date
+            if self._remap() == version:
+                self.version = version
+            else:
+                self._rebuild()
+                self._replace(self.path)
+        return self
+
+    def _rebuild(self):
+        fresh = OccupancyMap.build(self.storage, self.venues, self.first_date.isoformat(), self.n_days)
+        self.counts, self.version, self.exact = fresh.counts, fresh.version, fresh.exact
+
+    def _add_rows(self, rows, sign):
+        """Add (sign=1) or remove (sign=-1) the active rows of a bookings or occurrences frame"""
+        if rows is None or rows.empty:
+            return
+        rows = rows[rows['status'].isin(ACTIVE_STATUSES) & rows['venue'].isin(self._venue_pos)]
+        if rows.empty:
+            return
+        starts, ends = parse_time_slots(rows['time_slot'])
+        days = (pd.to_datetime(rows['date'], format='%Y-%m-%d', errors='coerce')
+                - pd.Timestamp(self.first_date)).dt.days.to_numpy()
+        inside = (starts >= 0) & (ends > starts) & (days >= 0) & (days < self.n_days)
+        if not inside.any():
+            return
+        venue_pos = rows['venue'].map(self._venue_pos).to_numpy()[inside]
+        days = days[inside].astype(np.int64)
+        first_bins, last_bins = _bin_range(starts[inside], ends[inside])
+        if ((starts[inside] % BIN_MINUTES) | (ends[inside] % BIN_MINUTES)).any():
+            self.exact = False
+        # Difference array: +1 where a booking starts covering, -1 where it stops, then a running sum
+        delta = np.zeros((len(self.names), self.n_days, BINS_PER_DAY + 1), dtype=np.int32)
+        np.add.at(delta, (venue_pos, days, first_bins), sign)
+        np.add.at(delta, (venue_pos, days, np.minimum(last_bins, BINS_PER_DAY)), -sign)
+        change = np.cumsum(delta, axis=2)[:, :, :BINS_PER_DAY]
+        touched = np.unique(days)
+        updated = self.counts[:, touched, :].astype(np.int32) + change[:, touched, :]
+        self.counts[:, touched, :] = np.clip(updated, 0, np.iinfo(np.uint16).max)
+
+    # ----- queries -----
+
+    def date_range(self):
+        """First and last date of the window as "YYYY-MM-DD" strings"""
+        last = self.first_date + timedelta(days=self.n_days - 1)
+        return self.first_date.isoformat(), last.isoformat()
+
+    def _day(self, date):
+        day = (Date.fromisoformat(str(date)) - self.first_date).days
+        return day if 0 <= day < self.n_days else None
+
+    def covers(self, date):
+        return self._day(date) is not None
+
+    def is_free(self, venue, date, time_slot):
+        """True if no active booking touches any bin of the slot; None outside the map.
+
+        False is only certain while self.exact holds.
+        """
+        day, pos = self._day(date), self._venue_pos.get(venue)
+        if day is None or pos is None:
+            return None
+        bins = _slot_bins(time_slot)
+        if bins is None:
+            return None
+        return not self.counts[pos, day, bins[0]:bins[1]].any()
+
+    def free_venues(self, date, time_slot):
+        """Catalogue venues whose bins are all empty for the slot; None outside the map"""
+        day = self._day(date)
+        if day is None:
+            return None
+        bins = _slot_bins(time_slot)
+        if bins is None:
+            return None
+        busy = self.counts[:, day, bins[0]:bins[1]].any(axis=1)
+        return [name for name, taken in zip(self.names, busy) if not taken]
+
+    def _window(self, date_from=None, date_to=None):
+        """Boolean occupancy of the opening-hours bins for [date_from, date_to]"""
+        lo = 0 if date_from is None else max((Date.fromisoformat(date_from) - self.first_date).days, 0)
+        hi = self.n_days if date_to is None else min((Date.fromisoformat(date_to) - self.first_date).days + 1,
+                                                     self.n_days)
+        open_bins = slice(OPENING_MINUTE // BIN_MINUTES, CLOSING_MINUTE // BIN_MINUTES)
+        return self.counts[:, lo:max(lo, hi), open_bins] > 0, lo
+
+    def utilization(self, date_from=None, date_to=None):
+        """Share of opening hours each venue is booked, with its category and capacity"""
+        occupied, _ = self._window(date_from, date_to)
+        share = occupied.mean(axis=(1, 2)) if occupied.shape[1] else np.zeros(len(self.names))
+        hours = occupied.sum(axis=(1, 2)) * BIN_MINUTES / 60
+        return pd.DataFrame({
+            'venue': self.names,
+            'category': [self.venues[name].get('category') for name in self.names],
+            'capacity': [self.venues[name].get('capacity') for name in self.names],
+            'booked_hours': hours,
+            'utilization': share,
+        }).sort_values('utilization', ascending=False, kind='stable').reset_index(drop=True)
+
+    def category_utilization(self, date_from=None, date_to=None):
+        """Utilization per venue category (booked hours over open hours of all its venues)"""
+        per_venue = self.utilization(date_from, date_to)
+        grouped = per_venue.groupby('category').agg(venues=('venue', 'count'), booked_hours=('booked_hours', 'sum'),
+                                                    utilization=('utilization', 'mean'))
+        return grouped.sort_values('utilization', ascending=False).reset_index()
+
+    def peak_hours(self, date_from=None, date_to=None, top=None):
+        """Share of venue-days booked in each opening hour, busiest first"""
+        occupied, _ = self._window(date_from, date_to)
+        bins_per_hour = 60 // BIN_MINUTES
+        by_bin = occupied.mean(axis=(0, 1)) if occupied.shape[1] else np.zeros(occupied.shape[2])
+        by_hour = by_bin.reshape(-1, bins_per_hour).mean(axis=1)
+        first_hour = OPENING_MINUTE // 60
+        peaks = pd.DataFrame({
+            'hour': [f"{h:02d}:00-{h + 1:02d}:00" for h in range(first_hour, first_hour + len(by_hour))],
+            'utilization': by_hour,
+        }).sort_values('utilization', ascending=False, kind='stable').reset_index(drop=True)
+        return peaks if top is None else peaks.head(top)
+
+    def heatmap(self, venue=None, date_from=None, date_to=None):
+        """Weekday x hour utilization (rows Monday..Sunday), for one venue or all of them"""
+        occupied, lo = self._window(date_from, date_to)
+        if venue is not None:
+            occupied = occupied[[self._venue_pos[venue]]]
+        bins_per_hour = 60 // BIN_MINUTES
+        # (days, hours): share of venue-bins booked in each hour of each date
+        per_day = occupied.mean(axis=0).reshape(occupied.shape[1], -1, bins_per_hour).mean(axis=2)
+        weekdays = (self.first_date.weekday() + lo + np.arange(per_day.shape[0])) % 7
+        sums = np.zeros((7, per_day.shape[1]))
+        np.add.at(sums, weekdays, per_day)
+        days_per_weekday = np.bincount(weekdays, minlength=7)[:, None]
+        grid = np.divide(sums, days_per_weekday, out=np.zeros_like(sums), where=days_per_weekday > 0)
+        first_hour = OPENING_MINUTE // 60
+        return pd.DataFrame(grid, columns=[f"{h:02d}" for h in range(first_hour, first_hour + grid.shape[1])],
+                            index=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+
+
+def open_occupancy(storage, venues, path=DEFAULT_PATH):
+    """The map from the first of this month for DEFAULT_DAYS days, or None if it cannot be opened"""
+    try:
+        return OccupancyMap.open(storage, venues, Date.today().replace(day=1).isoformat(), DEFAULT_DAYS, path)
+    except Exception as e:
+        print(f"Error opening the occupancy map: {e}")
+        record_error(e)
+        return None
+
+
+def _header_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _file_id(path):
+    info = os.stat(path)
+    return info.st_dev, info.st_ino
+
+
+def _lock(path):
+    """Exclusive lock serializing the portals' writes to the map at path"""
+    from storage import file_lock
+    return file_lock(path + ".lock")
+
+
+def _expand(series_rows, date_from, date_to):
+    from series import expand_series
+    return expand_series(series_rows, date_from, date_to)
+
+
+def print_report(occupancy, date_from=None, date_to=None):
+    """Utilization by venue and category, the busiest hours and a weekday x hour heatmap"""
+    first, last = occupancy.date_range()
+    print(f"\n===== Utilization {date_from or first} to {date_to or last} (08:00-22:00) =====")
+    for _, row in occupancy.utilization(date_from, date_to).iterrows():
+        print(f"{row['venue']:<14} {row['category']:<16} {row['booked_hours']:8.1f} h  {row['utilization']:6.1%}")
+    print("\nBy category:")
+    for _, row in occupancy.category_utilization(date_from, date_to).iterrows():
+        print(f"{row['category']:<16} {row['venues']:>3} venues  {row['utilization']:6.1%}")
+    print("\nBusiest hours:")
+    for _, row in occupancy.peak_hours(date_from, date_to, top=5).iterrows():
+        print(f"{row['hour']}  {row['utilization']:6.1%}")
+    print("\nWeekday x hour (% of venue time booked):")
+    grid = occupancy.heatmap(date_from=date_from, date_to=date_to)
+    print("           " + " ".join(f"{h:>3}" for h in grid.columns))
+    for day, values in grid.iterrows():
+        print(f"{day:<10} " + " ".join(f"{v * 100:3.0f}" for v in values))
+
+
+def main():
+    from club import VENUES
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Venue occupancy map and utilization reports")
+    parser.add_argument("--from", dest="first_date", default=Date.today().replace(day=1).isoformat(),
+                        help="first date of the map, YYYY-MM-DD")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="number of days in the map")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("command", choices=["build", "report"], nargs="?", default="report")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    if args.command == "build":
+        occupancy = OccupancyMap.build(storage, VENUES, args.first_date, args.days, args.path)
+        print(f"Occupancy map for {' to '.join(occupancy.date_range())} written to {args.path}")
+        return 0
+    print_report(OccupancyMap.open(storage, VENUES, args.first_date, args.days, args.path))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Records Module - Quick read-only lookups without loading pandas
+Part of the Venue Booking System
+
+Importing pandas takes most of a second, which is the whole wait for
+someone who only wants to see one booking. RecordReader answers the
+simple questions (one booking by id, a club's bookings and series) with
+the csv and sqlite3 modules of the standard library and returns them as
+BookingRecord / SeriesRecord dataclasses. The storage classes, and
+pandas with them, are only needed for submissions, decisions and reports.
+
+Files are read as they are on disk: writers replace them atomically, so
+a reader always sees a complete table.
+"""
+
+import csv
+import os
+import sqlite3
+from dataclasses import dataclass, fields
+
+
+@dataclass
+class BookingRecord:
+    id: int
+    club: str = ''
+    event_name: str = ''
+    contact_email: str = ''
+    day: str = ''
+    date: str = ''
+    time_slot: str = ''
+    venue: str = ''
+    expected_attendance: str = ''
+    purpose: str = ''
+    status: str = ''
+    submitted_at: str = ''
+    processed_at: str = ''
+    admin_comment: str = ''
+
+    @classmethod
+    def from_mapping(cls, row):
+        return _from_mapping(cls, row, 'id')
+
+
+@dataclass
+class SeriesRecord:
+    series_id: int
+    club: str = ''
+    event_name: str = ''
+    contact_email: str = ''
+    venue: str = ''
+    time_slot: str = ''
+    expected_attendance: str = ''
+    purpose: str = ''
+    first_date: str = ''
+    until: str = ''
+    interval_weeks: int = 1
+    exceptions: str = ''
+    status: str = ''
+    submitted_at: str = ''
+    processed_at: str = ''
+    admin_comment: str = ''
+
+    @classmethod
+    def from_mapping(cls, row):
+        record = _from_mapping(cls, row, 'series_id')
+        record.interval_weeks = int(float(record.interval_weeks or 1))
+        return record
+
+
+def _from_mapping(cls, row, key):
+    """Record from a CSV row, SQLite row or pandas row: missing values become '', ids become int"""
+    values = {}
+    for field in fields(cls):
+        value = row.get(field.name)
+        # None from SQLite, NaN (never equal to itself) from pandas
+        if value is None or value != value:
+            value = ''
+        values[field.name] = value if isinstance(value, str) or field.name == key else str(value)
+    values[key] = int(float(values[key]))
+    return cls(**values)
+
+
+def storage_backend():
+    """The configured backend name, as create_storage() would choose it"""
+    return (os.environ.get('VENUE_BOOKING_BACKEND') or 'csv').lower()
+
+
+class RecordReader:
+    """Read-only lookups straight from the CSV files or the SQLite database"""
+
+    def __init__(self, backend=None, bookings_file="bookings.csv", series_file="series.csv", db_file=None):
+        self.backend = (backend or storage_backend()).lower()
+        if self.backend not in ('csv', 'sqlite'):
+            raise ValueError(f"No quick reader for the {self.backend} backend")
+        self.bookings_file = bookings_file
+        self.series_file = series_file
+        self.db_file = db_file or os.environ.get('VENUE_BOOKING_DB', 'bookings.db')
+
+    def _csv_rows(self, path, column, value, unique=False):
+        """Rows of a CSV file whose column equals value, as dicts; unique stops at the first one"""
+        if not os.path.exists(path):
+            return []
+        rows = []
+        with open(path, newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None or column not in header:
+                return []
+            position = header.index(column)
+            # Only matching rows become dicts; everything else stays a plain list
+            for row in reader:
+                if len(row) > position and row[position] == value:
+                    rows.append(dict(zip(header, row)))
+                    if unique:
+                        break
+        return rows
+
+    def _sqlite_rows(self, sql, params):
+        if not os.path.exists(self.db_file):
+            return []
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, timeout=30)
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params)]
+        except sqlite3.OperationalError:
+            # A database created before the table existed
+            return []
+        finally:
+            conn.close()
+
+    def get_booking_by_id(self, booking_id):
+        """The booking with this id, or None"""
+        if self.backend == 'sqlite':
+            rows = self._sqlite_rows("SELECT * FROM bookings WHERE id = ?", (int(booking_id),))
+        else:
+            rows = self._csv_rows(self.bookings_file, 'id', str(int(booking_id)), unique=True)
+        return BookingRecord.from_mapping(rows[0]) if rows else None
+
+    def get_club_bookings(self, club_name):
+        """All bookings of a club, oldest first"""
+        if self.backend == 'sqlite':
+            rows = self._sqlite_rows("SELECT * FROM bookings WHERE club = ? ORDER BY id", (club_name,))
+        else:
+            rows = self._csv_rows(self.bookings_file, 'club', club_name)
+        return [BookingRecord.from_mapping(row) for row in rows]
+
+    def get_club_series(self, club_name):
+        """All recurring series of a club, oldest first"""
+        if self.backend == 'sqlite':
+            rows = self._sqlite_rows("SELECT * FROM series WHERE club = ? ORDER BY series_id", (club_name,))
+        else:
+            rows = self._csv_rows(self.series_file, 'club', club_name)
+        return [SeriesRecord.from_mapping(row) for row in rows]
+
+
+def open_reader():
+    """A RecordReader for the configured backend, or None where only the full storage can answer"""
+    try:
+        return RecordReader()
+    except ValueError:
+        return None
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Replications - Parallel Monte Carlo runs of the booking simulation
+Part of the Venue Booking System
+
+Runs N independently seeded simulations for every combination of the swept
+parameters on a process pool, and reduces them to one row per combination
+with the mean and a 95% confidence interval of conflict rate, approval
+latency and utilization.
+"""
+
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from simulation import run_simulation
+
+METRICS = ['conflict_rate', 'mean_latency', 'utilization']
+
+# Two-sided 95% Student t quantiles for 1-30 degrees of freedom
+T_975 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+         2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+         2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def confidence_interval(values):
+    """(mean, half width) of a 95% t interval"""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, float('nan')
+    df = len(values) - 1
+    t = T_975[df - 1] if df <= len(T_975) else 1.96
+    return mean, t * statistics.stdev(values) / len(values) ** 0.5
+
+
+def run_replication(params):
+    """Run one seeded simulation and return its parameters plus summary"""
+    system = run_simulation(
+        n_requests=params['requests'], n_venues=params['venues'], n_days=params['days'],
+        arrival_rate=params['arrival_rate'], approval_probability=params['approval_probability'],
+        review_time=params['review_time'], n_admins=params['admins'], seed=params['seed']
+    )
+    result = dict(params)
+    result.update(system.summary(params['days']))
+    return result
+
+
+def replication_grid(replications, base_seed, approval_probabilities, arrival_rates, venue_counts, **fixed):
+    """One parameter dict per (combination, replication), each with its own seed"""
+    grid = []
+    combinations = itertools.product(approval_probabilities, arrival_rates, venue_counts)
+    for c, (approval_probability, arrival_rate, venues) in enumerate(combinations):
+        for r in range(replications):
+            params = dict(fixed)
+            params.update(approval_probability=approval_probability, arrival_rate=arrival_rate,
+                          venues=venues, replication=r,
+                          seed=base_seed + c * replications + r)
+            grid.append(params)
+    return grid
+
+
+def summarise(results):
+    """Reduce per-replication results to one row per parameter combination"""
+    runs = pd.DataFrame(results)
+    keys = ['approval_probability', 'arrival_rate', 'venues']
+    rows = []
+    for combination, group in runs.groupby(keys, sort=True):
+        row = dict(zip(keys, combination))
+        row['runs'] = len(group)
+        for metric in METRICS:
+            mean, half_width = confidence_interval(group[metric].tolist())
+            row[metric] = mean
+            row[f'{metric}_ci'] = half_width
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def run_replications(grid, workers=None):
+    """Run every parameter dict in grid on a process pool"""
+    chunksize = max(1, len(grid) // ((workers or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_replication, grid, chunksize=chunksize))
+
+
+def _floats(text):
+    return [float(value) for value in text.split(',')]
+
+
+def _ints(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo replications of the booking simulation")
+    parser.add_argument("--replications", type=int, default=10, help="seeded runs per combination")
+    parser.add_argument("--approval-probability", type=_floats, default=[0.8],
+                        help="comma-separated values to sweep")
+    parser.add_argument("--arrival-rate", type=_floats, default=[1.0],
+                        help="comma-separated requests per simulated minute")
+    parser.add_argument("--venues", type=_ints, default=[100], help="comma-separated venue counts")
+    parser.add_argument("--requests", type=int, default=10000, help="requests per run")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--review-time", type=float, default=1, help="mean admin review time in minutes")
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0, help="base seed")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--output", default="replications.csv")
+    args = parser.parse_args()
+
+    grid = replication_grid(
+        args.replications, args.seed, args.approval_probability, args.arrival_rate, args.venues,
+        requests=args.requests, days=args.days, review_time=args.review_time, admins=args.admins
+    )
+    started = time.perf_counter()
+    table = summarise(run_replications(grid, args.workers))
+    elapsed = time.perf_counter() - started
+
+    table.to_csv(args.output, index=False, float_format='%.6g')
+    with pd.option_context('display.width', 160, 'display.max_columns', None):
+        print(table.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+    print(f"\n{len(grid)} runs in {elapsed:.1f}s, table written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
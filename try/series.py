@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Series Module - Recurring bookings stored as one record and expanded on demand
+Part of the Venue Booking System
+
+A series books the same venue and time slot every week (interval_weeks=1)
+or every other week (interval_weeks=2) from first_date until a last date,
+skipping any dates listed as exceptions. Only the series record is stored;
+its occurrences are worked out for the dates that are actually asked about,
+so a term of weekly meetings costs one row and one write.
+"""
+
+from datetime import date as Date
+import numpy as np
+import pandas as pd
+from interval_index import ACTIVE_STATUSES, parse_time_slot, parse_time_slots
+
+SERIES_COLUMNS = [
+    'series_id', 'club', 'event_name', 'contact_email', 'venue', 'time_slot',
+    'expected_attendance', 'purpose', 'first_date', 'until', 'interval_weeks',
+    'exceptions', 'status', 'submitted_at', 'processed_at', 'admin_comment'
+]
+
+OCCURRENCE_COLUMNS = [
+    'series_id', 'club', 'event_name', 'contact_email', 'day', 'date', 'time_slot',
+    'venue', 'expected_attendance', 'purpose', 'status'
+]
+
+CONFLICT_COLUMNS = ['date', 'kind', 'conflict_id', 'time_slot']
+
+REQUIRED_SERIES_FIELDS = ['club', 'event_name', 'venue', 'time_slot', 'first_date', 'until']
+
+# Frequencies offered to clubs, as weeks between occurrences
+FREQUENCIES = {'weekly': 1, 'biweekly': 2}
+
+# A series may not run longer than this, so one record cannot block a venue forever
+MAX_SERIES_DAYS = 366
+
+
+def parse_exceptions(exceptions):
+    """Exception dates as a sorted list of "YYYY-MM-DD" strings (from a list or "a;b;c")"""
+    if exceptions is None or (not isinstance(exceptions, (list, tuple, set)) and pd.isna(exceptions)):
+        return []
+    if isinstance(exceptions, str):
+        exceptions = exceptions.split(';')
+    return sorted({str(d).strip() for d in exceptions if str(d).strip()})
+
+
+def format_exceptions(exceptions):
+    return ';'.join(parse_exceptions(exceptions))
+
+
+def occurrence_dates(first_date, until, interval_weeks=1, exceptions=None, date_from=None, date_to=None):
+    """Dates (datetime64[D]) of a series, optionally only those within [date_from, date_to]"""
+    first = np.datetime64(first_date, 'D')
+    lo = first if date_from is None else max(first, np.datetime64(date_from, 'D'))
+    hi = np.datetime64(until, 'D') if date_to is None else min(np.datetime64(until, 'D'), np.datetime64(date_to, 'D'))
+    step = 7 * int(interval_weeks)
+    # Move lo forward onto the series' own rhythm
+    lo = lo + (-int((lo - first).astype(int))) % step
+    if lo > hi:
+        return np.array([], dtype='datetime64[D]')
+    dates = np.arange(lo, hi + 1, np.timedelta64(step, 'D'))
+    skipped = parse_exceptions(exceptions)
+    if skipped:
+        dates = dates[~np.isin(dates, np.array(skipped, dtype='datetime64[D]'))]
+    return dates
+
+
+def prepare_series(series):
+    """Validated copy of a series dict; raises ValueError with the reason if it is not valid"""
+    series = dict(series)
+    missing = [field for field in REQUIRED_SERIES_FIELDS if series.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    try:
+        first = Date.fromisoformat(str(series['first_date']))
+        until = Date.fromisoformat(str(series['until']))
+        exceptions = [Date.fromisoformat(d).isoformat() for d in parse_exceptions(series.get('exceptions'))]
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format")
+    if until < first:
+        raise ValueError("The series ends before it starts")
+    if (until - first).days > MAX_SERIES_DAYS:
+        raise ValueError(f"A series may run for at most {MAX_SERIES_DAYS} days")
+    interval_weeks = series.get('interval_weeks', 1)
+    try:
+        interval_weeks = int(FREQUENCIES.get(interval_weeks, interval_weeks))
+    except (TypeError, ValueError):
+        interval_weeks = None
+    if interval_weeks not in (1, 2):
+        raise ValueError("A series repeats weekly or every two weeks")
+    start, end = parse_time_slot(series['time_slot'])
+    if start < 0 or end <= start:
+        raise ValueError("Time slot must be HH:MM-HH:MM with the end after the start")
+    series.update(first_date=first.isoformat(), until=until.isoformat(), interval_weeks=int(interval_weeks),
+                  exceptions=';'.join(exceptions), start_min=start, end_min=end)
+    if len(occurrence_dates(series['first_date'], series['until'], interval_weeks, exceptions)) == 0:
+        raise ValueError("Every date of the series is an exception")
+    return series
+
+
+def describe_series(series):
+    """Short human description, e.g. "weekly on Monday until 2025-06-30 (2 dates skipped)" """
+    every = "weekly" if int(series['interval_weeks']) == 1 else "every two weeks"
+    day = Date.fromisoformat(series['first_date']).strftime('%A')
+    skipped = len(parse_exceptions(series.get('exceptions')))
+    text = f"{every} on {day} until {series['until']}"
+    return text + (f" ({skipped} dates skipped)" if skipped else "")
+
+
+def expand_series(series_df, date_from=None, date_to=None):
+    """One row per occurrence of each series within [date_from, date_to] (see OCCURRENCE_COLUMNS)"""
+    frames = []
+    for series in series_df.to_dict('records'):
+        dates = occurrence_dates(series['first_date'], series['until'], series['interval_weeks'],
+                                 series.get('exceptions'), date_from, date_to)
+        if len(dates) == 0:
+            continue
+        index = pd.DatetimeIndex(dates)
+        occurrences = pd.DataFrame({'date': index.strftime('%Y-%m-%d'), 'day': index.day_name()})
+        for column in OCCURRENCE_COLUMNS:
+            if column not in occurrences.columns:
+                occurrences[column] = series.get(column)
+        frames.append(occurrences[OCCURRENCE_COLUMNS])
+    if not frames:
+        return pd.DataFrame(columns=OCCURRENCE_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values(['date', 'time_slot', 'series_id'], kind='stable')
+
+
+def series_conflicts(series, active_bookings, active_series):
+    """Every clash of a prepared series with active bookings and other active series.
+
+    All occurrences are checked in one pass: the bookings of the series'
+    venue that overlap its time slot are matched against the whole array
+    of occurrence dates at once. Returns a DataFrame of CONFLICT_COLUMNS
+    (kind is "booking" or "series"), empty when the series is free.
+    """
+    dates = occurrence_dates(series['first_date'], series['until'], series['interval_weeks'], series['exceptions'])
+    date_strings = np.datetime_as_string(dates)
+    start, end = series['start_min'], series['end_min']
+    frames = []
+
+    if not active_bookings.empty:
+        booked = active_bookings
+        if 'start_min' not in booked.columns:
+            booked = booked.assign(**dict(zip(['start_min', 'end_min'], parse_time_slots(booked['time_slot']))))
+        clash = (
+            (booked['venue'] == series['venue']).to_numpy() &
+            booked['status'].isin(ACTIVE_STATUSES).to_numpy() &
+            (booked['start_min'] < end).to_numpy() & (booked['end_min'] > start).to_numpy() &
+            np.isin(booked['date'].to_numpy().astype(str), date_strings)
+        )
+        hits = booked[clash]
+        frames.append(pd.DataFrame({'date': hits['date'].to_numpy(), 'kind': 'booking',
+                                    'conflict_id': hits['id'].to_numpy(), 'time_slot': hits['time_slot'].to_numpy()}))
+
+    if not active_series.empty:
+        others = active_series
+        if 'start_min' not in others.columns:
+            others = others.assign(**dict(zip(['start_min', 'end_min'], parse_time_slots(others['time_slot']))))
+        # A stored series being re-checked does not clash with itself
+        others = others[others['series_id'] != series.get('series_id')]
+        others = others[(others['venue'] == series['venue']) & others['status'].isin(ACTIVE_STATUSES) &
+                        (others['start_min'] < end) & (others['end_min'] > start) &
+                        (others['first_date'] <= series['until']) & (others['until'] >= series['first_date'])]
+        for other in others.to_dict('records'):
+            shared = np.intersect1d(dates, occurrence_dates(other['first_date'], other['until'], other['interval_weeks'],
+                                                            other.get('exceptions'), series['first_date'],
+                                                            series['until']))
+            if len(shared):
+                frames.append(pd.DataFrame({'date': np.datetime_as_string(shared), 'kind': 'series',
+                                            'conflict_id': other['series_id'], 'time_slot': other['time_slot']}))
+
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=CONFLICT_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values(['date', 'kind'], kind='stable').reset_index(drop=True)
+
+
+class SeriesIndex:
+    """Active series by weekday, answering "is this venue taken on this date?" without expanding them"""
+
+    def __init__(self):
+        # weekday (0 = Monday) ->
+        # [(venue, start, end, first ordinal, last ordinal, step, exceptions, series_id, status)]
+        self._by_weekday = {}
+
+    @classmethod
+    def from_series(cls, series_df):
+        index = cls()
+        if series_df.empty:
+            return index
+        active = series_df[series_df['status'].isin(ACTIVE_STATUSES)]
+        if 'start_min' in active.columns:
+            starts, ends = active['start_min'], active['end_min']
+        else:
+            starts, ends = parse_time_slots(active['time_slot'])
+        for series, start, end in zip(active.to_dict('records'), starts, ends):
+            first = Date.fromisoformat(series['first_date'])
+            index._by_weekday.setdefault(first.weekday(), []).append((
+                series['venue'], int(start), int(end), first.toordinal(),
+                Date.fromisoformat(series['until']).toordinal(), 7 * int(series['interval_weeks']),
+                frozenset(parse_exceptions(series.get('exceptions'))), series['series_id'], series['status']
+            ))
+        return index
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._by_weekday.values())
+
+    def _occurring(self, date):
+        """Entries of the series with an occurrence on date (none if date is not YYYY-MM-DD)"""
+        date = str(date)
+        try:
+            day = Date.fromisoformat(date)
+        except ValueError:
+            # A malformed booking date cannot fall on a series date; it must not fail the whole check
+            return
+        ordinal = day.toordinal()
+        for entry in self._by_weekday.get(day.weekday(), ()):
+            _, _, _, first, last, step, exceptions, _, _ = entry
+            if first <= ordinal <= last and (ordinal - first) % step == 0 and date not in exceptions:
+                yield entry
+
+    def conflicts(self, venue, date, start, end):
+        """Ids of the series occupying venue on date within [start, end)"""
+        if not self._by_weekday:
+            return []
+        return [entry[7] for entry in self._occurring(date)
+                if entry[0] == venue and entry[1] < end and entry[2] > start]
+
+    def is_free(self, venue, date, start, end):
+        return not self.conflicts(venue, date, start, end)
+
+    def busy_venues(self, date, start, end):
+        """Venues a series occupies on date within [start, end)"""
+        if not self._by_weekday:
+            return set()
+        return {entry[0] for entry in self._occurring(date) if entry[1] < end and entry[2] > start}
+
+    def busy_mask(self, candidates):
+        """Boolean array: True where a (venue, date, start_min, end_min) candidate row clashes with a series"""
+        if not self._by_weekday or candidates.empty:
+            return np.zeros(len(candidates), dtype=bool)
+        return np.array([
+            not self.is_free(venue, date, start, end)
+            for venue, date, start, end in zip(candidates['venue'], candidates['date'],
+                                               candidates['start_min'], candidates['end_min'])
+        ], dtype=bool)
+
+    def status_counts(self, candidates):
+        """Per (venue, date, start_min, end_min) candidate row, how many series of each active status it clashes with.
+
+        Returns {status: int array} for every status in ACTIVE_STATUSES.
+        """
+        counts = {status: np.zeros(len(candidates), dtype=int) for status in ACTIVE_STATUSES}
+        if not self._by_weekday or candidates.empty:
+            return counts
+        for i, (venue, date, start, end) in enumerate(zip(candidates['venue'], candidates['date'],
+                                                          candidates['start_min'], candidates['end_min'])):
+            for entry in self._occurring(date):
+                if entry[0] == venue and entry[1] < end and entry[2] > start:
+                    counts[entry[8]][i] += 1
+        return counts
+
+    def intervals(self, venue, date):
+        """(start, end, series_id) of the series occupying venue on date"""
+        return sorted((entry[1], entry[2], entry[7]) for entry in self._occurring(date) if entry[0] == venue)
+
+
+def series_log_entry(series, status, time, admin_comment=''):
+    """The log entry for a series being submitted or decided"""
+    return {
+        'time': time,
+        'club': series['club'],
+        'venue': series['venue'],
+        'status': status,
+        'day': Date.fromisoformat(series['first_date']).strftime('%A'),
+        'date': series['first_date'],
+        'time_slot': series['time_slot'],
+        'event': f"{series['event_name']} (series {series['series_id']}, {describe_series(series)})",
+        'admin_comment': admin_comment
+    }
@@ -0,0 +1,495 @@
+#!/usr/bin/env python3
+"""
+Booking Service - Local asyncio HTTP/JSON service in front of the booking store
+Part of the Venue Booking System
+
+One process owns the store. Reads are answered straight from its resident
+tables. Every mutation is put on a queue that a single writer task drains:
+requests that arrived together are committed together (save_request calls
+become one save_requests import, status changes one apply_decisions), so
+conflict checks are serialized in one place and a burst of submissions
+costs one table rewrite instead of one each.
+
+API: POST /api/<method> with {"args": [...], "kwargs": {...}} calls the
+storage method of that name; GET /health and GET /stats report status.
+RemoteStorage is the matching client, so the portals can run against the
+service with VENUE_BOOKING_BACKEND=remote (and VENUE_BOOKING_URL).
+"""
+
+import argparse
+import asyncio
+import http.client
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+READ_METHODS = {
+    'load_bookings', 'get_pending_requests', 'get_all_bookings', 'get_club_bookings',
+    'query_bookings', 'check_venue_availability', 'get_available_venues',
+    'get_available_venues_for_slots', 'get_conflicting_bookings', 'classify_pending_requests',
+    'get_booking_by_id', 'load_logs', 'log_page', 'check_slots', 'find_free_slots',
+    'check_series', 'get_series', 'expand_series', 'get_version',
+}
+WRITE_METHODS = {
+    'save_request', 'save_requests', 'update_request_status', 'apply_decisions', 'reassign_venues',
+    'save_series', 'update_series_status',
+}
+
+# Open log page iterators kept between log_page calls; the oldest is dropped beyond this
+MAX_LOG_CURSORS = 32
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+
+
+# ----- JSON encoding of storage results -----
+
+def encode(value):
+    """Turn storage results (DataFrames, tuples, tuple-keyed dicts, numpy values) into JSON data"""
+    if isinstance(value, pd.DataFrame):
+        # to_json does the NaN/numpy conversion in C, much faster than boxing every cell
+        return {'__frame__': json.loads(value.to_json(orient='split', index=False, date_format='iso'))}
+    if isinstance(value, pd.Series):
+        data = value.astype(object).where(value.notna(), None)
+        return {'__series__': {'index': [encode(i) for i in value.index], 'data': [encode(v) for v in data],
+                               'name': encode(value.name)}}
+    if isinstance(value, tuple):
+        return {'__tuple__': [encode(v) for v in value]}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: encode(v) for k, v in value.items()}
+        return {'__items__': [[encode(k), encode(v)] for k, v in value.items()]}
+    if isinstance(value, (list, set)):
+        return [encode(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+
+def decode(value):
+    """Inverse of encode()"""
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if '__frame__' in value:
+        frame = value['__frame__']
+        return pd.DataFrame(frame['data'], columns=frame['columns'])
+    if '__series__' in value:
+        series = value['__series__']
+        return pd.Series([decode(v) for v in series['data']], index=[decode(i) for i in series['index']],
+                         name=decode(series['name']), dtype=object)
+    if '__tuple__' in value:
+        return tuple(decode(v) for v in value['__tuple__'])
+    if '__items__' in value:
+        return {_hashable(decode(k)): decode(v) for k, v in value['__items__']}
+    return {k: decode(v) for k, v in value.items()}
+
+
+def _hashable(value):
+    return tuple(_hashable(v) for v in value) if isinstance(value, list) else value
+
+
+# ----- Server -----
+
+class BookingService:
+    """Serves a BookingStorage over HTTP with a single batching writer"""
+
+    def __init__(self, storage, max_batch=512, batch_window=0.002):
+        self.storage = storage
+        self.max_batch = max_batch
+        # Seconds the writer waits after the first queued write so that others can join its batch
+        self.batch_window = batch_window
+        self.queue = None
+        self.stats = {'requests': 0, 'reads': 0, 'writes': 0, 'commits': 0, 'errors': 0,
+                      'largest_batch': 0, 'started_at': time.time()}
+        # (filters, limit, offset) -> the storage's page iterator positioned at that offset
+        self._log_cursors = {}
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        self.queue = asyncio.Queue()
+        writer_task = asyncio.create_task(self._writer_loop())
+        server = await asyncio.start_server(self._handle_connection, host, port, backlog=1024)
+        print(f"Booking service listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer_task.cancel()
+            self.storage.flush_logs()
+
+    # --- HTTP ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                status, payload = await self._route(method, target, body)
+                data = json.dumps(payload).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, target, body):
+        self.stats['requests'] += 1
+        path = urlsplit(target).path
+        if method == 'GET' and path == '/health':
+            return 200, {'status': 'ok'}
+        if method == 'GET' and path == '/stats':
+            stats = dict(self.stats, queue_depth=self.queue.qsize(),
+                         uptime_seconds=time.time() - self.stats['started_at'])
+            return 200, stats
+        if method != 'POST' or not path.startswith('/api/'):
+            return 404, {'error': f"no route for {method} {path}"}
+
+        name = path[len('/api/'):]
+        try:
+            call = json.loads(body or b'{}')
+            args = decode(call.get('args', []))
+            kwargs = decode(call.get('kwargs', {}))
+        except ValueError as e:
+            return 400, {'error': f"invalid JSON body: {e}"}
+
+        try:
+            if name in READ_METHODS:
+                self.stats['reads'] += 1
+                return 200, {'result': encode(self._read(name, args, kwargs))}
+            if name in WRITE_METHODS:
+                self.stats['writes'] += 1
+                future = asyncio.get_running_loop().create_future()
+                await self.queue.put((name, args, kwargs, future))
+                return 200, {'result': encode(await future)}
+        except Exception as e:
+            self.stats['errors'] += 1
+            return 500, {'error': str(e)}
+        return 404, {'error': f"unknown method: {name}"}
+
+    def _read(self, name, args, kwargs):
+        if name == 'log_page':
+            return self._log_page(*args, **kwargs)
+        return getattr(self.storage, name)(*args, **kwargs)
+
+    def _log_page(self, offset=0, limit=50, **filters):
+        """One page of the filtered log, for RemoteStorage.iter_log_pages.
+
+        Clients walk the pages in order, so the storage's own page iterator is
+        kept open between calls and each page costs only its own rows.
+        """
+        key = (tuple(sorted(filters.items())), limit)
+        pages = self._log_cursors.pop((key, offset), None)
+        if pages is None:
+            if offset % limit:
+                return self.storage.load_logs(**filters).iloc[offset:offset + limit]
+            pages = self.storage.iter_log_pages(limit, **filters)
+            # Cursor expired or service restarted: skip to the requested page
+            for _ in range(offset // limit):
+                if next(pages, None) is None:
+                    return pd.DataFrame()
+        page = next(pages, None)
+        if page is None:
+            return pd.DataFrame()
+        if len(page) == limit:
+            self._log_cursors[(key, offset + limit)] = pages
+            while len(self._log_cursors) > MAX_LOG_CURSORS:
+                self._log_cursors.pop(next(iter(self._log_cursors)))
+        return page
+
+    # --- single writer ---
+
+    async def _writer_loop(self):
+        while True:
+            batch = [await self.queue.get()]
+            # Let the connections that are ready queue their writes too, then take them all
+            await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+
+            for group in _consecutive_groups(batch):
+                try:
+                    results = self._commit(group)
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    for *_, future in group:
+                        future.set_exception(e)
+                    continue
+                self.stats['commits'] += 1
+                for (*_, future), result in zip(group, results):
+                    future.set_result(result)
+
+    def _commit(self, group):
+        """Apply a group of same-kind writes, returning one result per call"""
+        name = group[0][0]
+        if len(group) == 1 or name not in ('save_request', 'update_request_status'):
+            return [getattr(self.storage, n)(*args, **kwargs) for n, args, kwargs, _ in group]
+
+        if name == 'save_request':
+            from storage import prepare_requests
+            requests = [_call_args(args, kwargs, 'request', 'check_available')[0] for _, args, kwargs, _ in group]
+            check_available = _call_args(group[0][1], group[0][2], 'request', 'check_available')[1]
+            # save_request accepts some rows the bulk import refuses (e.g. no expected_attendance), so those
+            # go through save_request alone: a call gets the same answer whether it was batched or not
+            valid = (prepare_requests(pd.DataFrame(requests))['reason'] == '').tolist()
+            results = []
+            for bulk, run in itertools.groupby(zip(requests, valid), key=lambda item: item[1]):
+                run = [request for request, _ in run]
+                if not bulk:
+                    results += [self.storage.save_request(request, check_available=check_available)
+                                for request in run]
+                    continue
+                result = self.storage.save_requests(pd.DataFrame(run), allow_conflicts=not check_available)
+                results += [int(i) if outcome == 'imported' else None
+                            for i, outcome in zip(result['id'], result['outcome'])]
+            return results
+
+        decisions = [_call_args(args, kwargs, 'request_id', 'status', 'admin_comment')
+                     for _, args, kwargs, _ in group]
+        found = [self.storage.get_booking_by_id(int(request_id)) is not None for request_id, _, _ in decisions]
+        decisions = [(int(i), status, comment or '') for (i, status, comment), ok in zip(decisions, found) if ok]
+        if decisions and not self.storage.apply_decisions(decisions):
+            return [False] * len(group)
+        return found
+
+
+def _call_args(args, kwargs, *names):
+    """Positional/keyword arguments of a storage call as a tuple in names order"""
+    values = dict(zip(names, args))
+    values.update(kwargs)
+    return tuple(values.get(name) for name in names)
+
+
+def _consecutive_groups(batch):
+    """Split a batch into runs that can be committed together.
+
+    save_request calls group by their check_available flag; other writes
+    only group with calls of the same method.
+    """
+    groups = []
+    for item in batch:
+        name, args, kwargs, _ = item
+        key = (name, _call_args(args, kwargs, 'request', 'check_available')[1]) if name == 'save_request' else name
+        if groups and groups[-1][0] == key:
+            groups[-1][1].append(item)
+        else:
+            groups.append((key, [item]))
+    return [items for _, items in groups]
+
+
+# ----- Client -----
+
+class RemoteStorage:
+    """Storage backend that forwards every call to a BookingService"""
+
+    def __init__(self, url=None, timeout=30):
+        parts = urlsplit(url or os.environ.get('VENUE_BOOKING_URL', DEFAULT_URL))
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self._conn = None
+
+    def _call(self, method, *args, fallback=None, **kwargs):
+        body = json.dumps({'args': encode(list(args)), 'kwargs': encode(kwargs)})
+        for attempt in range(2):
+            try:
+                if self._conn is None:
+                    self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                self._conn.request('POST', f'/api/{method}', body, {'Content-Type': 'application/json'})
+                response = self._conn.getresponse()
+                payload = json.loads(response.read())
+                if response.status != 200:
+                    print(f"Error from booking service ({method}): {payload.get('error')}")
+                    return fallback
+                return decode(payload['result'])
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                # A kept-alive connection may have been closed by the server; retry once on a new one
+                self._conn = None
+                if attempt == 1:
+                    print(f"Error contacting booking service: {e}")
+        return fallback
+
+    def load_bookings(self):
+        return self._call('load_bookings', fallback=pd.DataFrame())
+
+    def get_pending_requests(self):
+        return self._call('get_pending_requests', fallback=pd.DataFrame())
+
+    def get_all_bookings(self):
+        return self._call('get_all_bookings', fallback=pd.DataFrame())
+
+    def get_club_bookings(self, club_name):
+        return self._call('get_club_bookings', club_name, fallback=pd.DataFrame())
+
+    def query_bookings(self, status=None, club=None, venue=None, date_from=None, date_to=None,
+                       page=1, page_size=20):
+        return self._call('query_bookings', status=status, club=club, venue=venue, date_from=date_from,
+                          date_to=date_to, page=page, page_size=page_size, fallback=(pd.DataFrame(), 0))
+
+    def check_venue_availability(self, venue_name, date, time_slot):
+        return self._call('check_venue_availability', venue_name, date, time_slot, fallback=False)
+
+    def get_available_venues(self, venue_names, date, time_slot):
+        return self._call('get_available_venues', list(venue_names), date, time_slot, fallback=[])
+
+    def get_available_venues_for_slots(self, venue_names, slots):
+        slots = [tuple(slot) for slot in slots]
+        return self._call('get_available_venues_for_slots', list(venue_names), slots,
+                          fallback={slot: [] for slot in slots})
+
+    def get_conflicting_bookings(self, venue_name, date, time_slot, exclude_id=None):
+        return self._call('get_conflicting_bookings', venue_name, date, time_slot, exclude_id=exclude_id,
+                          fallback=pd.DataFrame())
+
+    def classify_pending_requests(self):
+        return self._call('classify_pending_requests', fallback=pd.DataFrame())
+
+    def check_slots(self, candidates):
+        return self._call('check_slots', candidates, fallback=pd.DataFrame())
+
+    def find_free_slots(self, venues, duration, date_from, date_to, min_capacity=0, categories=None,
+                        limit=None, day_start="08:00", day_end="22:00", step=30):
+        return self._call('find_free_slots', venues, duration, date_from, date_to, min_capacity=min_capacity,
+                          categories=categories, limit=limit, day_start=day_start, day_end=day_end, step=step,
+                          fallback=pd.DataFrame())
+
+    def get_booking_by_id(self, booking_id):
+        return self._call('get_booking_by_id', booking_id)
+
+    def load_logs(self, since=None, until=None, club=None, venue=None):
+        return self._call('load_logs', since=since, until=until, club=club, venue=venue,
+                          fallback=pd.DataFrame())
+
+    def iter_log_pages(self, page_size=50, since=None, until=None, club=None, venue=None):
+        offset = 0
+        while True:
+            page = self._call('log_page', offset=offset, limit=page_size, since=since, until=until,
+                              club=club, venue=venue, fallback=pd.DataFrame())
+            if page.empty:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            offset += len(page)
+
+    def save_request(self, request, check_available=False):
+        new_id = self._call('save_request', request, check_available=check_available)
+        if new_id is not None:
+            request['id'] = new_id
+        return new_id
+
+    def save_requests(self, requests, allow_conflicts=False, chunk_size=10000):
+        from storage import iter_request_chunks
+        chunks = list(iter_request_chunks(requests, chunk_size))
+        requests = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+        return self._call('save_requests', requests, allow_conflicts=allow_conflicts, chunk_size=chunk_size,
+                          fallback=pd.DataFrame())
+
+    def update_request_status(self, request_id, status, admin_comment=''):
+        return self._call('update_request_status', int(request_id), status, admin_comment, fallback=False)
+
+    def apply_decisions(self, decisions):
+        if isinstance(decisions, pd.DataFrame):
+            decisions = decisions[['id', 'status', 'admin_comment']].itertuples(index=False, name=None)
+        decisions = [(int(i), status, comment) for i, status, comment in decisions]
+        return self._call('apply_decisions', decisions, fallback=0)
+
+    def reassign_venues(self, assignments):
+        if isinstance(assignments, pd.DataFrame):
+            venue = 'venue' if 'venue' in assignments.columns else 'proposed_venue'
+            assignments = assignments[['id', venue]].itertuples(index=False, name=None)
+        assignments = [(int(i), venue) for i, venue in assignments]
+        return self._call('reassign_venues', assignments, fallback=0)
+
+    def check_series(self, series):
+        return self._call('check_series', series)
+
+    def save_series(self, series, check_available=True):
+        return self._call('save_series', series, check_available=check_available)
+
+    def update_series_status(self, series_id, status, admin_comment=''):
+        return self._call('update_series_status', int(series_id), status, admin_comment, fallback=False)
+
+    def get_series(self, status=None, club=None):
+        return self._call('get_series', status=status, club=club, fallback=pd.DataFrame())
+
+    def expand_series(self, date_from=None, date_to=None, status=None, club=None):
+        return self._call('expand_series', date_from=date_from, date_to=date_to, status=status, club=club,
+                          fallback=pd.DataFrame())
+
+    def get_version(self):
+        return self._call('get_version', fallback=-1)
+
+    def subscribe(self, listener):
+        """Changes are reported inside the service process; compare get_version() to notice them here"""
+
+    def unsubscribe(self, listener):
+        pass
+
+    def flush_logs(self):
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the booking store as a local HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--backend", help="storage backend behind the service (csv or sqlite)")
+    parser.add_argument("--max-batch", type=int, default=512, help="most writes committed together")
+    parser.add_argument("--batch-window", type=float, default=2, help="milliseconds to gather a write batch")
+    parser.add_argument("--log-batch-size", type=int, default=1)
+    args = parser.parse_args()
+
+    from storage import create_storage
+    if (args.backend or os.environ.get('VENUE_BOOKING_BACKEND', '')).lower() == 'remote':
+        print("The service needs a local backend (csv or sqlite).")
+        return 1
+    storage = create_storage(args.backend, log_batch_size=args.log_batch_size)
+    service = BookingService(storage, args.max_batch, args.batch_window / 1000)
+    # Portals on the remote backend see no storage events, so the service sends the e-mails
+    from notifications import open_dispatcher
+    notifier = open_dispatcher(storage)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if notifier is not None:
+            notifier.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Simulation Module - Headless discrete-event model of the booking workflow
+Part of the Venue Booking System
+
+This is the SimPy model from main.ipynb (Venue, Admin, BookingSystem) made
+importable. Venues are looked up by name in a dict, booked slots are kept
+as pre-parsed minute intervals in a VenueIntervalIndex, the log is kept as
+one list per column and nothing is printed unless verbose is set. Requests
+come from a generated Poisson arrival process instead of input() prompts.
+
+Time is measured in minutes of simulated time. Checking a venue and holding
+the slot happen without yielding, so they are atomic inside the simulation
+and need no per-venue lock.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pandas as pd
+import simpy
+from interval_index import VenueIntervalIndex, parse_time_slot, format_time_slot
+
+# (category, capacity) of the venues a campus typically has, in proportion
+VENUE_TYPES = [
+    ("Auditorium", 1000),
+    ("Lecture Theatre", 300),
+    ("Lecture Theatre", 300),
+    ("Conference Room", 100),
+    ("Conference Room", 100),
+    ("Conference Room", 100),
+]
+
+OPENING_MINUTE = 8 * 60
+CLOSING_MINUTE = 22 * 60
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+APPROVED = 'Approved'
+REJECTED_ADMIN = 'Rejected (Admin)'
+REJECTED_CONFLICT = 'Rejected (Conflict)'
+LOG_COLUMNS = ['Time', 'Club', 'Venue', 'Status', 'Day', 'Date', 'Time Slot', 'Latency']
+
+
+# ----- VENUE CLASS -----
+class Venue:
+    """A bookable venue; its schedule lives in the BookingSystem index"""
+
+    def __init__(self, name, category, capacity):
+        self.name = name
+        self.category = category
+        self.capacity = capacity
+
+
+# ----- ADMIN CLASS -----
+class Admin:
+    """Approves a request with a fixed probability"""
+
+    def __init__(self, approval_probability=0.8, rng=None):
+        self.approval_probability = approval_probability
+        self.rng = rng or random.Random()
+
+    def approve(self, request_info=None):
+        return self.rng.random() < self.approval_probability
+
+
+# ----- SYSTEM CLASS -----
+class BookingSystem:
+    """Checks availability, holds slots and logs admin decisions"""
+
+    def __init__(self, env, admin=None, review_time=0, n_admins=1, rng=None, verbose=False):
+        self.env = env
+        self.rng = rng or random.Random()
+        self.admin = admin or Admin(rng=self.rng)
+        self.verbose = verbose
+        self.venues = {}
+        self.categories = defaultdict(list)  # key: category, value: list of venues
+        self.schedule = VenueIntervalIndex()
+        # Mean admin review time in minutes; 0 decides instantly as in the notebook
+        self.review_time = review_time
+        self.admin_desk = simpy.Resource(env, capacity=n_admins) if review_time > 0 else None
+        self._next_hold = 0
+        self.booked_minutes = 0
+        self.logs = {column: [] for column in LOG_COLUMNS}
+
+    def add_venue(self, venue):
+        self.venues[venue.name] = venue
+        self.categories[venue.category].append(venue)
+
+    def is_available(self, venue_name, date_str, start, end):
+        return self.schedule.is_free(venue_name, date_str, start, end)
+
+    def suggest_available_venues(self, date_str, start, end):
+        """Available venue names per category for a date and slot"""
+        busy = self.schedule.busy_venues(date_str, start, end)
+        return {
+            category: [venue.name for venue in venues if venue.name not in busy]
+            for category, venues in self.categories.items()
+        }
+
+    def _log(self, arrived, club_name, venue_name, status, day, date_str, start, end):
+        logs = self.logs
+        logs['Time'].append(self.env.now)
+        logs['Club'].append(club_name)
+        logs['Venue'].append(venue_name)
+        logs['Status'].append(status)
+        logs['Day'].append(day)
+        logs['Date'].append(date_str)
+        logs['Time Slot'].append(start * 10000 + end)
+        logs['Latency'].append(self.env.now - arrived)
+        if self.verbose:
+            slot = format_time_slot(start, end)
+            if status == APPROVED:
+                print(f"[{self.env.now:.1f}] ✅ {club_name} booked {venue_name} on {date_str} for {slot}")
+            elif status == REJECTED_ADMIN:
+                print(f"[{self.env.now:.1f}] ❌ Admin rejected booking for {club_name} at {venue_name}")
+            else:
+                print(f"[{self.env.now:.1f}] ❌ Booking conflict: {venue_name} is already booked on {date_str} for {slot}")
+
+    def _hold(self, club_name, venue_name, day, date_str, start, end):
+        """Hold the slot if it is free; returns the hold id or None after logging a conflict"""
+        if venue_name not in self.venues or not self.schedule.is_free(venue_name, date_str, start, end):
+            self._log(self.env.now, club_name, venue_name, REJECTED_CONFLICT, day, date_str, start, end)
+            return None
+        self._next_hold += 1
+        self.schedule.add(venue_name, date_str, start, end, self._next_hold, None)
+        return self._next_hold
+
+    def _decide(self, hold, arrived, club_name, venue_name, day, date_str, start, end):
+        """Let the admin approve the held slot or roll it back"""
+        if self.admin.approve({'club': club_name, 'venue': venue_name, 'date': date_str}):
+            self.booked_minutes += end - start
+            self._log(arrived, club_name, venue_name, APPROVED, day, date_str, start, end)
+        else:
+            # If not approved by admin, roll back the booking
+            self.schedule.remove(venue_name, date_str, hold)
+            self._log(arrived, club_name, venue_name, REJECTED_ADMIN, day, date_str, start, end)
+
+    def submit(self, club_name, venue_name, day, date_str, start, end):
+        """Handle one request arriving now; returns a process if the admin review takes time"""
+        hold = self._hold(club_name, venue_name, day, date_str, start, end)
+        if hold is None:
+            return None
+        if self.admin_desk is None:
+            self._decide(hold, self.env.now, club_name, venue_name, day, date_str, start, end)
+            return None
+        return self.env.process(self._review(hold, self.env.now, club_name, venue_name, day, date_str, start, end))
+
+    def _review(self, hold, arrived, *request):
+        with self.admin_desk.request() as req:
+            yield req
+            yield self.env.timeout(self.rng.expovariate(1 / self.review_time))
+        self._decide(hold, arrived, *request)
+
+    def process_booking(self, club_name, venue_name, day, date_str, time_slot):
+        """SimPy process for one request with a "HH:MM-HH:MM" slot (as in the notebook)"""
+        start, end = parse_time_slot(time_slot)
+        review = self.submit(club_name, venue_name, day, date_str, start, end)
+        if review is not None:
+            yield review
+        else:
+            yield self.env.timeout(0)
+
+    def log_frame(self):
+        """The decision log as a DataFrame with notebook-style columns"""
+        df = pd.DataFrame(self.logs, columns=LOG_COLUMNS)
+        slots = df['Time Slot']
+        df['Time Slot'] = format_slots(slots // 10000, slots % 10000)
+        for column in ('Club', 'Venue', 'Status', 'Day', 'Date'):
+            df[column] = df[column].astype('category')
+        return df
+
+    def summary(self, n_days):
+        """Counts, conflict rate, approval latency and utilization of the run"""
+        statuses = pd.Series(self.logs['Status'], dtype='category')
+        counts = statuses.value_counts()
+        total = len(statuses)
+        latency = pd.Series(self.logs['Latency'], dtype=float)[statuses.to_numpy() != REJECTED_CONFLICT]
+        open_minutes = len(self.venues) * n_days * (CLOSING_MINUTE - OPENING_MINUTE)
+        return {
+            'requests': total,
+            'approved': int(counts.get(APPROVED, 0)),
+            'rejected_admin': int(counts.get(REJECTED_ADMIN, 0)),
+            'rejected_conflict': int(counts.get(REJECTED_CONFLICT, 0)),
+            'conflict_rate': counts.get(REJECTED_CONFLICT, 0) / total if total else 0.0,
+            'mean_latency': float(latency.mean()) if len(latency) else 0.0,
+            'utilization': self.booked_minutes / open_minutes if open_minutes else 0.0,
+        }
+
+    def report(self, file_path=None):
+        """Print the summary table and optionally append it to a CSV log"""
+        df = self.log_frame()
+        print("\n--- Booking Summary ---")
+        print(df)
+        if file_path:
+            df.to_csv(file_path, mode='a', header=not _has_rows(file_path), index=False)
+
+
+def format_slots(starts, ends):
+    """Vectorized format_time_slot over integer minute Series"""
+    def hhmm(minutes):
+        return (minutes // 60).astype(str).str.zfill(2) + ':' + (minutes % 60).astype(str).str.zfill(2)
+    return hhmm(starts) + '-' + hhmm(ends)
+
+
+def make_venues(n_venues):
+    """n_venues venues cycling through VENUE_TYPES"""
+    venues = []
+    for i in range(n_venues):
+        category, capacity = VENUE_TYPES[i % len(VENUE_TYPES)]
+        venues.append(Venue(f"{category}-{i + 1}", category, capacity))
+    return venues
+
+
+def booking_arrivals(env, system, n_requests, n_days, arrival_rate, n_clubs=50,
+                     first_date=date(2025, 1, 1), rng=None):
+    """SimPy process submitting n_requests generated requests as a Poisson stream.
+
+    arrival_rate is requests per simulated minute. Each request asks for a
+    uniformly chosen venue, one of n_days dates and a 30-180 minute slot on
+    a half-hour boundary within opening hours.
+    """
+    rng = rng or system.rng
+    venue_names = list(system.venues)
+    dates = [first_date + timedelta(days=d) for d in range(n_days)]
+    date_strs = [d.isoformat() for d in dates]
+    days = [WEEKDAYS[d.weekday()] for d in dates]
+    clubs = [f"Club-{c + 1}" for c in range(n_clubs)]
+    last_start = (CLOSING_MINUTE - OPENING_MINUTE) // 30 - 1
+
+    expovariate, randrange, choice = rng.expovariate, rng.randrange, rng.choice
+    timeout, submit = env.timeout, system.submit
+    for _ in range(n_requests):
+        yield timeout(expovariate(arrival_rate))
+        d = randrange(n_days)
+        start = OPENING_MINUTE + 30 * randrange(last_start + 1)
+        end = min(start + 30 * randrange(1, 7), CLOSING_MINUTE)
+        submit(choice(clubs), choice(venue_names), days[d], date_strs[d], start, end)
+
+
+def run_simulation(n_requests=10000, n_venues=100, n_days=30, arrival_rate=1.0,
+                   approval_probability=0.8, review_time=0, n_admins=1, seed=None, verbose=False):
+    """Build and run one simulation, returns the finished BookingSystem"""
+    rng = random.Random(seed)
+    env = simpy.Environment()
+    system = BookingSystem(env, Admin(approval_probability, rng), review_time=review_time,
+                           n_admins=n_admins, rng=rng, verbose=verbose)
+    for venue in make_venues(n_venues):
+        system.add_venue(venue)
+    env.process(booking_arrivals(env, system, n_requests, n_days, arrival_rate, rng=rng))
+    env.run()
+    return system
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the booking simulation without prompts")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--venues", type=int, default=100)
+    parser.add_argument("--days", type=int, default=30, help="distinct dates requests ask for")
+    parser.add_argument("--arrival-rate", type=float, default=1.0, help="requests per simulated minute")
+    parser.add_argument("--approval-probability", type=float, default=0.8)
+    parser.add_argument("--review-time", type=float, default=0,
+                        help="mean admin review time in minutes (0 = instant)")
+    parser.add_argument("--admins", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--log", help="append the decision log to this CSV file")
+    parser.add_argument("--verbose", action="store_true", help="print every decision")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    system = run_simulation(args.requests, args.venues, args.days, args.arrival_rate,
+                            args.approval_probability, args.review_time, args.admins,
+                            args.seed, args.verbose)
+    elapsed = time.perf_counter() - started
+
+    if args.log:
+        system.log_frame().to_csv(args.log, mode='a', header=not _has_rows(args.log), index=False)
+    summary = system.summary(args.days)
+    print(f"Simulated {summary['requests']} requests across {args.venues} venues in {elapsed:.1f}s")
+    print(f"  approved {summary['approved']}, rejected by admin {summary['rejected_admin']}, "
+          f"conflicts {summary['rejected_conflict']} ({summary['conflict_rate']:.1%})")
+    print(f"  mean approval latency {summary['mean_latency']:.1f} min, "
+          f"utilization {summary['utilization']:.1%}")
+    return 0
+
+
+def _has_rows(path):
+    """True if path exists and is nonempty"""
+    return os.path.exists(path) and os.stat(path).st_size > 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
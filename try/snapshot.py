@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Snapshot Module - Columnar Parquet snapshots of the bookings table
+Part of the Venue Booking System
+
+Needs the optional pyarrow package. In the snapshot club, venue, status
+and day are dictionary-encoded (categoricals), date is a date32 and the
+slot is stored as integer minutes next to the original string. Rows are
+sorted by date and venue so that row-group statistics let readers skip
+whole groups when filtering on either.
+"""
+
+import argparse
+import sys
+import pandas as pd
+from interval_index import parse_time_slots
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+    pq = None
+
+CATEGORICAL_COLUMNS = ['club', 'venue', 'status', 'day']
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet snapshots need pyarrow: pip install pyarrow")
+
+
+def to_arrow_table(bookings_df):
+    """Convert a bookings DataFrame to a compact, typed Arrow table"""
+    _require_pyarrow()
+    df = bookings_df.sort_values(['date', 'venue', 'id'], kind='stable').reset_index(drop=True)
+    if 'start_min' not in df.columns:
+        starts, ends = parse_time_slots(df['time_slot'])
+        df['start_min'] = starts
+        df['end_min'] = ends
+
+    columns = {
+        'id': pa.array(df['id'], type=pa.int64()),
+        'date': pa.array(pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce').dt.date, type=pa.date32()),
+        'start_min': pa.array(df['start_min'], type=pa.int16()),
+        'end_min': pa.array(df['end_min'], type=pa.int16()),
+        'expected_attendance': pa.array(pd.to_numeric(df['expected_attendance'], errors='coerce'), type=pa.int32()),
+    }
+    for column in CATEGORICAL_COLUMNS:
+        columns[column] = pa.array(df[column].astype('category')).cast(pa.dictionary(pa.int32(), pa.string()))
+    for column in ('event_name', 'contact_email', 'time_slot', 'purpose',
+                   'submitted_at', 'processed_at', 'admin_comment'):
+        values = df[column].astype(object).where(df[column].notna(), None)
+        columns[column] = pa.array(values, type=pa.string(), from_pandas=True)
+    return pa.table(columns)
+
+
+def save_snapshot(bookings_df, path, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+    """Write the bookings table as a Parquet snapshot"""
+    table = to_arrow_table(bookings_df)
+    pq.write_table(table, path, row_group_size=row_group_size, compression='zstd')
+
+
+def load_snapshot(path, columns=None, date_from=None, date_to=None, venues=None, statuses=None):
+    """Read a Parquet snapshot, only decoding the requested columns and row groups.
+
+    columns projects the result; date_from/date_to ("YYYY-MM-DD", inclusive),
+    venues and statuses are pushed down to the reader. Categoricals come back
+    as pandas categoricals and date as datetime64.
+    """
+    _require_pyarrow()
+    filters = []
+    if date_from is not None:
+        filters.append(('date', '>=', pd.Timestamp(date_from).date()))
+    if date_to is not None:
+        filters.append(('date', '<=', pd.Timestamp(date_to).date()))
+    if venues is not None:
+        filters.append(('venue', 'in', list(venues)))
+    if statuses is not None:
+        filters.append(('status', 'in', list(statuses)))
+
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return table.to_pandas(date_as_object=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the bookings table to a Parquet snapshot")
+    parser.add_argument("--output", default="bookings.parquet")
+    parser.add_argument("--backend", help="storage backend (csv or sqlite)")
+    args = parser.parse_args()
+
+    from storage import create_storage
+    bookings_df = create_storage(args.backend).load_bookings()
+    save_snapshot(bookings_df, args.output)
+    print(f"Wrote {len(bookings_df)} bookings to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
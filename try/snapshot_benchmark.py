@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Snapshot Benchmark - CSV versus Parquet load time and memory for the bookings table
+Part of the Venue Booking System
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+from snapshot import save_snapshot, load_snapshot
+from synthetic_data import synthetic_bookings
+
+CONFLICT_COLUMNS = ['venue', 'date', 'time_slot', 'status']
+
+
+def measure(label, load):
+    started = time.perf_counter()
+    df = load()
+    elapsed = time.perf_counter() - started
+    memory = df.memory_usage(deep=True).sum() / 2 ** 20
+    print(f"{label:<44} {elapsed:8.3f}s {memory:10.1f} MiB {len(df):>10} rows")
+    return elapsed, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and Parquet bookings loads")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="booking-snapshot-")
+    csv_path = os.path.join(workdir, "bookings.csv")
+    parquet_path = os.path.join(workdir, "bookings.parquet")
+
+    bookings_df = synthetic_bookings(args.rows)
+    bookings_df.to_csv(csv_path, index=False)
+    save_snapshot(bookings_df, parquet_path)
+    print(f"{args.rows} rows: CSV {os.path.getsize(csv_path) / 2 ** 20:.1f} MiB, "
+          f"Parquet {os.path.getsize(parquet_path) / 2 ** 20:.1f} MiB\n")
+    print(f"{'load':<44} {'time':>9} {'memory':>14} {'rows':>15}")
+
+    measure("CSV, all columns", lambda: pd.read_csv(csv_path))
+    measure("CSV, conflict columns (usecols)", lambda: pd.read_csv(csv_path, usecols=CONFLICT_COLUMNS))
+    measure("Parquet, all columns", lambda: load_snapshot(parquet_path))
+    measure("Parquet, venue/date/slot/status",
+            lambda: load_snapshot(parquet_path, columns=['venue', 'date', 'start_min', 'end_min', 'status']))
+    measure("Parquet, same + one week pushed down",
+            lambda: load_snapshot(parquet_path, columns=['venue', 'date', 'start_min', 'end_min', 'status'],
+                                  date_from="2025-03-01", date_to="2025-03-07"))
+    measure("Parquet, one venue pushed down",
+            lambda: load_snapshot(parquet_path, columns=['venue', 'date', 'start_min', 'end_min', 'status'],
+                                  venues=["Lab-5"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,798 @@
+#!/usr/bin/env python3
+"""
+SQLite Storage Module - SQLite backend for the booking data store
+Part of the Venue Booking System
+"""
+
+import atexit
+import sqlite3
+import pandas as pd
+from datetime import datetime
+from storage import (
+    BookingStorage, BOOKING_COLUMNS, LOG_COLUMNS, SLOT_COLUMNS,
+    conflict_matrix, count_slot_conflicts, prepare_request_batch,
+    find_import_conflicts, new_booking_rows, submission_log_entries, finish_import,
+    classify_pending, normalise_decisions, decision_log_entries,
+    normalise_reassignments, reassignment_log_entries,
+    FREE_SLOT_COLUMNS, eligible_venues, find_free_slots, with_series_occurrences
+)
+from series import (
+    SeriesIndex, SERIES_COLUMNS, prepare_series, series_conflicts, expand_series, series_log_entry
+)
+from interval_index import ACTIVE_STATUSES, VenueIntervalIndex, parse_time_slot, parse_time_slots
+from metrics import instrumented, record_error, record_rows_read, record_rows_written
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY,
+    club TEXT,
+    event_name TEXT,
+    contact_email TEXT,
+    day TEXT,
+    date TEXT,
+    time_slot TEXT,
+    venue TEXT,
+    expected_attendance INTEGER,
+    purpose TEXT,
+    status TEXT,
+    submitted_at TEXT,
+    processed_at TEXT,
+    admin_comment TEXT,
+    start_min INTEGER,
+    end_min INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_venue_date_status ON bookings (venue, date, status);
+CREATE INDEX IF NOT EXISTS idx_bookings_date_status ON bookings (date, status);
+CREATE INDEX IF NOT EXISTS idx_bookings_club ON bookings (club);
+CREATE INDEX IF NOT EXISTS idx_bookings_status ON bookings (status);
+CREATE TABLE IF NOT EXISTS booking_log (
+    time TEXT,
+    club TEXT,
+    venue TEXT,
+    status TEXT,
+    day TEXT,
+    date TEXT,
+    time_slot TEXT,
+    event TEXT,
+    admin_comment TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_log_time ON booking_log (time);
+CREATE INDEX IF NOT EXISTS idx_log_club ON booking_log (club);
+CREATE INDEX IF NOT EXISTS idx_log_venue ON booking_log (venue);
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    club TEXT,
+    event_name TEXT,
+    contact_email TEXT,
+    venue TEXT,
+    time_slot TEXT,
+    expected_attendance INTEGER,
+    purpose TEXT,
+    first_date TEXT,
+    until TEXT,
+    interval_weeks INTEGER,
+    exceptions TEXT,
+    status TEXT,
+    submitted_at TEXT,
+    processed_at TEXT,
+    admin_comment TEXT,
+    start_min INTEGER,
+    end_min INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_series_venue_status ON series (venue, status);
+CREATE INDEX IF NOT EXISTS idx_series_club ON series (club);
+"""
+
+ACTIVE_PLACEHOLDERS = ', '.join('?' for _ in ACTIVE_STATUSES)
+
+# Active series with an occurrence on a date, worked out in SQL; parameters are
+# (date, date, date, *ACTIVE_STATUSES, end, start, date)
+SERIES_ON_DATE = f"""
+    first_date <= ? AND until >= ?
+    AND CAST(julianday(?) - julianday(first_date) AS INTEGER) % (7 * interval_weeks) = 0
+    AND status IN ({ACTIVE_PLACEHOLDERS}) AND start_min < ? AND end_min > ?
+    AND instr(';' || COALESCE(exceptions, '') || ';', ';' || ? || ';') = 0
+"""
+
+
+@instrumented
+class SQLiteBookingStorage(BookingStorage):
+    """BookingStorage backed by a local SQLite database in WAL mode"""
+
+    def __init__(self, db_file="bookings.db", log_batch_size=1, log_fsync=True):
+        self.db_file = db_file
+        self.log_batch_size = max(1, int(log_batch_size))
+        self._log_buffer = []
+
+        # Autocommit mode; multi-statement changes open their own transaction
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=" + ("FULL" if log_fsync else "NORMAL"))
+        self.conn.executescript(SCHEMA)
+        self._listeners = []
+
+    def _query(self, sql, params=()):
+        """Run a SELECT and return the rows as a DataFrame"""
+        df = pd.read_sql_query(sql, self.conn, params=params)
+        record_rows_read(len(df))
+        return df
+
+    def _executemany(self, sql, rows):
+        """executemany() that counts the rows it wrote"""
+        cursor = self.conn.executemany(sql, rows)
+        record_rows_written(cursor.rowcount)
+        return cursor
+
+    def _bump_version(self):
+        """Count a change to bookings or series; call inside the write transaction"""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.conn.execute(f"PRAGMA user_version = {version + 1}")
+
+    def get_version(self):
+        """Commit counter of the store, kept in the database header"""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _rows(self, df, columns):
+        """DataFrame rows as tuples with NaN mapped to NULL"""
+        df = df.reindex(columns=columns).astype(object)
+        return list(df.where(pd.notna(df), None).itertuples(index=False, name=None))
+
+    def invalidate_cache(self):
+        """No resident tables to drop; SQLite keeps its own page cache"""
+
+    def get_cache_stats(self):
+        """This backend has no resident tables"""
+        return {}
+
+    def load_bookings(self):
+        """Load all bookings"""
+        return self._query("SELECT * FROM bookings ORDER BY id")
+
+    def save_bookings(self, bookings_df):
+        """Replace the bookings table with bookings_df"""
+        try:
+            bookings_df = bookings_df.copy()
+            starts, ends = parse_time_slots(bookings_df['time_slot'])
+            bookings_df['start_min'] = starts
+            bookings_df['end_min'] = ends
+            columns = BOOKING_COLUMNS + SLOT_COLUMNS
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.execute("DELETE FROM bookings")
+                self._bump_version()
+                self._executemany(
+                    f"INSERT INTO bookings ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    self._rows(bookings_df, columns)
+                )
+            return True
+        except Exception as e:
+            print(f"Error saving bookings: {e}")
+            record_error(e)
+            return False
+
+    def load_logs(self, since=None, until=None, club=None, venue=None):
+        """Load log entries, filtered on the indexed time/club/venue columns"""
+        self.flush_logs()
+        if isinstance(since, datetime):
+            since = since.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(until, datetime):
+            until = until.strftime('%Y-%m-%d %H:%M:%S')
+
+        clauses, params = [], []
+        for clause, value in (("time >= ?", since), ("time < ?", until), ("club = ?", club), ("venue = ?", venue)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(f"SELECT * FROM booking_log {where} ORDER BY rowid", params)
+
+    def iter_log_pages(self, page_size=50, since=None, until=None, club=None, venue=None):
+        """Yield the filtered log in pages, walking the table by rowid"""
+        self.flush_logs()
+        if isinstance(since, datetime):
+            since = since.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(until, datetime):
+            until = until.strftime('%Y-%m-%d %H:%M:%S')
+
+        clauses, params = ["rowid > ?"], []
+        for clause, value in (("time >= ?", since), ("time < ?", until), ("club = ?", club), ("venue = ?", venue)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        last_rowid = 0
+        while True:
+            page = self._query(
+                f"SELECT rowid AS log_rowid, * FROM booking_log WHERE {' AND '.join(clauses)} "
+                f"ORDER BY rowid LIMIT ?",
+                (last_rowid, *params, page_size)
+            )
+            if page.empty:
+                return
+            last_rowid = int(page['log_rowid'].iloc[-1])
+            yield page.drop(columns='log_rowid')
+            if len(page) < page_size:
+                return
+
+    def add_log(self, log_entry):
+        """Insert a log entry, batching log_batch_size entries per commit"""
+        self._log_buffer.append(log_entry)
+        if len(self._log_buffer) == 1 and self.log_batch_size > 1:
+            atexit.register(self.flush_logs)
+        if len(self._log_buffer) >= self.log_batch_size:
+            return self.flush_logs()
+        return True
+
+    def flush_logs(self):
+        """Write any buffered log entries"""
+        if not self._log_buffer:
+            return True
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._insert_logs(self._log_buffer)
+            self._log_buffer = []
+            atexit.unregister(self.flush_logs)
+            return True
+        except Exception as e:
+            print(f"Error writing log entries: {e}")
+            record_error(e)
+            return False
+
+    def _insert_logs(self, log_entries):
+        self._executemany(
+            f"INSERT INTO booking_log ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' for _ in LOG_COLUMNS)})",
+            [tuple(entry.get(column) for column in LOG_COLUMNS) for entry in log_entries]
+        )
+
+    def save_request(self, request, check_available=False):
+        """Save a new booking request; the availability check and insert share one transaction"""
+        try:
+            start, end = parse_time_slot(request['time_slot'])
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                if check_available and self._has_overlap(request['venue'], request['date'], start, end):
+                    print(f"{request['venue']} is no longer available on {request['date']} at {request['time_slot']}.")
+                    return None
+
+                request['status'] = 'Pending'
+                request['submitted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                request['processed_at'] = None
+                request['admin_comment'] = None
+                columns = [c for c in BOOKING_COLUMNS if c != 'id'] + SLOT_COLUMNS
+                values = [request.get(c) for c in columns[:-2]] + [start, end]
+                cursor = self.conn.execute(
+                    f"INSERT INTO bookings ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    values
+                )
+                new_id = cursor.lastrowid
+                record_rows_written(1)
+                request['id'] = new_id
+                self._bump_version()
+
+                self._insert_logs([{
+                    'time': request['submitted_at'],
+                    'club': request['club'],
+                    'venue': request['venue'],
+                    'status': 'Submitted',
+                    'day': request['day'],
+                    'date': request['date'],
+                    'time_slot': request['time_slot'],
+                    'event': request['event_name'],
+                    'admin_comment': ''
+                }])
+            self._notify('created', None, pd.DataFrame([dict(request, start_min=start, end_min=end)]))
+            return new_id
+
+        except Exception as e:
+            print(f"Error saving request: {e}")
+            record_error(e)
+            return None
+
+    def save_requests(self, requests, allow_conflicts=False, chunk_size=10000):
+        """Import many booking requests in one transaction (see BookingStorage.save_requests)"""
+        result = prepare_request_batch(requests, chunk_size)
+        valid = result['reason'] == ''
+        if not valid.any():
+            return finish_import(result, valid, None, None)
+
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                batch = result[valid]
+                conflicts = pd.Series(False, index=batch.index)
+                if not allow_conflicts:
+                    existing = self.check_slots(batch)['conflicts'] + self._get_series_index().busy_mask(batch)
+                    conflicts = find_import_conflicts(batch, existing)
+                if conflicts.all():
+                    return finish_import(result, valid, None, None)
+
+                first_id = self.conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM bookings").fetchone()[0]
+                new_rows = new_booking_rows(batch[~conflicts], first_id)
+                columns = BOOKING_COLUMNS + SLOT_COLUMNS
+                self._executemany(
+                    f"INSERT INTO bookings ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    self._rows(new_rows, columns)
+                )
+                self._executemany(
+                    f"INSERT INTO booking_log ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' for _ in LOG_COLUMNS)})",
+                    self._rows(submission_log_entries(new_rows), LOG_COLUMNS)
+                )
+                self._bump_version()
+        except Exception as e:
+            print(f"Error saving requests: {e}")
+            record_error(e)
+            return finish_import(result, valid, None, None, error=e)
+
+        self._notify('created', None, new_rows)
+        return finish_import(result, valid, new_rows, conflicts)
+
+    def add_logs(self, log_entries):
+        """Insert many log entries in one transaction"""
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self._executemany(
+                    f"INSERT INTO booking_log ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' for _ in LOG_COLUMNS)})",
+                    self._rows(pd.DataFrame(log_entries), LOG_COLUMNS)
+                )
+            return True
+        except Exception as e:
+            print(f"Error adding log entries: {e}")
+            record_error(e)
+            return False
+
+    def update_request_status(self, request_id, status, admin_comment=''):
+        """Update the status of a request and log it in one transaction"""
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                old_row = self._query("SELECT * FROM bookings WHERE id = ?", (int(request_id),))
+                if old_row.empty:
+                    print(f"Request ID {request_id} not found.")
+                    return False
+
+                processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                self.conn.execute(
+                    "UPDATE bookings SET status = ?, processed_at = ?, admin_comment = ? WHERE id = ?",
+                    (status, processed_time, admin_comment, int(request_id))
+                )
+                record_rows_written(1)
+                self._bump_version()
+                row = old_row.iloc[0]
+                self._insert_logs([{
+                    'time': processed_time,
+                    'club': row['club'],
+                    'venue': row['venue'],
+                    'status': status,
+                    'day': row['day'],
+                    'date': row['date'],
+                    'time_slot': row['time_slot'],
+                    'event': row['event_name'],
+                    'admin_comment': admin_comment
+                }])
+            self._notify('status_changed', old_row,
+                         old_row.assign(status=status, processed_at=processed_time, admin_comment=admin_comment))
+            return True
+
+        except Exception as e:
+            print(f"Error updating request status: {e}")
+            record_error(e)
+            return False
+
+    def classify_pending_requests(self):
+        """Pending requests with their conflict category (see storage.classify_pending)"""
+        try:
+            active = self._query(
+                f"""SELECT * FROM bookings WHERE status IN ({ACTIVE_PLACEHOLDERS})
+                    AND date IN (SELECT DISTINCT date FROM bookings WHERE status = 'Pending')
+                    ORDER BY id""",
+                ACTIVE_STATUSES
+            )
+            return classify_pending(active, self._get_series_index())
+        except Exception as e:
+            print(f"Error classifying pending requests: {e}")
+            record_error(e)
+            return pd.DataFrame()
+
+    def apply_decisions(self, decisions):
+        """Apply many (request_id, status, admin_comment) decisions in one transaction"""
+        try:
+            decisions = normalise_decisions(decisions)
+            if decisions.empty:
+                return 0
+            processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS decision_ids (id INTEGER PRIMARY KEY)")
+                self.conn.execute("DELETE FROM decision_ids")
+                self.conn.executemany("INSERT OR IGNORE INTO decision_ids VALUES (?)",
+                                      [(int(i),) for i in decisions['id']])
+                rows = self._query("SELECT * FROM bookings WHERE id IN (SELECT id FROM decision_ids)")
+                found = decisions[decisions['id'].isin(rows['id'])]
+                if len(found) < len(decisions):
+                    print(f"{len(decisions) - len(found)} request IDs not found.")
+                rows = rows.set_index('id').loc[found['id']].reset_index()
+                self._executemany(
+                    "UPDATE bookings SET status = ?, processed_at = ?, admin_comment = ? WHERE id = ?",
+                    [(status, processed_time, comment, int(i))
+                     for i, status, comment in zip(found['id'], found['status'], found['admin_comment'])]
+                )
+                self._insert_logs(decision_log_entries(rows, found, processed_time).to_dict('records'))
+                self._bump_version()
+            self._notify('status_changed', rows, rows.assign(
+                status=found['status'].to_numpy(), processed_at=processed_time,
+                admin_comment=found['admin_comment'].to_numpy()))
+            return len(found)
+        except Exception as e:
+            print(f"Error applying decisions: {e}")
+            record_error(e)
+            return 0
+
+    def reassign_venues(self, assignments):
+        """Move many pending requests to other venues in one transaction"""
+        try:
+            assignments = normalise_reassignments(assignments)
+            if assignments.empty:
+                return 0
+            processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS reassigned_ids (id INTEGER PRIMARY KEY)")
+                self.conn.execute("DELETE FROM reassigned_ids")
+                self.conn.executemany("INSERT OR IGNORE INTO reassigned_ids VALUES (?)",
+                                      [(int(i),) for i in assignments['id']])
+                rows = self._query("SELECT * FROM bookings WHERE status = 'Pending' "
+                                   "AND id IN (SELECT id FROM reassigned_ids)")
+                found = assignments[assignments['id'].isin(rows['id'])]
+                if len(found) < len(assignments):
+                    print(f"{len(assignments) - len(found)} request IDs not found or no longer pending.")
+                rows = rows.set_index('id').loc[found['id']].reset_index()
+                self._executemany(
+                    "UPDATE bookings SET venue = ? WHERE id = ?",
+                    [(venue, int(i)) for i, venue in zip(found['id'], found['venue'])]
+                )
+                self._insert_logs(reassignment_log_entries(rows, found['venue'].to_numpy(),
+                                                           processed_time).to_dict('records'))
+                self._bump_version()
+            self._notify('moved', rows, rows.assign(venue=found['venue'].to_numpy()))
+            return len(found)
+        except Exception as e:
+            print(f"Error reassigning venues: {e}")
+            record_error(e)
+            return 0
+
+    def query_bookings(self, status=None, club=None, venue=None, date_from=None, date_to=None,
+                       page=1, page_size=20):
+        """Return (page_df, total) for the bookings matching the filters"""
+        try:
+            clauses, params = [], []
+            for clause, value in (("status = ?", status), ("club = ?", club), ("venue = ?", venue),
+                                  ("date >= ?", date_from), ("date <= ?", date_to)):
+                if value is not None:
+                    clauses.append(clause)
+                    params.append(value)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            total = self.conn.execute(f"SELECT COUNT(*) FROM bookings {where}", params).fetchone()[0]
+            page_df = self._query(
+                f"SELECT * FROM bookings {where} ORDER BY id LIMIT ? OFFSET ?",
+                (*params, page_size, (max(page, 1) - 1) * page_size)
+            )
+            return page_df, total
+        except Exception as e:
+            print(f"Error querying bookings: {e}")
+            record_error(e)
+            return pd.DataFrame(), 0
+
+    def get_pending_requests(self):
+        """Get all pending requests"""
+        try:
+            return self._query("SELECT * FROM bookings WHERE status = 'Pending' ORDER BY id")
+        except Exception as e:
+            print(f"Error getting pending requests: {e}")
+            record_error(e)
+            return pd.DataFrame()
+
+    def get_all_bookings(self):
+        """Get all bookings"""
+        return self.load_bookings()
+
+    def get_club_bookings(self, club_name):
+        """Get all bookings for a specific club"""
+        try:
+            return self._query("SELECT * FROM bookings WHERE club = ? ORDER BY id", (club_name,))
+        except Exception as e:
+            print(f"Error getting club bookings: {e}")
+            record_error(e)
+            return pd.DataFrame()
+
+    def _has_overlap(self, venue_name, date, start, end):
+        row = self.conn.execute(
+            f"""SELECT 1 FROM bookings
+                WHERE venue = ? AND date = ? AND status IN ({ACTIVE_PLACEHOLDERS})
+                  AND start_min < ? AND end_min > ?
+                LIMIT 1""",
+            (venue_name, date, *ACTIVE_STATUSES, end, start)
+        ).fetchone()
+        if row is None:
+            row = self.conn.execute(
+                f"SELECT 1 FROM series WHERE venue = ? AND {SERIES_ON_DATE} LIMIT 1",
+                (venue_name, date, date, date, *ACTIVE_STATUSES, end, start, date)
+            ).fetchone()
+        return row is not None
+
+    def check_venue_availability(self, venue_name, date, time_slot):
+        """Check if a venue is available for a given date and time slot"""
+        try:
+            start_new, end_new = parse_time_slot(time_slot)
+            return not self._has_overlap(venue_name, date, start_new, end_new)
+        except Exception as e:
+            print(f"Error checking venue availability: {e}")
+            record_error(e)
+            return False
+
+    def get_available_venues_for_slots(self, venue_names, slots):
+        """For each (date, time_slot) pair, return the venues in venue_names that are free"""
+        available = {}
+        for date, time_slot in slots:
+            try:
+                start_new, end_new = parse_time_slot(time_slot)
+                busy = {
+                    venue for (venue,) in self.conn.execute(
+                        f"""SELECT DISTINCT venue FROM bookings
+                            WHERE date = ? AND status IN ({ACTIVE_PLACEHOLDERS})
+                              AND start_min < ? AND end_min > ?""",
+                        (date, *ACTIVE_STATUSES, end_new, start_new)
+                    )
+                }
+                busy.update(venue for (venue,) in self.conn.execute(
+                    f"SELECT DISTINCT venue FROM series WHERE {SERIES_ON_DATE}",
+                    (date, date, date, *ACTIVE_STATUSES, end_new, start_new, date)
+                ))
+                available[(date, time_slot)] = [v for v in venue_names if v not in busy]
+            except Exception as e:
+                print(f"Error checking venue availability: {e}")
+                record_error(e)
+                available[(date, time_slot)] = []
+        return available
+
+    def get_conflicting_bookings(self, venue_name, date, time_slot, exclude_id=None):
+        """Get all conflicting bookings for a given venue, date and time slot"""
+        try:
+            start_new, end_new = parse_time_slot(time_slot)
+            conflicts = self._query(
+                f"""SELECT * FROM bookings
+                    WHERE venue = ? AND date = ? AND status IN ({ACTIVE_PLACEHOLDERS})
+                      AND start_min < ? AND end_min > ? AND id IS NOT ?
+                    ORDER BY id""",
+                (venue_name, date, *ACTIVE_STATUSES, end_new, start_new,
+                 None if exclude_id is None else int(exclude_id))
+            )
+            series = self._query(
+                f"SELECT * FROM series WHERE venue = ? AND {SERIES_ON_DATE} ORDER BY series_id",
+                (venue_name, date, date, date, *ACTIVE_STATUSES, end_new, start_new, date)
+            )
+            conflicts = with_series_occurrences(conflicts, series, date)
+            return conflicts if not conflicts.empty else pd.DataFrame()
+        except Exception as e:
+            print(f"Error getting conflicting bookings: {e}")
+            record_error(e)
+            return pd.DataFrame()
+
+    def get_conflict_matrix(self, venue_name, date, time_slots, exclude_id=None):
+        """Check many candidate slots for one venue and date at once"""
+        booked = self._query(
+            f"""SELECT id, start_min, end_min FROM bookings
+                WHERE venue = ? AND date = ? AND status IN ({ACTIVE_PLACEHOLDERS}) AND id IS NOT ?
+                ORDER BY id""",
+            (venue_name, date, *ACTIVE_STATUSES, None if exclude_id is None else int(exclude_id))
+        )
+        return conflict_matrix(time_slots, booked)
+
+    def check_slots(self, candidates):
+        """Bulk-check candidate (venue, date, time_slot) rows against active bookings"""
+        candidates = pd.DataFrame(candidates)
+        dates = list(pd.unique(candidates['date']))
+        frames = []
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(dates), 500):
+            chunk = dates[i:i + 500]
+            frames.append(self._query(
+                f"""SELECT venue, date, start_min, end_min FROM bookings
+                    WHERE date IN ({', '.join('?' for _ in chunk)})
+                      AND status IN ({ACTIVE_PLACEHOLDERS}) AND start_min >= 0""",
+                (*chunk, *ACTIVE_STATUSES)
+            ))
+        active = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+            columns=['venue', 'date', 'start_min', 'end_min'])
+        return count_slot_conflicts(candidates, active)
+
+    def find_free_slots(self, venues, duration, date_from, date_to, min_capacity=0, categories=None,
+                        limit=None, day_start="08:00", day_end="22:00", step=30):
+        """Free gaps or earliest slots, from the active bookings of the range read in one query"""
+        try:
+            names = eligible_venues(venues, min_capacity, categories)
+            booked = self._query(
+                f"""SELECT id, venue, date, start_min, end_min, status FROM bookings
+                    WHERE status IN ({ACTIVE_PLACEHOLDERS}) AND date BETWEEN ? AND ?
+                    AND venue IN ({', '.join('?' for _ in names)})
+                    ORDER BY venue, date, start_min""",
+                (*ACTIVE_STATUSES, date_from, date_to, *names)
+            )
+            day_start, day_end = parse_time_slot(f"{day_start}-{day_end}")
+            return find_free_slots(VenueIntervalIndex.from_bookings(booked), venues, duration, date_from, date_to,
+                                   min_capacity, categories, limit, day_start, day_end, step,
+                                   self._get_series_index())
+        except Exception as e:
+            print(f"Error finding free slots: {e}")
+            record_error(e)
+            return pd.DataFrame(columns=FREE_SLOT_COLUMNS)
+
+    def _get_series_index(self):
+        """Weekday index of the active series, read in one query"""
+        return SeriesIndex.from_series(self._query(
+            f"SELECT * FROM series WHERE status IN ({ACTIVE_PLACEHOLDERS})", ACTIVE_STATUSES))
+
+    def _series_clashes(self, series):
+        """Conflicts of a prepared series, reading only its venue, slot and date range"""
+        booked = self._query(
+            f"""SELECT id, venue, date, time_slot, start_min, end_min, status FROM bookings
+                WHERE venue = ? AND date BETWEEN ? AND ? AND status IN ({ACTIVE_PLACEHOLDERS})
+                  AND start_min < ? AND end_min > ?""",
+            (series['venue'], series['first_date'], series['until'], *ACTIVE_STATUSES,
+             series['end_min'], series['start_min'])
+        )
+        others = self._query(
+            f"""SELECT * FROM series
+                WHERE venue = ? AND status IN ({ACTIVE_PLACEHOLDERS}) AND first_date <= ? AND until >= ?
+                  AND start_min < ? AND end_min > ?""",
+            (series['venue'], *ACTIVE_STATUSES, series['until'], series['first_date'],
+             series['end_min'], series['start_min'])
+        )
+        return series_conflicts(series, booked, others)
+
+    def check_series(self, series):
+        """Every date on which a recurring series would clash; None if it is not valid"""
+        try:
+            series = prepare_series(series)
+        except ValueError as e:
+            print(f"Invalid series: {e}")
+            return None
+        try:
+            return self._series_clashes(series)
+        except Exception as e:
+            print(f"Error checking series: {e}")
+            record_error(e)
+            return None
+
+    def save_series(self, series, check_available=True):
+        """Save a recurring booking request; the conflict check and insert share one transaction"""
+        try:
+            series = prepare_series(series)
+        except ValueError as e:
+            print(f"Invalid series: {e}")
+            return None
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                if check_available:
+                    conflicts = self._series_clashes(series)
+                    if not conflicts.empty:
+                        print(f"{series['venue']} is taken on {conflicts['date'].nunique()} dates of the series, "
+                              f"first on {conflicts['date'].iloc[0]}.")
+                        return None
+
+                series.update(status='Pending', processed_at=None, admin_comment=None,
+                              submitted_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                columns = SERIES_COLUMNS[1:] + SLOT_COLUMNS
+                cursor = self.conn.execute(
+                    f"INSERT INTO series ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    [series.get(column) for column in columns]
+                )
+                record_rows_written(1)
+                series['series_id'] = cursor.lastrowid
+                self._bump_version()
+                self._insert_logs([series_log_entry(series, 'Submitted', series['submitted_at'])])
+            self._notify('series_created', None, pd.DataFrame([series]))
+            return series['series_id']
+
+        except Exception as e:
+            print(f"Error saving series: {e}")
+            record_error(e)
+            return None
+
+    def update_series_status(self, series_id, status, admin_comment=''):
+        """Approve or reject every date of a series and log it in one transaction"""
+        try:
+            processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                series = self._query("SELECT * FROM series WHERE series_id = ?", (int(series_id),))
+                if series.empty:
+                    print(f"Series ID {series_id} not found.")
+                    return False
+                self.conn.execute(
+                    "UPDATE series SET status = ?, processed_at = ?, admin_comment = ? WHERE series_id = ?",
+                    (status, processed_time, admin_comment, int(series_id))
+                )
+                record_rows_written(1)
+                self._bump_version()
+                self._insert_logs([series_log_entry(series.iloc[0].to_dict(), status, processed_time,
+                                                    admin_comment)])
+            self._notify('series_status_changed', series,
+                         series.assign(status=status, processed_at=processed_time, admin_comment=admin_comment))
+            return True
+        except Exception as e:
+            print(f"Error updating series status: {e}")
+            record_error(e)
+            return False
+
+    def get_series(self, status=None, club=None):
+        """Series records, optionally only those with a status or of one club"""
+        try:
+            clauses, params = [], []
+            for clause, value in (("status = ?", status), ("club = ?", club)):
+                if value is not None:
+                    clauses.append(clause)
+                    params.append(value)
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            return self._query(f"SELECT {', '.join(SERIES_COLUMNS)} FROM series {where} ORDER BY series_id", params)
+        except Exception as e:
+            print(f"Error getting series: {e}")
+            record_error(e)
+            return pd.DataFrame(columns=SERIES_COLUMNS)
+
+    def expand_series(self, date_from=None, date_to=None, status=None, club=None):
+        """Occurrences of the matching series between date_from and date_to"""
+        clauses, params = [], []
+        for clause, value in (("status = ?", status), ("club = ?", club),
+                              ("until >= ?", date_from), ("first_date <= ?", date_to)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return expand_series(self._query(f"SELECT * FROM series {where} ORDER BY series_id", params),
+                             date_from, date_to)
+
+    def get_booking_by_id(self, booking_id):
+        """Get a specific booking by ID"""
+        try:
+            booking = self._query("SELECT * FROM bookings WHERE id = ?", (int(booking_id),))
+            return booking.iloc[0] if not booking.empty else None
+        except Exception as e:
+            print(f"Error getting booking by ID: {e}")
+            record_error(e)
+            return None
+
+    def import_tables(self, bookings_df, logs_df, series_df=None):
+        """Bulk-load bookings, log rows and recurring series (used by the CSV migration)"""
+        bookings_df = bookings_df.copy()
+        starts, ends = parse_time_slots(bookings_df['time_slot'])
+        bookings_df['start_min'] = starts
+        bookings_df['end_min'] = ends
+        booking_columns = BOOKING_COLUMNS + SLOT_COLUMNS
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._executemany(
+                f"INSERT INTO bookings ({', '.join(booking_columns)}) VALUES ({', '.join('?' for _ in booking_columns)})",
+                self._rows(bookings_df, booking_columns)
+            )
+            self._bump_version()
+            self._executemany(
+                f"INSERT INTO booking_log ({', '.join(LOG_COLUMNS)}) VALUES ({', '.join('?' for _ in LOG_COLUMNS)})",
+                self._rows(logs_df, LOG_COLUMNS)
+            )
+            if series_df is not None and not series_df.empty:
+                series_df = series_df.copy()
+                starts, ends = parse_time_slots(series_df['time_slot'])
+                series_df['start_min'] = starts
+                series_df['end_min'] = ends
+                series_columns = SERIES_COLUMNS + SLOT_COLUMNS
+                self._executemany(
+                    f"INSERT INTO series ({', '.join(series_columns)}) VALUES ({', '.join('?' for _ in series_columns)})",
+                    self._rows(series_df, series_columns)
+                )
+
+    def close(self):
+        """Flush buffered logs and close the database"""
+        self.flush_logs()
+        self.conn.close()
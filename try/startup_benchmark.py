@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark - Time until the portals are usable, quick path versus pandas
+Part of the Venue Booking System
+
+Every measurement runs in a fresh Python process against a scratch store
+filled with synthetic data, because import time is what is being measured.
+Each task is done twice: through the quick stdlib path the portals now use
+(records.RecordReader) and through the pandas storage classes, as the
+portals used to start.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# task -> (quick code, pandas code); BOOKING_ID and CLUB are filled in per store
+TASKS = {
+    'menu ready (club)': (
+        "import club; club.ClubPortal()",
+        "import club, storage; club.ClubPortal().storage",
+    ),
+    'menu ready (admin)': (
+        "import admin; admin.AdminPortal()",
+        "import admin, storage; admin.AdminPortal().storage",
+    ),
+    'check one booking': (
+        "import records; records.RecordReader().get_booking_by_id(BOOKING_ID)",
+        "import storage; storage.create_storage().get_booking_by_id(BOOKING_ID)",
+    ),
+    "list a club's bookings": (
+        "import records; records.RecordReader().get_club_bookings(CLUB)",
+        "import storage; storage.create_storage().get_club_bookings(CLUB)",
+    ),
+}
+
+
+def time_process(code, workdir, env, repeats):
+    """Wall-clock seconds of running code in a new interpreter, one per repeat"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - started)
+    return np.array(timings)
+
+
+def prepare_store(backend, n_rows, seed):
+    """Scratch directory with a filled store; returns (workdir, booking id, club)"""
+    from storage import create_storage
+    from synthetic_data import load_dataset, synthetic_bookings, synthetic_logs
+
+    workdir = tempfile.mkdtemp(prefix=f"booking-startup-{backend}-{n_rows}-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        bookings_df = synthetic_bookings(n_rows, seed=seed)
+        load_dataset(create_storage(backend), bookings_df, synthetic_logs(bookings_df))
+    finally:
+        os.chdir(previous_dir)
+    # The last booking is the worst case for a scan
+    return workdir, int(bookings_df['id'].iloc[-1]), bookings_df['club'].iloc[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare portal startup with and without pandas")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir, booking_id, club = prepare_store(args.backend, args.rows, args.seed)
+    env = dict(os.environ, VENUE_BOOKING_BACKEND=args.backend,
+               PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get("PYTHONPATH")])))
+    print(f"{args.backend} store with {args.rows} bookings in {workdir}, median of {args.repeats} runs\n")
+    print(f"{'task':<26} {'quick':>9} {'pandas':>9} {'speed-up':>9}")
+    for task, (quick, full) in TASKS.items():
+        timings = []
+        for code in (quick, full):
+            code = code.replace("BOOKING_ID", str(booking_id)).replace("CLUB", repr(club))
+            timings.append(np.median(time_process(code, workdir, env, args.repeats)))
+        print(f"{task:<26} {timings[0]:8.3f}s {timings[1]:8.3f}s {timings[1] / timings[0]:8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
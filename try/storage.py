@@ -5,110 +5,980 @@ Part of the Venue Booking System
 """
 
 import os
+import csv
+import io
+import glob
+import atexit
+import random
+import shutil
+import time
+import tempfile
+from contextlib import contextmanager
 import pandas as pd
 from datetime import datetime
 import warnings
+from interval_index import (
+    VenueIntervalIndex, ACTIVE_STATUSES, parse_time_slot, parse_time_slots, format_time_slot, free_gaps
+)
+from series import (
+    SeriesIndex, SERIES_COLUMNS, prepare_series, series_conflicts, expand_series, series_log_entry
+)
+from metrics import instrumented, record_error, record_rows_read, record_rows_written, record_bytes_written
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Parsed from time_slot when the table is loaded or written, never stored in the CSV
+SLOT_COLUMNS = ['start_min', 'end_min']
+
+BOOKING_COLUMNS = [
+    'id', 'club', 'event_name', 'contact_email', 'day', 'date', 
+    'time_slot', 'venue', 'expected_attendance', 'purpose',
+    'status', 'submitted_at', 'processed_at', 'admin_comment'
+]
+
+LOG_COLUMNS = [
+    'time', 'club', 'venue', 'status', 'day', 'date', 
+    'time_slot', 'event', 'admin_comment'
+]
+
+def conflict_matrix(time_slots, booked):
+    """Boolean overlap matrix of candidate slots (rows) against booked rows (columns, by id)"""
+    time_slots = list(time_slots)
+    starts, ends = parse_time_slots(time_slots)
+    if (starts < 0).any():
+        bad = [slot for slot, start in zip(time_slots, starts) if start < 0]
+        raise ValueError(f"Invalid time slots: {bad[:5]}")
+
+    booked_start = booked['start_min'].to_numpy()
+    booked_end = booked['end_min'].to_numpy()
+    matrix = (starts[:, None] < booked_end[None, :]) & (ends[:, None] > booked_start[None, :])
+    return pd.DataFrame(matrix, index=time_slots, columns=booked['id'].to_numpy())
+
+
+def count_slot_conflicts(candidates, active):
+    """Parse candidate slots and count their overlaps with the active (venue, date, start_min, end_min) rows"""
+    result = pd.DataFrame(candidates).reset_index(drop=True)
+    starts, ends = parse_time_slots(result['time_slot'])
+    result['start_min'] = starts
+    result['end_min'] = ends
+    result['valid'] = (starts >= 0) & (starts < ends)
+    result['conflicts'] = 0
+    if active.empty or not result['valid'].any():
+        return result
+
+    # Pair every candidate with the bookings on the same venue/date, then test overlap in one pass
+    pairs = result.loc[result['valid'], ['venue', 'date', 'start_min', 'end_min']].reset_index().merge(
+        active, on=['venue', 'date'], suffixes=('', '_booked')
+    )
+    overlaps = (pairs['start_min'] < pairs['end_min_booked']) & (pairs['end_min'] > pairs['start_min_booked'])
+    counts = overlaps.groupby(pairs['index']).sum()
+    result.loc[counts.index, 'conflicts'] = counts.to_numpy()
+    return result
+
+
+# Fields a club supplies when filing a request; the rest are set by the storage
+REQUEST_FIELDS = [
+    'club', 'event_name', 'contact_email', 'day', 'date',
+    'time_slot', 'venue', 'expected_attendance', 'purpose'
+]
+REQUIRED_REQUEST_FIELDS = ['club', 'event_name', 'date', 'time_slot', 'venue', 'expected_attendance']
+
+
+def iter_request_chunks(requests, chunk_size=10000):
+    """Yield DataFrame chunks from a DataFrame, an iterable of DataFrames or an iterable of dicts"""
+    if isinstance(requests, pd.DataFrame):
+        for start in range(0, len(requests), chunk_size):
+            yield requests.iloc[start:start + chunk_size]
+        return
+    pending = []
+    for item in requests:
+        if isinstance(item, pd.DataFrame):
+            if pending:
+                yield pd.DataFrame(pending)
+                pending = []
+            yield item
+            continue
+        pending.append(item)
+        if len(pending) >= chunk_size:
+            yield pd.DataFrame(pending)
+            pending = []
+    if pending:
+        yield pd.DataFrame(pending)
+
+
+def prepare_requests(chunk):
+    """Validate and normalise a chunk of requests in one vectorized pass.
+
+    Returns the chunk restricted to REQUEST_FIELDS plus start_min/end_min and
+    a 'reason' column that is empty for valid rows.
+    """
+    chunk = pd.DataFrame(chunk).reindex(columns=REQUEST_FIELDS).reset_index(drop=True)
+    reason = pd.Series('', index=chunk.index, dtype=object)
+
+    for field in REQUIRED_REQUEST_FIELDS:
+        missing = chunk[field].isna() | (chunk[field].astype(str).str.strip() == '')
+        reason = reason.mask(missing & (reason == ''), f"missing {field}")
+
+    dates = pd.to_datetime(chunk['date'], format='%Y-%m-%d', errors='coerce')
+    reason = reason.mask(dates.isna() & (reason == ''), "invalid date")
+    chunk['date'] = dates.dt.strftime('%Y-%m-%d')
+    chunk['day'] = chunk['day'].where(chunk['day'].notna() & (chunk['day'] != ''), dates.dt.day_name())
+
+    starts, ends = parse_time_slots(chunk['time_slot'])
+    chunk['start_min'] = starts
+    chunk['end_min'] = ends
+    reason = reason.mask(((starts < 0) | (starts >= ends)) & (reason == ''), "invalid time slot")
+
+    attendance = pd.to_numeric(chunk['expected_attendance'], errors='coerce')
+    bad_attendance = attendance.isna() | (attendance <= 0) | (attendance != attendance.round())
+    reason = reason.mask(bad_attendance & (reason == ''), "invalid expected attendance")
+    chunk['expected_attendance'] = attendance.where(~bad_attendance).astype('Int64')
+
+    for field in ('contact_email', 'purpose'):
+        chunk[field] = chunk[field].fillna('')
+    chunk['reason'] = reason
+    return chunk
+
+
+def resolve_batch_conflicts(batch):
+    """Flag rows of a valid batch that overlap an earlier row of the same batch.
+
+    Rows are taken in input order, so the first request for a slot wins.
+    Only rows that overlap some other batch row (found with one sorted,
+    vectorized pass) go through the exact first-come check.
+    """
+    conflict = pd.Series(False, index=batch.index)
+    if len(batch) < 2:
+        return conflict
+
+    keys = ['venue', 'date']
+    ordered = batch.sort_values(keys + ['start_min'], kind='stable')
+    groups = [ordered['venue'], ordered['date']]
+    prev_max_end = ordered.groupby(keys, sort=False)['end_min'].cummax().groupby(groups, sort=False).shift()
+    next_start = ordered.groupby(keys, sort=False)['start_min'].shift(-1)
+    touching = (prev_max_end > ordered['start_min']) | (next_start < ordered['end_min'])
+    touching_rows = batch.loc[touching[touching].index].sort_index()
+
+    accepted = VenueIntervalIndex()
+    losers = []
+    for row, venue, date, start, end in zip(
+        touching_rows.index, touching_rows['venue'], touching_rows['date'],
+        touching_rows['start_min'], touching_rows['end_min']
+    ):
+        if accepted.is_free(venue, date, start, end):
+            accepted.add(venue, date, start, end, row, row)
+        else:
+            losers.append(row)
+    conflict.loc[losers] = True
+    return conflict
+
+
+def prepare_request_batch(requests, chunk_size=10000):
+    """Validate every chunk of an import and stack them into one result frame"""
+    chunks = [prepare_requests(chunk) for chunk in iter_request_chunks(requests, chunk_size)]
+    result = pd.concat(chunks, ignore_index=True) if chunks else prepare_requests(pd.DataFrame())
+    result['id'] = pd.Series(pd.NA, index=result.index, dtype='Int64')
+    result['outcome'] = 'invalid'
+    return result
+
+
+def find_import_conflicts(batch, existing_conflicts):
+    """Rows of a valid batch that overlap an existing booking or an earlier batch row"""
+    conflicts = pd.Series(existing_conflicts.to_numpy() > 0, index=batch.index)
+    conflicts |= resolve_batch_conflicts(batch[~conflicts]).reindex(batch.index, fill_value=False)
+    return conflicts
+
+
+def new_booking_rows(accepted, first_id):
+    """Turn accepted request rows into Pending booking rows with consecutive ids"""
+    new_rows = accepted[REQUEST_FIELDS + SLOT_COLUMNS].copy()
+    new_rows.insert(0, 'id', range(first_id, first_id + len(new_rows)))
+    new_rows['status'] = 'Pending'
+    new_rows['submitted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    new_rows['processed_at'] = None
+    new_rows['admin_comment'] = None
+    return new_rows[BOOKING_COLUMNS + SLOT_COLUMNS]
+
+
+def submission_log_entries(new_rows):
+    """'Submitted' log entries for freshly stored booking rows"""
+    return pd.DataFrame({
+        'time': new_rows['submitted_at'],
+        'club': new_rows['club'],
+        'venue': new_rows['venue'],
+        'status': 'Submitted',
+        'day': new_rows['day'],
+        'date': new_rows['date'],
+        'time_slot': new_rows['time_slot'],
+        'event': new_rows['event_name'],
+        'admin_comment': ''
+    })
+
+
+def finish_import(result, valid, new_rows, conflicts, error=None):
+    """Fill in ids and outcomes of an import and drop the helper columns"""
+    if error is not None:
+        result.loc[valid, 'outcome'] = 'failed'
+        result.loc[valid, 'reason'] = str(error)
+    elif new_rows is None:
+        # Nothing was written: every valid row conflicted
+        result.loc[valid, 'outcome'] = 'conflict'
+    else:
+        result.loc[conflicts[conflicts].index, 'outcome'] = 'conflict'
+        result.loc[new_rows.index, 'outcome'] = 'imported'
+        result.loc[new_rows.index, 'id'] = new_rows['id'].to_numpy()
+    result.loc[result['outcome'] == 'conflict', 'reason'] = "slot already taken"
+    return result.drop(columns=SLOT_COLUMNS)
+
+
+def classify_pending(bookings_df, series_index=None):
+    """Classify Pending rows by what they overlap, in one merge over the active bookings.
+
+    Adds 'approved_conflicts' and 'pending_conflicts' counts and a 'category'
+    of "conflict_free", "conflicts_approved" (overlaps at least one Approved
+    booking) or "conflicts_pending" (overlaps only other Pending requests).
+    Active series in series_index count like bookings of their status.
+    """
+    pending = bookings_df[bookings_df['status'] == 'Pending'].copy()
+    active = bookings_df.loc[
+        bookings_df['status'].isin(ACTIVE_STATUSES) & (bookings_df['start_min'] >= 0),
+        ['id', 'venue', 'date', 'start_min', 'end_min', 'status']
+    ]
+    pairs = pending[['id', 'venue', 'date', 'start_min', 'end_min']].merge(
+        active, on=['venue', 'date'], suffixes=('', '_other')
+    )
+    pairs = pairs[
+        (pairs['id'] != pairs['id_other']) &
+        (pairs['start_min'] < pairs['end_min_other']) &
+        (pairs['end_min'] > pairs['start_min_other'])
+    ]
+    counts = pd.crosstab(pairs['id'], pairs['status']).reindex(columns=list(ACTIVE_STATUSES), fill_value=0)
+    pending['approved_conflicts'] = pending['id'].map(counts['Approved']).fillna(0).astype(int)
+    pending['pending_conflicts'] = pending['id'].map(counts['Pending']).fillna(0).astype(int)
+    if series_index is not None:
+        series_counts = series_index.status_counts(pending)
+        pending['approved_conflicts'] += series_counts['Approved']
+        pending['pending_conflicts'] += series_counts['Pending']
+    pending['category'] = 'conflict_free'
+    pending.loc[pending['pending_conflicts'] > 0, 'category'] = 'conflicts_pending'
+    pending.loc[pending['approved_conflicts'] > 0, 'category'] = 'conflicts_approved'
+    return pending
+
+
+def normalise_decisions(decisions):
+    """Decisions as a DataFrame of id, status, admin_comment (last decision per id wins)"""
+    if not isinstance(decisions, pd.DataFrame):
+        decisions = pd.DataFrame(list(decisions), columns=['id', 'status', 'admin_comment'])
+    decisions = decisions.reindex(columns=['id', 'status', 'admin_comment'])
+    decisions['admin_comment'] = decisions['admin_comment'].fillna('')
+    return decisions.drop_duplicates('id', keep='last')
+
+
+def decision_log_entries(rows, decisions, processed_time):
+    """Status-change log entries for decided booking rows"""
+    return pd.DataFrame({
+        'time': processed_time,
+        'club': rows['club'].to_numpy(),
+        'venue': rows['venue'].to_numpy(),
+        'status': decisions['status'].to_numpy(),
+        'day': rows['day'].to_numpy(),
+        'date': rows['date'].to_numpy(),
+        'time_slot': rows['time_slot'].to_numpy(),
+        'event': rows['event_name'].to_numpy(),
+        'admin_comment': decisions['admin_comment'].to_numpy()
+    })
+
+
+def normalise_reassignments(assignments):
+    """Reassignments as a DataFrame of id, venue (last one per id wins)"""
+    if not isinstance(assignments, pd.DataFrame):
+        assignments = pd.DataFrame(list(assignments), columns=['id', 'venue'])
+    elif 'venue' not in assignments.columns:
+        assignments = assignments.rename(columns={'proposed_venue': 'venue'})
+    return assignments.reindex(columns=['id', 'venue']).dropna().drop_duplicates('id', keep='last')
+
+
+def reassignment_log_entries(rows, new_venues, processed_time):
+    """Log entries for pending requests moved to another venue"""
+    return pd.DataFrame({
+        'time': processed_time,
+        'club': rows['club'].to_numpy(),
+        'venue': new_venues,
+        'status': 'Reassigned',
+        'day': rows['day'].to_numpy(),
+        'date': rows['date'].to_numpy(),
+        'time_slot': rows['time_slot'].to_numpy(),
+        'event': rows['event_name'].to_numpy(),
+        'admin_comment': ['Moved from ' + str(venue) for venue in rows['venue']]
+    })
+
+
+FREE_SLOT_COLUMNS = ['venue', 'category', 'capacity', 'date', 'day', 'start_min', 'end_min', 'time_slot']
+
+
+def eligible_venues(venues, min_capacity=0, categories=None):
+    """Names of venues (name -> {"category", "capacity"}) that are big enough and in one of categories"""
+    names = [
+        name for name, details in venues.items()
+        if details.get('capacity', 0) >= min_capacity and (not categories or details.get('category') in categories)
+    ]
+    # Smallest venue first, so ties go to the tightest fit
+    return sorted(names, key=lambda name: (venues[name].get('capacity', 0), name))
+
+
+def find_free_slots(index, venues, duration, date_from, date_to, min_capacity=0, categories=None,
+                    limit=None, day_start=8 * 60, day_end=22 * 60, step=30, series_index=None):
+    """Free time in a VenueIntervalIndex, one merge of booked intervals per venue and date.
+
+    The occurrences of the active series in series_index are busy time too.
+
+    With limit=None every free gap of at least duration minutes is returned.
+    With a limit, the earliest limit slots of exactly duration minutes are
+    returned, each starting at the first step-minute boundary of its gap;
+    on equal start times smaller venues come first.
+    """
+    names = eligible_venues(venues, min_capacity, categories)
+    rows = []
+    for date in pd.date_range(date_from, date_to):
+        date_str, day = date.strftime('%Y-%m-%d'), date.day_name()
+        day_rows = []
+        for name in names:
+            details = venues[name]
+            if series_index:
+                gaps = free_gaps(sorted(index.intervals(name, date_str) + series_index.intervals(name, date_str)),
+                                 day_start, day_end)
+            else:
+                gaps = index.free_gaps(name, date_str, day_start, day_end)
+            for gap_start, gap_end in gaps:
+                if limit is None:
+                    if gap_end - gap_start >= duration:
+                        day_rows.append((name, details.get('category'), details.get('capacity'),
+                                         date_str, day, gap_start, gap_end))
+                    continue
+                start = -(-gap_start // step) * step
+                if start + duration <= gap_end:
+                    day_rows.append((name, details.get('category'), details.get('capacity'),
+                                     date_str, day, start, start + duration))
+                    # Later gaps of this venue start later still
+                    break
+        if limit is None:
+            rows.extend(day_rows)
+            continue
+        day_rows.sort(key=lambda row: row[5])
+        rows.extend(day_rows[:limit - len(rows)])
+        if len(rows) >= limit:
+            break
+
+    slots = pd.DataFrame(rows, columns=FREE_SLOT_COLUMNS[:-1])
+    slots['time_slot'] = [format_time_slot(start, end) for start, end in zip(slots['start_min'], slots['end_min'])]
+    return slots
+
+
+def with_series_occurrences(conflicts, series_df, date):
+    """Booking conflicts followed by the occurrences on date of the clashing series in series_df.
+
+    Series rows carry their series_id and have no booking id.
+    """
+    occurrences = expand_series(series_df, date, date)
+    if occurrences.empty:
+        return conflicts
+    if conflicts.empty:
+        combined = occurrences.reset_index(drop=True)
+        combined.insert(0, 'id', pd.NA)
+    else:
+        combined = pd.concat([conflicts, occurrences], ignore_index=True)
+    combined['id'] = combined['id'].astype('Int64')
+    combined['series_id'] = combined['series_id'].astype('Int64')
+    return combined
+
+
+def create_storage(backend=None, **kwargs):
+    """Create the configured storage backend.
+
+    The backend is taken from the argument or the VENUE_BOOKING_BACKEND
+    environment variable: "csv" (default), "journal" (CSV snapshot plus an
+    append-only journal of changes), "sqlite" or "remote". The SQLite
+    database path can be set with VENUE_BOOKING_DB and the service address
+    of the remote backend with VENUE_BOOKING_URL.
+    """
+    backend = (backend or os.environ.get('VENUE_BOOKING_BACKEND') or 'csv').lower()
+    if backend == 'csv':
+        return BookingStorage(**kwargs)
+    if backend == 'journal':
+        from journal_storage import JournalBookingStorage
+        return JournalBookingStorage(**kwargs)
+    if backend == 'sqlite':
+        from sqlite_storage import SQLiteBookingStorage
+        kwargs.setdefault('db_file', os.environ.get('VENUE_BOOKING_DB', 'bookings.db'))
+        return SQLiteBookingStorage(**kwargs)
+    if backend == 'remote':
+        from service import RemoteStorage
+        return RemoteStorage(**kwargs)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on path (created if missing)"""
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@instrumented
 class BookingStorage:
     """A class to handle reading from and writing to the booking data store"""
     
-    def __init__(self):
+    def __init__(self, log_batch_size=1, log_fsync=True, write_mode='optimistic', max_commit_retries=8):
         self.bookings_file = "bookings.csv"
+        # Legacy single-file log; new entries go to monthly partitions next to it
         self.logs_file = "booking_log.csv"
+        # Recurring series, one row each; their dates are expanded on demand
+        self.series_file = "series.csv"
+        self.log_batch_size = max(1, int(log_batch_size))
+        self.log_fsync = log_fsync
+        self._log_buffer = []
+
+        # Writers serialise on the lock file; the version file counts commits for compare-and-swap
+        if write_mode not in ('optimistic', 'lock'):
+            raise ValueError(f"Unknown write mode: {write_mode}")
+        self.write_mode = write_mode
+        self.max_commit_retries = max_commit_retries
+        self.lock_file = self.bookings_file + ".lock"
+        self.version_file = self.bookings_file + ".version"
+        self.log_lock_file = self.logs_file + ".lock"
         
         # Initialize bookings file if it doesn't exist
         if not os.path.exists(self.bookings_file):
-            # Create a DataFrame with the required columns
-            columns = [
-                'id', 'club', 'event_name', 'contact_email', 'day', 'date', 
-                'time_slot', 'venue', 'expected_attendance', 'purpose',
-                'status', 'submitted_at', 'processed_at', 'admin_comment'
-            ]
-            pd.DataFrame(columns=columns).to_csv(self.bookings_file, index=False)
+            with file_lock(self.lock_file):
+                if not os.path.exists(self.bookings_file):
+                    # Create a DataFrame with the required columns
+                    self._replace_file(
+                        self.bookings_file,
+                        lambda f: pd.DataFrame(columns=BOOKING_COLUMNS).to_csv(f, index=False)
+                    )
         
-        # Initialize logs file if it doesn't exist
-        if not os.path.exists(self.logs_file):
-            columns = [
-                'time', 'club', 'venue', 'status', 'day', 'date', 
-                'time_slot', 'event', 'admin_comment'
-            ]
-            pd.DataFrame(columns=columns).to_csv(self.logs_file, index=False)
+        # Resident copies of the tables, keyed by the file signature they were read at
+        self._bookings_cache = None
+        self._bookings_signature = None
+        self._bookings_version = None
+        self._log_partition_cache = {}
+        # (venue, date) -> sorted intervals, rebuilt whenever the resident table is re-read
+        self._interval_index = None
+        self._series_cache = None
+        self._series_index = None
+        # Callbacks told about every committed change, see subscribe()
+        self._listeners = []
+        self.cache_stats = {
+            'bookings': {'hits': 0, 'misses': 0},
+            'logs': {'hits': 0, 'misses': 0}
+        }
 
-    def load_bookings(self):
-        """Load all bookings from the CSV file"""
+    def _file_signature(self, path):
+        """Return (mtime, size, inode) for a file, or None if it cannot be read"""
         try:
-            return pd.read_csv(self.bookings_file)
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _cached_bookings(self):
+        """Return the resident bookings table, re-reading the CSV only if it changed on disk"""
+        signature = self._file_signature(self.bookings_file)
+        if self._bookings_cache is not None and signature == self._bookings_signature:
+            self.cache_stats['bookings']['hits'] += 1
+            return self._bookings_cache
+
+        self.cache_stats['bookings']['misses'] += 1
+        self._interval_index = None
+        # Read the version first: a writer replaces the data before bumping it
+        version = self._read_version()
+        try:
+            df = pd.read_csv(self.bookings_file)
+            record_rows_read(len(df))
         except Exception as e:
+            # Never replace an unreadable table with an empty one: writers must fail, not erase it
             print(f"Error reading bookings file: {e}")
-            # Create a new DataFrame with the required columns
-            columns = [
-                'id', 'club', 'event_name', 'contact_email', 'day', 'date', 
-                'time_slot', 'venue', 'expected_attendance', 'purpose',
-                'status', 'submitted_at', 'processed_at', 'admin_comment'
-            ]
-            df = pd.DataFrame(columns=columns)
-            df.to_csv(self.bookings_file, index=False)
-            return df
+            record_error(e)
+            raise
+
+        self._add_slot_columns(df)
+        self._bookings_cache = df
+        self._bookings_signature = signature
+        self._bookings_version = version
+        return df
+
+    def _read_version(self):
+        """Return the commit counter of the bookings file"""
+        try:
+            with open(self.version_file) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def _replace_file(self, path, write):
+        """Write a file through a temporary sibling and rename it into place"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _commit_bookings(self, change):
+        """Apply a change to the bookings table and write it without losing concurrent updates.
+
+        change(bookings_df) receives the resident table (it must not modify it)
+        and returns None to abort, or (new_df, result, on_commit). In
+        "optimistic" mode the change is computed outside the lock and written
+        only if no other writer committed in between; otherwise it is recomputed
+        on the fresh table after a short random backoff. After
+        max_commit_retries lost races, and always in "lock" mode, the whole
+        read-modify-write runs under the lock. on_commit, if not None, runs
+        after the write succeeds.
+        """
+        attempts = self.max_commit_retries if self.write_mode == 'optimistic' else 0
+        for attempt in range(attempts):
+            bookings_df = self._cached_bookings()
+            base_version = self._bookings_version
+            outcome = change(bookings_df)
+            if outcome is None:
+                return None
+            new_df, result, on_commit = outcome
+            with file_lock(self.lock_file):
+                committed = self._read_version() == base_version
+                if committed:
+                    self._write_bookings(new_df)
+            if committed:
+                if on_commit is not None:
+                    on_commit()
+                return result
+            # Lost the race: drop our copy and redo the change on the winner's table
+            self._bookings_cache = None
+            time.sleep(random.uniform(0, min(0.002 * 2 ** attempt, 0.05)))
+
+        with file_lock(self.lock_file):
+            if self._read_version() != self._bookings_version:
+                self._bookings_cache = None
+            outcome = change(self._cached_bookings())
+            if outcome is None:
+                return None
+            new_df, result, on_commit = outcome
+            self._write_bookings(new_df)
+        if on_commit is not None:
+            on_commit()
+        return result
+
+    def _log_partition_file(self, month):
+        """Return the path of the log partition for a month ("YYYY-MM")"""
+        base, ext = os.path.splitext(self.logs_file)
+        return f"{base}-{month}{ext}"
+
+    def _log_partitions(self, since=None, until=None):
+        """List the log files that can hold entries between since and until"""
+        base, ext = os.path.splitext(self.logs_file)
+        files = []
+        # Entries written before partitioning are only in the legacy file
+        if os.path.exists(self.logs_file):
+            files.append(self.logs_file)
+        for path in sorted(glob.glob(f"{base}-[0-9][0-9][0-9][0-9]-[0-9][0-9]{ext}")):
+            month = path[len(base) + 1:len(path) - len(ext)]
+            if since is not None and month < since[:7]:
+                continue
+            if until is not None and month > until[:7]:
+                continue
+            files.append(path)
+        return files
+
+    def _cached_log_partition(self, path):
+        """Return one log file as a DataFrame, re-reading it only if it changed on disk"""
+        signature = self._file_signature(path)
+        cached = self._log_partition_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            self.cache_stats['logs']['hits'] += 1
+            return cached[1]
+
+        self.cache_stats['logs']['misses'] += 1
+        try:
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+            record_rows_read(len(df))
+        except Exception as e:
+            print(f"Error reading logs file {path}: {e}")
+            record_error(e)
+            df = pd.DataFrame(columns=LOG_COLUMNS)
+
+        self._log_partition_cache[path] = (signature, df)
+        return df
+
+    def _cached_series(self):
+        """Return the series table, re-reading the CSV only if it changed on disk"""
+        signature = self._file_signature(self.series_file)
+        if self._series_cache is not None and self._series_cache[0] == signature:
+            return self._series_cache[1]
+
+        self._series_index = None
+        df = pd.DataFrame(columns=SERIES_COLUMNS)
+        if signature is not None:
+            try:
+                df = pd.read_csv(self.series_file, dtype={'exceptions': str})
+                record_rows_read(len(df))
+            except Exception as e:
+                print(f"Error reading series file: {e}")
+                record_error(e)
+        df['exceptions'] = df['exceptions'].fillna('')
+        self._add_slot_columns(df)
+        self._series_cache = (signature, df)
+        return df
+
+    def _get_series_index(self):
+        """Return the weekday index of the active series"""
+        series_df = self._cached_series()
+        if self._series_index is None:
+            self._series_index = SeriesIndex.from_series(series_df)
+        return self._series_index
+
+    def _write_series(self, series_df):
+        """Atomically replace the series file; the caller must hold the bookings lock"""
+        self._replace_file(self.series_file,
+                           lambda f: series_df.to_csv(f, index=False, columns=SERIES_COLUMNS))
+        record_rows_written(len(series_df))
+        self._series_cache = (self._file_signature(self.series_file), series_df)
+        self._series_index = None
+        # Count the commit, so optimistic booking writers recheck their slot against the series
+        current = self._bookings_version == self._read_version()
+        version = self._bump_version()
+        if current:
+            self._bookings_version = version
+
+    def _bump_version(self):
+        """Count a commit that did not rewrite the bookings; the caller must hold the bookings lock"""
+        version = self._read_version() + 1
+        self._replace_file(self.version_file, lambda f: f.write(str(version)))
+        return version
+
+    def _add_slot_columns(self, bookings_df):
+        """Fill the integer start_min/end_min columns from time_slot (-1 if unparsable)"""
+        starts, ends = parse_time_slots(bookings_df['time_slot'])
+        bookings_df['start_min'] = starts
+        bookings_df['end_min'] = ends
+
+    def invalidate_cache(self):
+        """Drop the resident tables so the next read goes back to disk"""
+        self._bookings_cache = None
+        self._bookings_signature = None
+        self._log_partition_cache = {}
+        self._interval_index = None
+        self._series_cache = None
+        self._series_index = None
+
+    def _get_interval_index(self):
+        """Return the (venue, date) interval index for the current resident table"""
+        bookings_df = self._cached_bookings()
+        if self._interval_index is None:
+            self._interval_index = VenueIntervalIndex.from_bookings(bookings_df)
+        return self._interval_index
+
+    def subscribe(self, listener):
+        """Call listener(event, old_rows, new_rows) after every committed change.
+
+        event is "created", "status_changed" or "moved" for bookings and
+        "series_created" or "series_status_changed" for series. old_rows and
+        new_rows are DataFrames of the affected rows before and after the
+        change (old_rows is None for created rows). Only changes made through
+        this storage object are reported; get_version() tells whether the
+        store changed in some other way.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event, old_rows, new_rows):
+        """Report a committed change to the listeners; a failing listener never undoes the write"""
+        for listener in list(self._listeners):
+            try:
+                listener(event, old_rows, new_rows)
+            except Exception as e:
+                print(f"Error in storage listener: {e}")
+                record_error(e)
+
+    def get_version(self):
+        """Commit counter of the store; it changes whenever bookings or series do"""
+        return self._read_version()
+
+    def get_cache_stats(self):
+        """Return hit/miss counters for the resident tables"""
+        return {table: dict(counts) for table, counts in self.cache_stats.items()}
+
+    def load_bookings(self):
+        """Load all bookings (a private copy of the resident table)"""
+        try:
+            return self._cached_bookings().copy()
+        except Exception:
+            return pd.DataFrame(columns=BOOKING_COLUMNS)
 
     def save_bookings(self, bookings_df):
-        """Save bookings back to the CSV file"""
+        """Save bookings back to the CSV file (overwrites concurrent changes)"""
         try:
-            bookings_df.to_csv(self.bookings_file, index=False)
+            with file_lock(self.lock_file):
+                self._write_bookings(bookings_df)
+            # An arbitrary table may reorder rows, so the index is rebuilt on next use
+            self._interval_index = None
             return True
         except Exception as e:
             print(f"Error saving bookings: {e}")
+            record_error(e)
             return False
 
-    def load_logs(self):
-        """Load all logs from the CSV file"""
+    def _write_bookings(self, bookings_df):
+        """Atomically replace the bookings file and make bookings_df the resident copy.
+
+        The caller must hold the bookings lock.
+        """
         try:
-            return pd.read_csv(self.logs_file)
-        except Exception as e:
-            print(f"Error reading logs file: {e}")
-            # Create a new DataFrame with the required columns
-            columns = [
-                'time', 'club', 'venue', 'status', 'day', 'date', 
-                'time_slot', 'event', 'admin_comment'
-            ]
-            df = pd.DataFrame(columns=columns)
-            df.to_csv(self.logs_file, index=False)
-            return df
+            if not set(SLOT_COLUMNS).issubset(bookings_df.columns):
+                self._add_slot_columns(bookings_df)
+            columns = [c for c in bookings_df.columns if c not in SLOT_COLUMNS]
+            self._replace_file(self.bookings_file, lambda f: bookings_df.to_csv(f, index=False, columns=columns))
+            record_rows_written(len(bookings_df))
+            record_bytes_written(os.path.getsize(self.bookings_file))
+            version = self._read_version() + 1
+            self._replace_file(self.version_file, lambda f: f.write(str(version)))
+        except Exception:
+            self._bookings_cache = None
+            self._interval_index = None
+            raise
+
+        # Our own write becomes the resident copy, no need to re-read it
+        self._bookings_cache = bookings_df
+        self._bookings_signature = self._file_signature(self.bookings_file)
+        self._bookings_version = version
+
+    def load_logs(self, since=None, until=None, club=None, venue=None):
+        """Load log entries, opening only the monthly partitions that overlap the range.
+
+        since/until are "YYYY-MM-DD[ HH:MM:SS]" strings or datetimes; since is
+        inclusive and until is exclusive.
+        """
+        self.flush_logs()
+        if isinstance(since, datetime):
+            since = since.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(until, datetime):
+            until = until.strftime('%Y-%m-%d %H:%M:%S')
+
+        frames = [self._cached_log_partition(path) for path in self._log_partitions(since, until)]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=LOG_COLUMNS)
+        logs_df = pd.concat(frames, ignore_index=True)
+
+        mask = pd.Series(True, index=logs_df.index)
+        if since is not None:
+            mask &= logs_df['time'] >= since
+        if until is not None:
+            mask &= logs_df['time'] < until
+        if club is not None:
+            mask &= logs_df['club'] == club
+        if venue is not None:
+            mask &= logs_df['venue'] == venue
+        return logs_df[mask].reset_index(drop=True)
+
+    def iter_log_pages(self, page_size=50, since=None, until=None, club=None, venue=None):
+        """Yield the filtered log in pages of page_size rows, reading the files in chunks.
+
+        Unlike load_logs this never holds more than one chunk in memory, so the
+        first page is ready as soon as the first chunk has been read.
+        """
+        self.flush_logs()
+        if isinstance(since, datetime):
+            since = since.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(until, datetime):
+            until = until.strftime('%Y-%m-%d %H:%M:%S')
+
+        pending = []
+        pending_rows = 0
+        for path in self._log_partitions(since, until):
+            try:
+                reader = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=max(page_size, 10000))
+                for chunk in reader:
+                    record_rows_read(len(chunk))
+                    mask = pd.Series(True, index=chunk.index)
+                    if since is not None:
+                        mask &= chunk['time'] >= since
+                    if until is not None:
+                        mask &= chunk['time'] < until
+                    if club is not None:
+                        mask &= chunk['club'] == club
+                    if venue is not None:
+                        mask &= chunk['venue'] == venue
+                    chunk = chunk[mask]
+                    if chunk.empty:
+                        continue
+                    pending.append(chunk)
+                    pending_rows += len(chunk)
+                    while pending_rows >= page_size:
+                        buffered = pd.concat(pending, ignore_index=True)
+                        yield buffered.iloc[:page_size]
+                        pending = [buffered.iloc[page_size:]]
+                        pending_rows = len(pending[0])
+            except pd.errors.EmptyDataError:
+                continue
+        if pending_rows:
+            yield pd.concat(pending, ignore_index=True)
+
+    def _format_log_line(self, log_entry):
+        """Render one log entry as a CSV line in LOG_COLUMNS order"""
+        row = []
+        for column in LOG_COLUMNS:
+            value = log_entry.get(column, '')
+            if value is None or (isinstance(value, float) and value != value):
+                value = ''
+            row.append(value)
+        out = io.StringIO()
+        csv.writer(out, lineterminator='\n').writerow(row)
+        return out.getvalue()
 
     def add_log(self, log_entry):
-        """Add a new log entry to the CSV file"""
+        """Append a log entry to its monthly partition.
+
+        With log_batch_size > 1 entries are buffered and written together,
+        one fsync per batch; call flush_logs() to force them out.
+        """
         try:
-            logs_df = self.load_logs()
-            logs_df = pd.concat([logs_df, pd.DataFrame([log_entry])], ignore_index=True)
-            logs_df.to_csv(self.logs_file, index=False)
+            month = str(log_entry.get('time') or datetime.now().strftime('%Y-%m'))[:7]
+            self._log_buffer.append((month, self._format_log_line(log_entry)))
+            if len(self._log_buffer) == 1 and self.log_batch_size > 1:
+                atexit.register(self.flush_logs)
+            if len(self._log_buffer) >= self.log_batch_size:
+                return self.flush_logs()
             return True
         except Exception as e:
             print(f"Error adding log entry: {e}")
+            record_error(e)
             return False
 
-    def save_request(self, request):
-        """Save a new booking request"""
+    def add_logs(self, log_entries):
+        """Append many log entries (a DataFrame or list of dicts) in one write"""
         try:
-            bookings_df = self.load_bookings()
-            
-            # Generate a new ID
-            if len(bookings_df) > 0:
-                try:
-                    new_id = int(bookings_df['id'].max()) + 1
-                except:
-                    new_id = len(bookings_df) + 1
-            else:
-                new_id = 1
+            logs_df = pd.DataFrame(log_entries).reindex(columns=LOG_COLUMNS)
+            if logs_df.empty:
+                return True
+            months = logs_df['time'].astype(str).str[:7]
+            for month, group in logs_df.groupby(months, sort=False):
+                self._log_buffer.append((month, group.to_csv(index=False, header=False, lineterminator='\n')))
+            return self.flush_logs()
+        except Exception as e:
+            print(f"Error adding log entries: {e}")
+            record_error(e)
+            return False
+
+    def flush_logs(self):
+        """Write any buffered log entries to disk"""
+        if not self._log_buffer:
+            return True
+        try:
+            by_month = {}
+            for month, line in self._log_buffer:
+                by_month.setdefault(month, []).append(line)
+
+            # Short lock so concurrent writers neither interleave lines nor both write a header
+            with file_lock(self.log_lock_file):
+                for month, lines in by_month.items():
+                    path = self._log_partition_file(month)
+                    with open(path, 'a', newline='', encoding='utf-8') as f:
+                        if f.tell() == 0:
+                            f.write(','.join(LOG_COLUMNS) + '\n')
+                        data = ''.join(lines)
+                        f.write(data)
+                        f.flush()
+                        if self.log_fsync:
+                            os.fsync(f.fileno())
+                    record_rows_written(data.count('\n'))
+                    record_bytes_written(len(data))
+
+            self._log_buffer = []
+            atexit.unregister(self.flush_logs)
+            return True
+        except Exception as e:
+            print(f"Error writing log entries: {e}")
+            record_error(e)
+            return False
+
+    def save_request(self, request, check_available=False):
+        """Save a new booking request.
+
+        With check_available=True the request is refused (None is returned)
+        if its slot is no longer free.
+        """
+        try:
+            start, end = parse_time_slot(request['time_slot'])
+
+            def change(bookings_df):
+                index = self._get_interval_index()
+                if check_available and not (index.is_free(request['venue'], request['date'], start, end) and
+                                            self._get_series_index().is_free(request['venue'], request['date'],
+                                                                             start, end)):
+                    print(f"{request['venue']} is no longer available on {request['date']} at {request['time_slot']}.")
+                    return None
                 
-            # Add metadata
-            request['id'] = new_id
-            request['status'] = 'Pending'
-            request['submitted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            request['processed_at'] = None
-            request['admin_comment'] = None
-            
-            # Add to dataframe and save
-            bookings_df = pd.concat([bookings_df, pd.DataFrame([request])], ignore_index=True)
-            self.save_bookings(bookings_df)
+                # Generate a new ID
+                if len(bookings_df) > 0:
+                    try:
+                        new_id = int(bookings_df['id'].max()) + 1
+                    except:
+                        new_id = len(bookings_df) + 1
+                else:
+                    new_id = 1
+                    
+                # Add metadata
+                request['id'] = new_id
+                request['status'] = 'Pending'
+                request['submitted_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                request['processed_at'] = None
+                request['admin_comment'] = None
+                
+                # Add to dataframe
+                row = len(bookings_df)
+                new_row = pd.DataFrame([dict(request, start_min=start, end_min=end)])
+                new_df = pd.concat([bookings_df, new_row], ignore_index=True)
+                on_commit = lambda: index.add(request['venue'], request['date'], start, end, new_id, row)
+                return new_df, (new_id, new_row), on_commit
+
+            outcome = self._commit_bookings(change)
+            if outcome is None:
+                return None
+            new_id, new_row = outcome
+            self._notify('created', None, new_row)
             
             # Add log entry
             log_entry = {
@@ -128,31 +998,97 @@ class BookingStorage:
             
         except Exception as e:
             print(f"Error saving request: {e}")
+            record_error(e)
             return None
 
+    def save_requests(self, requests, allow_conflicts=False, chunk_size=10000):
+        """Import many booking requests in one commit.
+
+        requests may be a DataFrame, an iterable of DataFrame chunks or an
+        iterable of dicts. Every row is validated; unless allow_conflicts is
+        set, rows overlapping an existing Pending/Approved booking or an
+        earlier row of the same batch are not imported. Returns a DataFrame
+        of the input rows with 'id', 'outcome' (imported / invalid /
+        conflict / failed) and 'reason'.
+        """
+        result = prepare_request_batch(requests, chunk_size)
+        valid = result['reason'] == ''
+
+        def change(bookings_df):
+            batch = result[valid]
+            conflicts = pd.Series(False, index=batch.index)
+            if not allow_conflicts:
+                active = bookings_df.loc[
+                    bookings_df['status'].isin(ACTIVE_STATUSES) & (bookings_df['start_min'] >= 0),
+                    ['venue', 'date', 'start_min', 'end_min']
+                ]
+                existing = count_slot_conflicts(batch, active)['conflicts'] + self._get_series_index().busy_mask(batch)
+                conflicts = find_import_conflicts(batch, existing)
+            if conflicts.all():
+                return None
+
+            # One block of ids after the current maximum
+            first_id = int(bookings_df['id'].max()) + 1 if len(bookings_df) > 0 else 1
+            new_rows = new_booking_rows(batch[~conflicts], first_id)
+            new_df = pd.concat([bookings_df, new_rows], ignore_index=True)
+            return new_df, (new_rows, conflicts), lambda: setattr(self, '_interval_index', None)
+
+        try:
+            outcome = self._commit_bookings(change) if valid.any() else None
+        except Exception as e:
+            print(f"Error saving requests: {e}")
+            record_error(e)
+            return finish_import(result, valid, None, None, error=e)
+
+        if outcome is not None:
+            self.add_logs(submission_log_entries(outcome[0]))
+            self._notify('created', None, outcome[0])
+        return finish_import(result, valid, *(outcome or (None, None)))
+
     def update_request_status(self, request_id, status, admin_comment=''):
         """Update the status of a request"""
         try:
-            bookings_df = self.load_bookings()
-            
-            # Find the request
-            request_idx = bookings_df.index[bookings_df['id'] == request_id].tolist()
-            if not request_idx:
-                print(f"Request ID {request_id} not found.")
-                return False
+            def change(bookings_df):
+                index = self._get_interval_index()
                 
-            # Update the request
-            processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            bookings_df.loc[request_idx[0], 'status'] = status
-            bookings_df.loc[request_idx[0], 'processed_at'] = processed_time
-            bookings_df['admin_comment'] = bookings_df['admin_comment'].astype(object)
-            bookings_df.loc[request_idx[0], 'admin_comment'] = admin_comment
-            
-            # Save changes
-            self.save_bookings(bookings_df)
+                # Find the request
+                request_idx = bookings_df.index[bookings_df['id'] == request_id].tolist()
+                if not request_idx:
+                    print(f"Request ID {request_id} not found.")
+                    return None
+                    
+                # Update the request
+                old_row = bookings_df.loc[request_idx[:1]]
+                bookings_df = bookings_df.copy()
+                processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                old_status = bookings_df.loc[request_idx[0], 'status']
+                bookings_df.loc[request_idx[0], 'status'] = status
+                bookings_df['processed_at'] = bookings_df['processed_at'].astype(object)
+                bookings_df.loc[request_idx[0], 'processed_at'] = processed_time
+                bookings_df['admin_comment'] = bookings_df['admin_comment'].astype(object)
+                bookings_df.loc[request_idx[0], 'admin_comment'] = admin_comment
+                request_row = bookings_df.loc[request_idx[0]]
+
+                def on_commit():
+                    # Keep the interval index in step with the slot being held or released
+                    was_active = old_status in ACTIVE_STATUSES
+                    is_active = status in ACTIVE_STATUSES
+                    if was_active and not is_active:
+                        index.remove(request_row['venue'], request_row['date'], request_id)
+                    elif is_active and not was_active and request_row['start_min'] >= 0:
+                        row = bookings_df.index.get_loc(request_idx[0])
+                        index.add(request_row['venue'], request_row['date'],
+                                  int(request_row['start_min']), int(request_row['end_min']), request_id, row)
+
+                return bookings_df, (request_row, processed_time, old_row), on_commit
+
+            outcome = self._commit_bookings(change)
+            if outcome is None:
+                return False
+            request_row, processed_time, old_row = outcome
+            self._notify('status_changed', old_row, request_row.to_frame().T)
             
             # Add log entry
-            request_row = bookings_df.loc[request_idx[0]]
             log_entry = {
                 'time': processed_time,
                 'club': request_row['club'],
@@ -170,15 +1106,149 @@ class BookingStorage:
             
         except Exception as e:
             print(f"Error updating request status: {e}")
+            record_error(e)
             return False
 
+    def classify_pending_requests(self):
+        """Pending requests with their conflict category (see classify_pending)"""
+        try:
+            return classify_pending(self._cached_bookings(), self._get_series_index())
+        except Exception as e:
+            print(f"Error classifying pending requests: {e}")
+            record_error(e)
+            return pd.DataFrame()
+
+    def apply_decisions(self, decisions):
+        """Apply many (request_id, status, admin_comment) decisions in one commit.
+
+        decisions may be a list of tuples or a DataFrame with id, status and
+        admin_comment columns. All log entries are written in one append.
+        Returns the number of requests updated.
+        """
+        try:
+            decisions = normalise_decisions(decisions)
+            if decisions.empty:
+                return 0
+
+            def change(bookings_df):
+                positions = pd.Index(bookings_df['id']).get_indexer(decisions['id'])
+                found = decisions[positions >= 0]
+                positions = positions[positions >= 0]
+                if len(found) < len(decisions):
+                    print(f"{len(decisions) - len(found)} request IDs not found.")
+                if len(found) == 0:
+                    return None
+
+                rows = bookings_df.index[positions]
+                old_rows = bookings_df.loc[rows]
+                bookings_df = bookings_df.copy()
+                processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                for column in ('status', 'processed_at', 'admin_comment'):
+                    bookings_df[column] = bookings_df[column].astype(object)
+                bookings_df.loc[rows, 'status'] = found['status'].to_numpy()
+                bookings_df.loc[rows, 'processed_at'] = processed_time
+                bookings_df.loc[rows, 'admin_comment'] = found['admin_comment'].to_numpy()
+                log_entries = decision_log_entries(bookings_df.loc[rows], found, processed_time)
+                return (bookings_df, (log_entries, old_rows, bookings_df.loc[rows]),
+                        lambda: setattr(self, '_interval_index', None))
+
+            outcome = self._commit_bookings(change)
+            if outcome is None:
+                return 0
+            log_entries, old_rows, new_rows = outcome
+            self.add_logs(log_entries)
+            self._notify('status_changed', old_rows, new_rows)
+            return len(log_entries)
+
+        except Exception as e:
+            print(f"Error applying decisions: {e}")
+            record_error(e)
+            return 0
+
+    def reassign_venues(self, assignments):
+        """Move many pending requests to other venues in one commit.
+
+        assignments may be a list of (request_id, venue) tuples or a DataFrame
+        with id and venue (or proposed_venue) columns, such as the moves of an
+        allocation proposal. Requests that are no longer pending are skipped.
+        Returns the number of requests moved.
+        """
+        try:
+            assignments = normalise_reassignments(assignments)
+            if assignments.empty:
+                return 0
+
+            def change(bookings_df):
+                positions = pd.Index(bookings_df['id']).get_indexer(assignments['id'])
+                keep = positions >= 0
+                keep[keep] = (bookings_df['status'].to_numpy()[positions[keep]] == 'Pending')
+                found = assignments[keep]
+                positions = positions[keep]
+                if len(found) < len(assignments):
+                    print(f"{len(assignments) - len(found)} request IDs not found or no longer pending.")
+                if len(found) == 0:
+                    return None
+
+                rows = bookings_df.index[positions]
+                old_rows = bookings_df.loc[rows]
+                bookings_df = bookings_df.copy()
+                processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                log_entries = reassignment_log_entries(old_rows, found['venue'].to_numpy(), processed_time)
+                bookings_df['venue'] = bookings_df['venue'].astype(object)
+                bookings_df.loc[rows, 'venue'] = found['venue'].to_numpy()
+                return (bookings_df, (log_entries, old_rows, bookings_df.loc[rows]),
+                        lambda: setattr(self, '_interval_index', None))
+
+            outcome = self._commit_bookings(change)
+            if outcome is None:
+                return 0
+            log_entries, old_rows, new_rows = outcome
+            self.add_logs(log_entries)
+            self._notify('moved', old_rows, new_rows)
+            return len(log_entries)
+
+        except Exception as e:
+            print(f"Error reassigning venues: {e}")
+            record_error(e)
+            return 0
+
+    def query_bookings(self, status=None, club=None, venue=None, date_from=None, date_to=None,
+                       page=1, page_size=20):
+        """Return (page_df, total) for the bookings matching the filters.
+
+        date_from/date_to are inclusive "YYYY-MM-DD" strings; pages start at 1.
+        Only the rows of the requested page are copied out of the table.
+        """
+        try:
+            bookings_df = self._cached_bookings()
+            mask = pd.Series(True, index=bookings_df.index)
+            if status is not None:
+                mask &= bookings_df['status'] == status
+            if club is not None:
+                mask &= bookings_df['club'] == club
+            if venue is not None:
+                mask &= bookings_df['venue'] == venue
+            if date_from is not None:
+                mask &= bookings_df['date'] >= date_from
+            if date_to is not None:
+                mask &= bookings_df['date'] <= date_to
+
+            matches = mask.to_numpy().nonzero()[0]
+            start = (max(page, 1) - 1) * page_size
+            return bookings_df.iloc[matches[start:start + page_size]].copy(), len(matches)
+        except Exception as e:
+            print(f"Error querying bookings: {e}")
+            record_error(e)
+            return pd.DataFrame(), 0
+
     def get_pending_requests(self):
         """Get all pending requests"""
         try:
-            bookings_df = self.load_bookings()
+            bookings_df = self._cached_bookings()
             return bookings_df[bookings_df['status'] == 'Pending']
         except Exception as e:
             print(f"Error getting pending requests: {e}")
+            record_error(e)
             return pd.DataFrame()
 
     def get_all_bookings(self):
@@ -188,90 +1258,247 @@ class BookingStorage:
     def get_club_bookings(self, club_name):
         """Get all bookings for a specific club"""
         try:
-            bookings_df = self.load_bookings()
+            bookings_df = self._cached_bookings()
             return bookings_df[bookings_df['club'] == club_name]
         except Exception as e:
             print(f"Error getting club bookings: {e}")
+            record_error(e)
             return pd.DataFrame()
 
     def check_venue_availability(self, venue_name, date, time_slot):
         """Check if a venue is available for a given date and time slot"""
         try:
-            bookings_df = self.load_bookings()
-            
-            # Filter relevant bookings
-            venue_bookings = bookings_df[
-                (bookings_df['venue'] == venue_name) & 
-                (bookings_df['date'] == date) & 
-                (bookings_df['status'].isin(['Pending', 'Approved']))
-            ]
-            
-            if venue_bookings.empty:
-                return True
-                
-            # Parse time slot
-            start_new, end_new = [datetime.strptime(t, "%H:%M").time() for t in time_slot.split("-")]
-            
-            # Check for conflicts
-            for _, booking in venue_bookings.iterrows():
-                booked_slot = booking['time_slot']
-                start_booked, end_booked = [datetime.strptime(t, "%H:%M").time() 
-                                         for t in booked_slot.split("-")]
-                
-                # Check for overlap
-                if start_new < end_booked and end_new > start_booked:
-                    return False
-                    
-            return True
+            start_new, end_new = parse_time_slot(time_slot)
+            return (self._get_interval_index().is_free(venue_name, date, start_new, end_new) and
+                    self._get_series_index().is_free(venue_name, date, start_new, end_new))
             
         except Exception as e:
             print(f"Error checking venue availability: {e}")
+            record_error(e)
             return False
 
+    def get_available_venues(self, venue_names, date, time_slot):
+        """Return the venues in venue_names that are free for a date and time slot"""
+        return self.get_available_venues_for_slots(venue_names, [(date, time_slot)])[(date, time_slot)]
+
+    def get_available_venues_for_slots(self, venue_names, slots):
+        """For each (date, time_slot) pair, return the venues in venue_names that are free.
+
+        Each pair costs one pass over the venues booked on that date, however
+        many venues are asked about.
+        """
+        index = self._get_interval_index()
+        series_index = self._get_series_index()
+        available = {}
+        for date, time_slot in slots:
+            try:
+                start_new, end_new = parse_time_slot(time_slot)
+                busy = index.busy_venues(date, start_new, end_new) | series_index.busy_venues(date, start_new, end_new)
+                available[(date, time_slot)] = [v for v in venue_names if v not in busy]
+            except Exception as e:
+                print(f"Error checking venue availability: {e}")
+                record_error(e)
+                available[(date, time_slot)] = []
+        return available
+
     def get_conflicting_bookings(self, venue_name, date, time_slot, exclude_id=None):
         """Get all conflicting bookings for a given venue, date and time slot"""
         try:
-            bookings_df = self.load_bookings()
-            
-            # Filter relevant bookings
-            venue_bookings = bookings_df[
-                (bookings_df['venue'] == venue_name) & 
-                (bookings_df['date'] == date) & 
-                (bookings_df['status'].isin(['Pending', 'Approved']))
-            ]
-            
-            if exclude_id is not None:
-                venue_bookings = venue_bookings[venue_bookings['id'] != exclude_id]
+            start_new, end_new = parse_time_slot(time_slot)
+            bookings_df = self._cached_bookings()
+            rows = self._get_interval_index().candidate_rows(venue_name, date, start_new, end_new)
             
-            if venue_bookings.empty:
-                return pd.DataFrame()
-                
-            # Parse time slot
-            start_new, end_new = [datetime.strptime(t, "%H:%M").time() for t in time_slot.split("-")]
-            
-            # Find conflicts
-            conflicts = []
-            for _, booking in venue_bookings.iterrows():
-                booked_slot = booking['time_slot']
-                start_booked, end_booked = [datetime.strptime(t, "%H:%M").time() 
-                                         for t in booked_slot.split("-")]
-                
-                # Check for overlap
-                if start_new < end_booked and end_new > start_booked:
-                    conflicts.append(booking)
-                    
-            return pd.DataFrame(conflicts) if conflicts else pd.DataFrame()
+            candidates = bookings_df.iloc[rows]
+            overlaps = (
+                (candidates['start_min'] < end_new) &
+                (candidates['end_min'] > start_new) &
+                (candidates['id'] != exclude_id)
+            )
+            conflicts = candidates[overlaps] if rows else pd.DataFrame()
+
+            # Approving over an active series double-books the venue just the same
+            series_ids = self._get_series_index().conflicts(venue_name, date, start_new, end_new)
+            if series_ids:
+                series_df = self._cached_series()
+                conflicts = with_series_occurrences(conflicts, series_df[series_df['series_id'].isin(series_ids)], date)
+            return conflicts if not conflicts.empty else pd.DataFrame()
             
         except Exception as e:
             print(f"Error getting conflicting bookings: {e}")
+            record_error(e)
             return pd.DataFrame()
 
+    def get_conflict_matrix(self, venue_name, date, time_slots, exclude_id=None):
+        """Check many candidate slots for one venue and date at once.
+
+        Returns a boolean DataFrame with one row per candidate slot and one
+        column per Pending/Approved booking id; True marks an overlap.
+        """
+        bookings_df = self._cached_bookings()
+        booked = bookings_df.iloc[self._get_interval_index().candidate_rows(venue_name, date)]
+        if exclude_id is not None:
+            booked = booked[booked['id'] != exclude_id]
+        return conflict_matrix(time_slots, booked)
+
+    def check_slots(self, candidates):
+        """Bulk-check candidate (venue, date, time_slot) rows against active bookings.
+
+        Returns a copy of candidates with start_min/end_min, a 'valid' flag for
+        the slot format and the number of overlapping bookings in 'conflicts'.
+        """
+        bookings_df = self._cached_bookings()
+        active = bookings_df.loc[
+            bookings_df['status'].isin(ACTIVE_STATUSES) & (bookings_df['start_min'] >= 0),
+            ['venue', 'date', 'start_min', 'end_min']
+        ]
+        return count_slot_conflicts(candidates, active)
+
+    def find_free_slots(self, venues, duration, date_from, date_to, min_capacity=0, categories=None,
+                        limit=None, day_start="08:00", day_end="22:00", step=30):
+        """Free gaps, or the earliest limit slots, of duration minutes (see find_free_slots).
+
+        venues maps venue names to {"category", "capacity"}, as in ClubPortal.venues.
+        """
+        try:
+            day_start, day_end = parse_time_slot(f"{day_start}-{day_end}")
+            return find_free_slots(self._get_interval_index(), venues, duration, date_from, date_to,
+                                   min_capacity, categories, limit, day_start, day_end, step,
+                                   self._get_series_index())
+        except Exception as e:
+            print(f"Error finding free slots: {e}")
+            record_error(e)
+            return pd.DataFrame(columns=FREE_SLOT_COLUMNS)
+
+    def check_series(self, series):
+        """Every date on which a recurring series would clash (see series_conflicts).
+
+        Returns None if the series itself is not valid.
+        """
+        try:
+            series = prepare_series(series)
+        except ValueError as e:
+            print(f"Invalid series: {e}")
+            return None
+        try:
+            return series_conflicts(series, self._cached_bookings(), self._cached_series())
+        except Exception as e:
+            print(f"Error checking series: {e}")
+            record_error(e)
+            return None
+
+    def save_series(self, series, check_available=True):
+        """Save a recurring booking request as one series record.
+
+        series holds the booking fields of a request plus first_date, until,
+        interval_weeks (1, 2, "weekly" or "biweekly") and optional exceptions
+        (a list of dates or "YYYY-MM-DD;..."). With check_available=True the
+        series is refused (None is returned) if any of its dates clash.
+        Returns the new series id.
+        """
+        try:
+            series = prepare_series(series)
+        except ValueError as e:
+            print(f"Invalid series: {e}")
+            return None
+        try:
+            with file_lock(self.lock_file):
+                if self._read_version() != self._bookings_version:
+                    self._bookings_cache = None
+                bookings_df = self._cached_bookings()
+                series_df = self._cached_series()
+                if check_available:
+                    conflicts = series_conflicts(series, bookings_df, series_df)
+                    if not conflicts.empty:
+                        print(f"{series['venue']} is taken on {conflicts['date'].nunique()} dates of the series, "
+                              f"first on {conflicts['date'].iloc[0]}.")
+                        return None
+
+                series_id = int(series_df['series_id'].max()) + 1 if len(series_df) > 0 else 1
+                series.update(series_id=series_id, status='Pending', processed_at=None, admin_comment=None,
+                              submitted_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                new_row = pd.DataFrame([{column: series.get(column) for column in SERIES_COLUMNS + SLOT_COLUMNS}])
+                self._write_series(pd.concat([series_df, new_row], ignore_index=True))
+
+            self.add_log(series_log_entry(series, 'Submitted', series['submitted_at']))
+            self._notify('series_created', None, new_row)
+            return series_id
+
+        except Exception as e:
+            print(f"Error saving series: {e}")
+            record_error(e)
+            return None
+
+    def update_series_status(self, series_id, status, admin_comment=''):
+        """Approve or reject every date of a series in one write"""
+        try:
+            with file_lock(self.lock_file):
+                series_df = self._cached_series()
+                rows = series_df.index[series_df['series_id'] == series_id].tolist()
+                if not rows:
+                    print(f"Series ID {series_id} not found.")
+                    return False
+                series_df = series_df.copy()
+                processed_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                for column in ('status', 'processed_at', 'admin_comment'):
+                    series_df[column] = series_df[column].astype(object)
+                old_row = series_df.loc[rows[:1]].copy()
+                series_df.loc[rows[0], ['status', 'processed_at', 'admin_comment']] = [
+                    status, processed_time, admin_comment]
+                self._write_series(series_df)
+                series = series_df.loc[rows[0]].to_dict()
+
+            self.add_log(series_log_entry(series, status, processed_time, admin_comment))
+            self._notify('series_status_changed', old_row, series_df.loc[rows[:1]])
+            return True
+
+        except Exception as e:
+            print(f"Error updating series status: {e}")
+            record_error(e)
+            return False
+
+    def get_series(self, status=None, club=None):
+        """Series records, optionally only those with a status or of one club"""
+        try:
+            series_df = self._cached_series()
+            if status is not None:
+                series_df = series_df[series_df['status'] == status]
+            if club is not None:
+                series_df = series_df[series_df['club'] == club]
+            return series_df[SERIES_COLUMNS].copy()
+        except Exception as e:
+            print(f"Error getting series: {e}")
+            record_error(e)
+            return pd.DataFrame(columns=SERIES_COLUMNS)
+
+    def expand_series(self, date_from=None, date_to=None, status=None, club=None):
+        """Occurrences of the matching series between date_from and date_to (see OCCURRENCE_COLUMNS)"""
+        series_df = self.get_series(status, club)
+        if date_from is not None:
+            series_df = series_df[series_df['until'] >= date_from]
+        if date_to is not None:
+            series_df = series_df[series_df['first_date'] <= date_to]
+        return expand_series(series_df, date_from, date_to)
+
+    def export_snapshot(self, path="bookings.parquet"):
+        """Write the bookings table to a columnar Parquet snapshot (needs pyarrow)"""
+        from snapshot import save_snapshot
+        save_snapshot(self.load_bookings(), path)
+        return path
+
+    def load_snapshot(self, path="bookings.parquet", columns=None, date_from=None, date_to=None,
+                      venues=None, statuses=None):
+        """Read bookings from a Parquet snapshot with column projection and date/venue pushdown"""
+        from snapshot import load_snapshot
+        return load_snapshot(path, columns=columns, date_from=date_from, date_to=date_to,
+                             venues=venues, statuses=statuses)
+
     def get_booking_by_id(self, booking_id):
         """Get a specific booking by ID"""
         try:
-            bookings_df = self.load_bookings()
+            bookings_df = self._cached_bookings()
             booking = bookings_df[bookings_df['id'] == booking_id]
             return booking.iloc[0] if not booking.empty else None
         except Exception as e:
             print(f"Error getting booking by ID: {e}")
+            record_error(e)
             return None
\ No newline at end of file
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Concurrency Stress Test - Many processes writing to one CSV or journal booking store
+Part of the Venue Booking System
+
+Every worker submits its own requests and approves every other one. At
+the end each (club, event) must appear exactly once, ids must be unique
+and every approval must have survived.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+
+def worker(workdir, worker_id, n_requests, write_mode, backend):
+    """Submit n_requests bookings and approve every second one"""
+    os.chdir(workdir)
+    from storage import create_storage
+    storage = create_storage(backend, write_mode=write_mode, log_fsync=False)
+
+    for i in range(n_requests):
+        request_id = storage.save_request({
+            "club": f"club-{worker_id}",
+            "event_name": f"event-{i}",
+            "contact_email": f"club{worker_id}@example.com",
+            "day": "Monday",
+            "date": f"2025-06-{1 + i % 28:02d}",
+            "time_slot": f"{8 + i % 10:02d}:00-{9 + i % 10:02d}:00",
+            "venue": f"Room-{worker_id % 5}",
+            "expected_attendance": 10,
+            "purpose": "stress test"
+        })
+        if request_id is None:
+            sys.exit(1)
+        if i % 2 == 0 and not storage.update_request_status(request_id, "Approved", f"w{worker_id}"):
+            sys.exit(1)
+
+
+def check(workdir, n_workers, n_requests, backend):
+    """Return a list of problems found in the final tables"""
+    os.chdir(workdir)
+    from storage import create_storage
+    storage = create_storage(backend)
+    bookings_df = storage.load_bookings()
+    logs_df = storage.load_logs()
+    problems = []
+
+    expected = n_workers * n_requests
+    if len(bookings_df) != expected:
+        problems.append(f"expected {expected} bookings, found {len(bookings_df)}")
+    if bookings_df['id'].duplicated().any():
+        problems.append(f"{bookings_df['id'].duplicated().sum()} duplicate ids")
+    if bookings_df.duplicated(['club', 'event_name']).any():
+        problems.append("a request was stored twice")
+
+    approved = (bookings_df['status'] == 'Approved').sum()
+    expected_approved = n_workers * ((n_requests + 1) // 2)
+    if approved != expected_approved:
+        problems.append(f"expected {expected_approved} approvals, found {approved} (lost update)")
+
+    expected_logs = expected + expected_approved
+    if len(logs_df) != expected_logs:
+        problems.append(f"expected {expected_logs} log entries, found {len(logs_df)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run N parallel writers against one booking store")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=25, help="requests per process")
+    parser.add_argument("--mode", choices=["optimistic", "lock"], default="optimistic")
+    parser.add_argument("--backend", choices=["csv", "journal"], default="csv")
+    args = parser.parse_args()
+
+    # Workers import storage from this directory but write into a scratch one
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix="booking-stress-")
+
+    started = time.perf_counter()
+    processes = [
+        Process(target=worker, args=(workdir, w, args.requests, args.mode, args.backend))
+        for w in range(args.processes)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    failed_workers = [p.exitcode for p in processes if p.exitcode != 0]
+    problems = check(workdir, args.processes, args.requests, args.backend)
+    if failed_workers:
+        problems.append(f"{len(failed_workers)} workers failed")
+
+    total = args.processes * args.requests
+    print(f"{args.processes} processes x {args.requests} requests ({args.backend}, {args.mode}) in {elapsed:.1f}s "
+          f"-> {total / elapsed:.0f} submissions/s, data in {workdir}")
+    if problems:
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        return 1
+    print("OK: no lost or duplicate bookings")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data - Realistic bookings, log entries and requests for benchmarks
+Part of the Venue Booking System
+
+A few venues and clubs get most of the bookings, evenings are busier than
+mornings and slot lengths vary between 30 minutes and 4 hours, so the data
+has the same kind of overlaps the real tables have.
+"""
+
+import argparse
+import os
+import sys
+import numpy as np
+import pandas as pd
+from storage import LOG_COLUMNS, create_storage
+
+SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+
+VENUE_CATEGORIES = ['Auditorium', 'Lecture Theatre', 'Conference Room', 'Seminar Hall', 'Lab']
+PURPOSES = ['Club meeting', 'Guest lecture', 'Workshop', 'Cultural event', 'Hackathon', 'Recruitment talk']
+
+
+def venue_names(n_venues):
+    return np.array([f"{VENUE_CATEGORIES[i % len(VENUE_CATEGORIES)]}-{i + 1}" for i in range(n_venues)])
+
+
+def club_names(n_clubs):
+    return np.array([f"Club-{i + 1}" for i in range(n_clubs)])
+
+
+def _popularity(n, skew=1.1):
+    """Zipf-like weights: item k is picked in proportion to 1 / k**skew"""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def _slots(rng, n_rows):
+    """(start_min, end_min) arrays on a 15 minute grid between 08:00 and 22:00"""
+    # Start hours weighted towards the afternoon and evening
+    hours = np.arange(8, 21)
+    hour_weights = np.where(hours >= 16, 3.0, np.where(hours >= 12, 2.0, 1.0))
+    start = rng.choice(hours, n_rows, p=hour_weights / hour_weights.sum()) * 60 + rng.integers(0, 4, n_rows) * 15
+    end = np.minimum(start + rng.integers(2, 17, n_rows) * 15, 22 * 60)
+    return start, end
+
+
+def _format_minutes(minutes):
+    minutes = pd.Series(minutes)
+    return (minutes // 60).astype(str).str.zfill(2) + ':' + (minutes % 60).astype(str).str.zfill(2)
+
+
+def synthetic_bookings(n_rows, n_venues=80, n_clubs=200, n_days=365, first_date="2025-01-01", seed=0):
+    """A bookings table with realistic cardinalities and overlapping slots"""
+    rng = np.random.default_rng(seed)
+    venues = venue_names(n_venues)
+    clubs = club_names(n_clubs)
+    dates = pd.date_range(first_date, periods=n_days)
+
+    start, end = _slots(rng, n_rows)
+    picked_dates = dates[rng.integers(0, n_days, n_rows)]
+    club_index = rng.choice(n_clubs, n_rows, p=_popularity(n_clubs))
+    submitted = picked_dates - pd.to_timedelta(rng.integers(1, 30 * 24, n_rows), unit='h')
+    status = rng.choice(['Pending', 'Approved', 'Rejected'], n_rows, p=[0.2, 0.6, 0.2])
+    processed = (submitted + pd.to_timedelta(rng.integers(1, 72, n_rows), unit='h')).strftime('%Y-%m-%d %H:%M:%S')
+
+    return pd.DataFrame({
+        'id': np.arange(1, n_rows + 1),
+        'club': clubs[club_index],
+        'event_name': pd.Series(np.arange(n_rows)).map("Event {}".format),
+        'contact_email': pd.Series(club_index).map("club{}@example.com".format),
+        'day': picked_dates.day_name(),
+        'date': picked_dates.strftime('%Y-%m-%d'),
+        'time_slot': _format_minutes(start) + '-' + _format_minutes(end),
+        'venue': venues[rng.choice(n_venues, n_rows, p=_popularity(n_venues, 0.8))],
+        'expected_attendance': rng.integers(10, 500, n_rows),
+        'purpose': np.array(PURPOSES)[rng.integers(0, len(PURPOSES), n_rows)],
+        'status': status,
+        'submitted_at': submitted.strftime('%Y-%m-%d %H:%M:%S'),
+        'processed_at': np.where(status == 'Pending', None, processed),
+        'admin_comment': None,
+    })
+
+
+def synthetic_logs(bookings_df):
+    """The log entries the portals would have written for bookings_df.
+
+    One "Submitted" entry per booking plus one decision entry for every
+    booking that is no longer pending.
+    """
+    def entries(df, time_column, status):
+        return pd.DataFrame({
+            'time': df[time_column],
+            'club': df['club'],
+            'venue': df['venue'],
+            'status': status,
+            'day': df['day'],
+            'date': df['date'],
+            'time_slot': df['time_slot'],
+            'event': df['event_name'],
+            'admin_comment': '',
+        })
+
+    decided = bookings_df[bookings_df['status'] != 'Pending']
+    logs_df = pd.concat([
+        entries(bookings_df, 'submitted_at', 'Submitted'),
+        entries(decided, 'processed_at', decided['status']),
+    ], ignore_index=True)
+    return logs_df.sort_values('time', kind='stable').reset_index(drop=True)[LOG_COLUMNS]
+
+
+def synthetic_requests(n_requests, n_venues=80, n_clubs=200, n_days=365, first_date="2025-01-01", seed=1):
+    """Portal-style request dicts, as passed to save_request"""
+    bookings_df = synthetic_bookings(n_requests, n_venues, n_clubs, n_days, first_date, seed)
+    fields = ['club', 'event_name', 'contact_email', 'day', 'date', 'time_slot', 'venue',
+              'expected_attendance', 'purpose']
+    return bookings_df[fields].to_dict('records')
+
+
+def load_dataset(storage, bookings_df, logs_df):
+    """Replace the contents of an empty store with the given tables"""
+    if hasattr(storage, 'import_tables'):
+        storage.import_tables(bookings_df, logs_df)
+        return
+    if not storage.save_bookings(bookings_df.copy()):
+        raise RuntimeError("could not write the bookings table")
+    if not storage.add_logs(logs_df):
+        raise RuntimeError("could not write the booking log")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a booking store with synthetic data")
+    parser.add_argument("--size", choices=sorted(SIZES), default='1k', help="number of bookings")
+    parser.add_argument("--rows", type=int, help="exact number of bookings (overrides --size)")
+    parser.add_argument("--venues", type=int, default=80)
+    parser.add_argument("--clubs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", help="storage backend (csv or sqlite)")
+    parser.add_argument("--dir", default=".", help="directory to create the store in")
+    args = parser.parse_args()
+
+    n_rows = args.rows or SIZES[args.size]
+    os.makedirs(args.dir, exist_ok=True)
+    os.chdir(args.dir)
+    storage = create_storage(args.backend, log_fsync=False)
+    if len(storage.load_bookings()):
+        print("The store already has bookings; use an empty --dir.")
+        return 1
+
+    bookings_df = synthetic_bookings(n_rows, args.venues, args.clubs, seed=args.seed)
+    logs_df = synthetic_logs(bookings_df)
+    load_dataset(storage, bookings_df, logs_df)
+    print(f"Wrote {len(bookings_df)} bookings and {len(logs_df)} log entries to {os.getcwd()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())